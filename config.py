@@ -11,11 +11,15 @@ class Config:
     if not DISABLE_AUTH:
         ADMIN_USERNAME = os.environ.get("USERNAME")
         ADMIN_PASSWORD = os.environ.get("PASSWORD")
-        if not ADMIN_USERNAME or not ADMIN_PASSWORD:
-            raise RuntimeError("USERNAME and PASSWORD environment variables must be set.")
+        ADMIN_PASSWORD_HASH = os.environ.get("PASSWORD_HASH")
+        USERS_FILE = os.environ.get("USERS_FILE")
+        if not USERS_FILE and (not ADMIN_USERNAME or not (ADMIN_PASSWORD or ADMIN_PASSWORD_HASH)):
+            raise RuntimeError("USERNAME and PASSWORD (or PASSWORD_HASH) environment variables must be set, or USERS_FILE.")
     else:
         ADMIN_USERNAME = None
         ADMIN_PASSWORD = None
+        ADMIN_PASSWORD_HASH = None
+        USERS_FILE = None
         
     TRAEFIK_ENABLE = os.environ.get("TRAEFIK_LABELS", "true").lower() == "true"
     TAGS_ENABLE = os.environ.get("TAGS", "true").lower() == "true"
@@ -29,5 +33,8 @@ class Config:
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 
     DOCKER_CONNECTION_TIMEOUT = float(os.environ.get("DOCKER_CONNECTION_TIMEOUT", "2"))
+    DOCKER_API_TIMEOUT = float(os.environ.get("DOCKER_API_TIMEOUT", "15"))
+
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
     
     PORT = int(os.environ.get("PORT", "8000"))
\ No newline at end of file
@@ -3,6 +3,7 @@ import logging
 from flask import Flask
 from config import Config
 from .extensions import login_manager, cors
+from .serialization import FastJSONProvider, compressor
 
 def create_app(config_class=Config):
     log_level = getattr(logging, config_class.LOG_LEVEL.upper(), logging.INFO)
@@ -19,16 +20,19 @@ def create_app(config_class=Config):
     
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json = FastJSONProvider(app)
+    app.after_request(compressor.after_request)
     
     login_manager.init_app(app)
     cors.init_app(app)
     
+    from . import auth
     if not app.config.get('DISABLE_AUTH', False):
+        auth.credentials.configure(app.config)
         logging.debug("Authentication enabled")
     else:
         logging.info("Authentication disabled")
 
-    from . import auth
     app.register_blueprint(auth.auth_bp)
 
     from . import main
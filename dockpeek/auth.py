@@ -1,3 +1,11 @@
+import os
+import time
+import hmac
+import hashlib
+import logging
+from threading import Lock
+from typing import Dict, Optional
+
 from flask import (
     Blueprint, render_template, request, redirect, url_for, session, current_app
 )
@@ -5,16 +13,115 @@ from flask_login import UserMixin, login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from .extensions import login_manager
 
+logger = logging.getLogger(__name__)
+
 auth_bp = Blueprint('auth', __name__)
 
-def get_users():
-    if current_app.config.get('DISABLE_AUTH', False):
-        return {}
-    return {
-        current_app.config['ADMIN_USERNAME']: {
-            "password": generate_password_hash(current_app.config['ADMIN_PASSWORD'])
-        }
-    }
+
+class CredentialStore:
+    """Password hashes derived once at startup, so authenticated requests never hash.
+
+    Users come from USERNAME with PASSWORD or PASSWORD_HASH, and from an
+    optional USERS_FILE of ``username:hash`` lines that is re-read when it changes.
+    """
+
+    RELOAD_INTERVAL = 5
+
+    def __init__(self):
+        self._lock = Lock()
+        self._secret = b''
+        self._admin = {}
+        self._admin_source = {}
+        self._file_users = {}
+        self._users_file = None
+        self._file_state = None
+        self._checked_at = 0
+
+    def configure(self, config):
+        admin, admin_source = {}, {}
+        username = config.get('ADMIN_USERNAME')
+        if username:
+            # The generated hash is salted per process, so fingerprints are
+            # derived from the configured value that every worker shares.
+            password_hash = source = config.get('ADMIN_PASSWORD_HASH')
+            if not password_hash and config.get('ADMIN_PASSWORD'):
+                source = config['ADMIN_PASSWORD']
+                password_hash = generate_password_hash(source)
+            if password_hash:
+                admin[username] = password_hash
+                admin_source[username] = source
+
+        with self._lock:
+            self._secret = str(config.get('SECRET_KEY') or '').encode()
+            self._admin = admin
+            self._admin_source = admin_source
+            self._users_file = config.get('USERS_FILE')
+            self._file_users = {}
+            self._file_state = None
+            self._checked_at = 0
+        self._reload_if_changed()
+
+    def users(self) -> Dict[str, str]:
+        self._reload_if_changed()
+        with self._lock:
+            return {**self._file_users, **self._admin}
+
+    def verify(self, username: str, password: str) -> bool:
+        password_hash = self.users().get(username)
+        return bool(password_hash and password and check_password_hash(password_hash, password))
+
+    def fingerprint(self, username: str) -> Optional[str]:
+        """HMAC of the user's configured credential; sessions carry it so a password change logs them out.
+
+        It is the same in every worker, unlike the salted hash built from PASSWORD.
+        """
+        self._reload_if_changed()
+        with self._lock:
+            source = self._admin_source.get(username, self._file_users.get(username))
+            secret = self._secret
+        if source is None:
+            return None
+        message = f"{username}\0{source}".encode()
+        return hmac.new(secret, message, hashlib.sha256).hexdigest()[:32]
+
+    def _reload_if_changed(self):
+        with self._lock:
+            path = self._users_file
+            if not path or time.monotonic() - self._checked_at < self.RELOAD_INTERVAL:
+                return
+            self._checked_at = time.monotonic()
+            try:
+                st = os.stat(path)
+                state = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except OSError as e:
+                # Log once per outage rather than on every reload check.
+                if self._file_state != 'missing':
+                    logger.error(f"Cannot read users file {path}: {e}")
+                self._file_users, self._file_state = {}, 'missing'
+                return
+            if state == self._file_state:
+                return
+            self._file_users = self._parse_users_file(path)
+            self._file_state = state
+        logger.info(f"Loaded {len(self._file_users)} users from {path}")
+
+    @staticmethod
+    def _parse_users_file(path: str) -> Dict[str, str]:
+        users = {}
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                username, sep, password_hash = line.partition(':')
+                if not sep or not username or not password_hash:
+                    logger.warning(f"Ignoring malformed line {line_number} in users file {path}")
+                    continue
+                users[username] = password_hash
+        return users
+
+
+credentials = CredentialStore()
 
 class User(UserMixin):
     def __init__(self, id):
@@ -25,9 +132,10 @@ def load_user(user_id):
     if current_app.config.get('DISABLE_AUTH', False):
         return User('anonymous')
     
-    if user_id in get_users():
-        return User(user_id)
-    return None
+    fingerprint = credentials.fingerprint(user_id)
+    if fingerprint is None or session.get('credential') != fingerprint:
+        return None
+    return User(user_id)
 
 @login_manager.unauthorized_handler
 def unauthorized_callback():
@@ -45,11 +153,9 @@ def login():
         username = request.form.get("username")
         password = request.form.get("password")
         
-        users = get_users()
-        user_record = users.get(username)
-
-        if user_record and check_password_hash(user_record["password"], password):
+        if credentials.verify(username, password):
             login_user(User(username))
+            session['credential'] = credentials.fingerprint(username)
             session.permanent = True
             return redirect(url_for("main.index"))
         else:
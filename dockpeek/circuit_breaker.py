@@ -0,0 +1,116 @@
+import os
+import time
+import random
+import logging
+from enum import Enum
+from threading import Lock
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+
+
+class HostCircuitBreaker:
+    """Failure tracking and latency-derived timeouts for one Docker host.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and the
+    host is skipped until a background probe succeeds. Probes back off
+    exponentially from ``base_backoff`` to ``max_backoff`` seconds.
+    """
+
+    EWMA_ALPHA = 0.2
+    LATENCY_FACTOR = 4
+    MIN_TIMEOUT = 1.0
+
+    def __init__(self, name: str, max_timeout: float, failure_threshold: int = 3,
+                 base_backoff: float = 5.0, max_backoff: float = 300.0):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.next_probe_at = 0.0
+        self._backoff = base_backoff
+        self._lock = Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            return self.state is CircuitState.CLOSED
+
+    def probe_due(self) -> bool:
+        with self._lock:
+            return self.state is CircuitState.OPEN and time.monotonic() >= self.next_probe_at
+
+    def timeout(self) -> float:
+        """Budget for a quick call such as ping, scaled from observed latency."""
+        with self._lock:
+            if self.latency_ewma is None:
+                return self.max_timeout
+            return max(self.MIN_TIMEOUT, min(self.max_timeout, self.LATENCY_FACTOR * self.latency_ewma))
+
+    def record_success(self, latency: float):
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += self.EWMA_ALPHA * (latency - self.latency_ewma)
+            was_open = self.state is CircuitState.OPEN
+            self.state = CircuitState.CLOSED
+            self.failures = 0
+            self._backoff = self.base_backoff
+        if was_open:
+            logger.info(f"[{self.name}] Docker host reachable again, circuit closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state is CircuitState.OPEN:
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            elif self.failures < self.failure_threshold:
+                return
+            else:
+                self.state = CircuitState.OPEN
+                logger.warning(f"[{self.name}] Docker host failed {self.failures} times, circuit opened")
+            # Jitter keeps probes for hosts that failed together from lining up.
+            self.next_probe_at = time.monotonic() + self._backoff * random.uniform(0.9, 1.1)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state.value,
+                'failures': self.failures,
+                'latency_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+                'next_probe_in': max(0.0, round(self.next_probe_at - time.monotonic(), 1))
+                if self.state is CircuitState.OPEN else None,
+            }
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, max_timeout: float):
+        self.max_timeout = max_timeout
+        self.failure_threshold = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+        self.base_backoff = float(os.getenv('CIRCUIT_BASE_BACKOFF', '5'))
+        self.max_backoff = float(os.getenv('CIRCUIT_MAX_BACKOFF', '300'))
+        self._breakers: Dict[str, HostCircuitBreaker] = {}
+        self._lock = Lock()
+
+    def get(self, key: str, name: str) -> HostCircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = HostCircuitBreaker(
+                    name, self.max_timeout, self.failure_threshold, self.base_backoff, self.max_backoff
+                )
+            return breaker
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.snapshot() for b in breakers}
@@ -0,0 +1,104 @@
+import os
+import signal
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .docker_utils import discover_docker_clients
+from .inventory import inventory_manager
+from .metrics import ExecutorGauge, metrics
+from .update import update_checker
+from .update_jobs import update_jobs
+from .update_queue import bulk_updates
+from .shared_snapshot import SnapshotStore, SNAPSHOT_DIR_ENV
+
+logger = logging.getLogger(__name__)
+
+
+class Collector:
+    """Owns every Docker connection and publishes host inventories for the web workers."""
+
+    WAIT_TIMEOUT = 1.0
+    SYNC_CONCURRENCY = 8
+
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+        self._stop_event = threading.Event()
+        self._written = {}
+        self._last_index = None
+        self._sync_usage = ExecutorGauge('collector_sync', self.SYNC_CONCURRENCY)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        logger.info(f"Collector started, publishing snapshots to {self.store.directory}")
+        with ThreadPoolExecutor(max_workers=self.SYNC_CONCURRENCY) as executor:
+            while not self._stop_event.is_set():
+                revision = inventory_manager.revision
+                try:
+                    hosts = discover_docker_clients()
+                    active = [h for h in hosts if h['status'] == 'active']
+                    list(executor.map(self._sync_usage.wrap(self._sync), active))
+                    self.publish(hosts)
+                    update_checker.prune_cache()
+                except Exception as e:
+                    logger.error(f"Collector cycle failed: {e}")
+                    self._stop_event.wait(self.WAIT_TIMEOUT)
+
+                try:
+                    update_jobs.run_queued()
+                    bulk_updates.run_queued()
+                except Exception as e:
+                    logger.error(f"Cannot start queued jobs: {e}")
+
+                inventory_manager.wait_for_revision(revision, self.WAIT_TIMEOUT)
+        bulk_updates.shutdown()
+        metrics.flush()
+        logger.info("Collector stopped")
+
+    @staticmethod
+    def _sync(host: Dict):
+        try:
+            inventory = inventory_manager.sync_host(host)
+            inventory.refresh_swarm_if_stale()
+        except Exception as e:
+            logger.warning(f"[{host['name']}] Collector could not sync inventory: {e}")
+
+    def publish(self, hosts: List[Dict]):
+        entries = []
+        for host in hosts:
+            entry = {k: host[k] for k in ('name', 'url', 'public_hostname', 'status', 'is_docker_host', 'order')}
+            entry['file'] = None
+            if host['status'] == 'active':
+                entry['file'] = self._write_host(inventory_manager.get_host_inventory(host))
+            entries.append(entry)
+
+        index = {'epoch': inventory_manager.epoch, 'revision': inventory_manager.revision, 'hosts': entries}
+        if index != self._last_index:
+            self.store.write_index(index)
+            self._last_index = index
+
+    def _write_host(self, inventory) -> str:
+        # Rewrite only when something a reader can observe has changed.
+        key = (inventory.name, inventory.is_synced, inventory.revision, inventory.image_revision)
+        file_name = self.store.host_file_name(inventory.url)
+        if self._written.get(inventory.url) != key:
+            self.store.write_host(inventory.url, inventory.export())
+            self._written[inventory.url] = key
+        return file_name
+
+
+def main():
+    log_level = getattr(logging, os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    logging.basicConfig(level=log_level, format='[%(levelname)s] - %(message)s')
+
+    collector = Collector(SnapshotStore(os.environ[SNAPSHOT_DIR_ENV]))
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: collector.stop())
+    collector.run()
+
+
+if __name__ == '__main__':
+    main()
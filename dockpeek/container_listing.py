@@ -0,0 +1,145 @@
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from docker.client import DockerClient
+from docker.models.containers import Container
+
+from .deadline import with_current_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerSummaryAdapter:
+    """Builds inspect-shaped attrs from a /containers/json summary entry."""
+
+    HEALTH_PATTERN = re.compile(r'\((healthy|unhealthy|health: starting)\)')
+    EXIT_CODE_PATTERN = re.compile(r'^Exited \((-?\d+)\)')
+    STATES_WITH_UPTIME = {'running', 'paused', 'restarting'}
+
+    @classmethod
+    def to_attrs(cls, summary: Dict) -> Dict:
+        state_name = summary.get('State', '')
+        status_text = summary.get('Status', '') or ''
+        state = {'Status': state_name}
+
+        health = cls._parse_health(summary, status_text)
+        if health:
+            state['Health'] = {'Status': health}
+
+        exit_code = cls._parse_exit_code(status_text)
+        if exit_code is not None:
+            state['ExitCode'] = exit_code
+
+        network_settings = summary.get('NetworkSettings') or {}
+        return {
+            'Id': summary['Id'],
+            'Name': cls._primary_name(summary),
+            'Image': summary.get('ImageID', ''),
+            'Created': summary.get('Created'),
+            'State': state,
+            'Config': {
+                'Image': summary.get('Image', ''),
+                'Labels': summary.get('Labels') or {},
+            },
+            'HostConfig': {
+                'NetworkMode': (summary.get('HostConfig') or {}).get('NetworkMode', ''),
+            },
+            'NetworkSettings': {
+                'Ports': cls._convert_ports(summary.get('Ports') or []),
+                'Networks': network_settings.get('Networks') or {},
+            },
+            'Mounts': summary.get('Mounts') or [],
+        }
+
+    @classmethod
+    def needs_inspect(cls, attrs: Dict, with_state: bool) -> bool:
+        image_ref = attrs['Config']['Image']
+        if not image_ref or image_ref.startswith('sha256:') or image_ref == attrs['Image']:
+            return True
+        if with_state and attrs['State']['Status'] in cls.STATES_WITH_UPTIME:
+            return 'StartedAt' not in attrs['State']
+        return False
+
+    @staticmethod
+    def _primary_name(summary: Dict) -> str:
+        names = summary.get('Names') or []
+        for name in names:
+            if name.count('/') == 1:
+                return name
+        return names[0] if names else f"/{summary['Id'][:12]}"
+
+    @classmethod
+    def _parse_health(cls, summary: Dict, status_text: str) -> Optional[str]:
+        health = (summary.get('Health') or {}).get('Status')
+        if health:
+            return health
+        match = cls.HEALTH_PATTERN.search(status_text)
+        if not match:
+            return None
+        return 'starting' if match.group(1) == 'health: starting' else match.group(1)
+
+    @classmethod
+    def _parse_exit_code(cls, status_text: str) -> Optional[int]:
+        match = cls.EXIT_CODE_PATTERN.match(status_text)
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def _convert_ports(ports: List[Dict]) -> Dict[str, Optional[List[Dict]]]:
+        converted = {}
+        for port in ports:
+            key = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+            if port.get('PublicPort'):
+                mappings = converted.get(key) or []
+                mappings.append({
+                    'HostIp': port.get('IP', '0.0.0.0'),
+                    'HostPort': str(port['PublicPort'])
+                })
+                converted[key] = mappings
+            else:
+                converted.setdefault(key, None)
+
+        # IPv4 bindings first, matching the order inspect reports them in.
+        for mappings in converted.values():
+            if mappings:
+                mappings.sort(key=lambda m: ':' in m['HostIp'])
+        return converted
+
+
+class ContainerLister:
+    def __init__(self, inspect_concurrency: int = 8):
+        self.inspect_concurrency = inspect_concurrency
+
+    def list(self, client: DockerClient, all: bool = True, with_state: bool = False) -> List[Container]:
+        summaries = client.api.containers(all=all)
+        attrs_list = [ContainerSummaryAdapter.to_attrs(summary) for summary in summaries]
+
+        pending = [attrs for attrs in attrs_list if ContainerSummaryAdapter.needs_inspect(attrs, with_state)]
+        if pending:
+            self._inspect_into(client, pending)
+
+        return [Container(attrs=attrs, client=client, collection=client.containers) for attrs in attrs_list]
+
+    def _inspect_into(self, client: DockerClient, attrs_list: List[Dict]):
+        def inspect(attrs):
+            try:
+                attrs.update(client.api.inspect_container(attrs['Id']))
+            except Exception as e:
+                logger.debug(f"Inspect failed for {attrs['Name']}: {e}")
+
+        if len(attrs_list) == 1:
+            inspect(attrs_list[0])
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.inspect_concurrency, len(attrs_list))) as executor:
+            # Worker threads do not inherit the caller's deadline on their own.
+            list(executor.map(with_current_deadline(inspect), attrs_list))
+
+
+_lister = ContainerLister()
+
+
+def list_containers(client: DockerClient, all: bool = True, with_state: bool = False) -> List[Container]:
+    """List containers from one summary call, inspecting only where the summary falls short."""
+    return _lister.list(client, all=all, with_state=with_state)
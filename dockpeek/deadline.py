@@ -0,0 +1,178 @@
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from docker.api.client import APIClient
+from docker.client import DockerClient
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """An absolute point in time by which a Docker API operation has to finish."""
+
+    def __init__(self, timeout: float, host: Optional[str] = None, operation: Optional[str] = None):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.host = host
+        self.operation = operation
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def clamp(self, timeout: Optional[float]) -> float:
+        """Shorten a per-request timeout so the request cannot outlive the deadline."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(self._describe())
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def _describe(self) -> str:
+        what = self.operation or "Docker API call"
+        where = f"[{self.host}] " if self.host else ""
+        return f"{where}{what} exceeded its {self.timeout:g}s deadline"
+
+
+class TimeoutStats:
+    """Per-host count of Docker API calls that ran out of time."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = Lock()
+
+    def record(self, host: Optional[str]):
+        with self._lock:
+            self._counts[host or 'unknown'] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+timeout_stats = TimeoutStats()
+
+# threading.local is greenlet-local once gevent has patched the process.
+_local = threading.local()
+
+
+def current_deadline() -> Optional[Deadline]:
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline(timeout: float, host: Optional[str] = None, operation: Optional[str] = None):
+    """Bound every Docker API call made by this thread or greenlet inside the block.
+
+    Nested deadlines never extend an outer one. Request timeouts surface as
+    ``DeadlineExceeded`` and are counted per host.
+    """
+    outer = current_deadline()
+    inner = Deadline(timeout, host, operation)
+    if outer is not None and outer.expires_at <= inner.expires_at:
+        inner = Deadline(max(outer.remaining(), 0), host or outer.host, operation or outer.operation)
+
+    _local.deadline = inner
+    try:
+        yield inner
+    except requests.exceptions.Timeout as e:
+        timeout_stats.record(inner.host)
+        logger.warning(f"{inner._describe()}: {e}")
+        exceeded = DeadlineExceeded(inner._describe())
+        exceeded.recorded = True
+        raise exceeded from e
+    except DeadlineExceeded as e:
+        # Only the innermost block reports a timeout.
+        if not getattr(e, 'recorded', False):
+            e.recorded = True
+            timeout_stats.record(inner.host)
+            logger.warning(inner._describe())
+        raise
+    finally:
+        _local.deadline = outer
+
+
+def with_current_deadline(fn: Callable) -> Callable:
+    """Carry the caller's deadline into a function that runs on another thread."""
+    captured = current_deadline()
+    if captured is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = current_deadline()
+        _local.deadline = captured
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.deadline = previous
+    return wrapper
+
+
+_API_VERSION_PREFIX = re.compile(r'^/v\d+(\.\d+)?(?=/)')
+
+# Path segments that follow a collection (/containers/json) or an object (/containers/{id}/json).
+_COLLECTION_ACTIONS = {'json', 'create', 'prune', 'df', 'search', 'load', 'get', 'build'}
+_OBJECT_ACTIONS = {
+    'json', 'logs', 'start', 'stop', 'restart', 'kill', 'wait', 'stats', 'top', 'changes', 'export',
+    'archive', 'attach', 'rename', 'update', 'pause', 'unpause', 'exec', 'resize', 'history', 'push',
+    'tag', 'get', 'connect', 'disconnect', 'inspect'
+}
+
+
+def api_endpoint(url: str) -> str:
+    """Docker API path with object ids and names replaced, e.g. ``/containers/{id}/json``."""
+    path = _API_VERSION_PREFIX.sub('', urlsplit(url).path)
+    parts = [part for part in path.split('/') if part]
+    if len(parts) <= 1 or (len(parts) == 2 and parts[1] in _COLLECTION_ACTIONS):
+        return '/' + '/'.join(parts)
+    # Image names may contain slashes, so everything between the resource and the action is the id.
+    if parts[-1] in _OBJECT_ACTIONS:
+        return f"/{parts[0]}/{{id}}/{parts[-1]}"
+    return f"/{parts[0]}/{{id}}"
+
+
+class DeadlineAPIClient(APIClient):
+    def _set_request_timeout(self, kwargs):
+        kwargs = super()._set_request_timeout(kwargs)
+        active = current_deadline()
+        if active is not None:
+            kwargs['timeout'] = active.clamp(kwargs['timeout'])
+        return kwargs
+
+    def request(self, method, url, *args, **kwargs):
+        # Every Docker API call goes through here, so this is where they are timed and counted.
+        labels = {'host': metrics.host_label(self.base_url), 'method': method, 'endpoint': api_endpoint(url)}
+        status = 'error'
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            metrics.observe('dockpeek_docker_api_request_duration_seconds', time.monotonic() - started, **labels)
+            metrics.inc('dockpeek_docker_api_requests_total', status=status, **labels)
+
+
+class DeadlineDockerClient(DockerClient):
+    """DockerClient whose requests honour the active ``deadline`` block."""
+
+    def __init__(self, *args, **kwargs):
+        self.api = DeadlineAPIClient(*args, **kwargs)
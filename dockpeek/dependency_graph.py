@@ -0,0 +1,173 @@
+import logging
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+NETWORK_MODE = 'network_mode'
+VOLUMES_FROM = 'volumes_from'
+DEPENDS_ON = 'depends_on'
+
+# Edges that pin a dependent to its target's container id, so the dependent has to be recreated with it.
+RECREATE_KINDS = (NETWORK_MODE, VOLUMES_FROM)
+
+COMPOSE_PROJECT_LABEL = 'com.docker.compose.project'
+COMPOSE_SERVICE_LABEL = 'com.docker.compose.service'
+COMPOSE_DEPENDS_ON_LABEL = 'com.docker.compose.depends_on'
+
+
+def _compose_key(project: str, service: str) -> str:
+    return f"compose:{project}/{service}"
+
+
+def container_keys(attrs: Dict) -> List[str]:
+    """Every reference another container can use to point at this one."""
+    container_id = attrs.get('Id', '')
+    keys = [container_id, container_id[:12]]
+    name = (attrs.get('Name') or '').lstrip('/')
+    if name:
+        keys.append(name)
+    labels = (attrs.get('Config') or {}).get('Labels') or {}
+    if labels.get(COMPOSE_PROJECT_LABEL) and labels.get(COMPOSE_SERVICE_LABEL):
+        keys.append(_compose_key(labels[COMPOSE_PROJECT_LABEL], labels[COMPOSE_SERVICE_LABEL]))
+    return keys
+
+
+def container_references(attrs: Dict) -> List[Tuple[str, str]]:
+    """``(kind, reference)`` pairs for the containers this one depends on."""
+    host_config = attrs.get('HostConfig') or {}
+    references = []
+
+    network_mode = host_config.get('NetworkMode') or ''
+    if network_mode.startswith('container:'):
+        references.append((NETWORK_MODE, network_mode.split(':', 1)[1]))
+
+    for entry in host_config.get('VolumesFrom') or []:
+        references.append((VOLUMES_FROM, entry.split(':', 1)[0]))
+
+    # Compose records depends_on as "service:condition:restart,..." on every container of the project.
+    labels = (attrs.get('Config') or {}).get('Labels') or {}
+    project = labels.get(COMPOSE_PROJECT_LABEL)
+    if project:
+        for item in (labels.get(COMPOSE_DEPENDS_ON_LABEL) or '').split(','):
+            service = item.split(':', 1)[0].strip()
+            if service:
+                references.append((DEPENDS_ON, _compose_key(project, service)))
+    return references
+
+
+class DependencyGraph:
+    """Which containers on a host depend on which, through shared network
+    namespaces, ``volumes_from`` and compose ``depends_on``.
+
+    Dependents are indexed by every key their target can be referred to by,
+    so looking them up does not depend on the number of containers, and
+    single containers can be added or removed as the host changes.
+    """
+
+    def __init__(self, containers: Iterable[Dict] = ()):
+        self._lock = Lock()
+        self._nodes: Dict[str, Tuple[str, List[str], List[Tuple[str, str]]]] = {}
+        self._by_key: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, Set[Tuple[str, str]]] = {}
+        for attrs in containers:
+            self.upsert(attrs)
+
+    def upsert(self, attrs: Dict):
+        container_id = attrs.get('Id')
+        if not container_id:
+            return
+        name = (attrs.get('Name') or '').lstrip('/')
+        keys = container_keys(attrs)
+        references = container_references(attrs)
+        with self._lock:
+            self._unlink(container_id)
+            self._nodes[container_id] = (name, keys, references)
+            for key in keys:
+                self._by_key.setdefault(key, set()).add(container_id)
+            for kind, reference in references:
+                self._dependents.setdefault(reference, set()).add((container_id, kind))
+
+    def remove(self, container_id: str):
+        with self._lock:
+            self._unlink(container_id)
+
+    def _unlink(self, container_id: str):
+        node = self._nodes.pop(container_id, None)
+        if node is None:
+            return
+        _, keys, references = node
+        for key in keys:
+            owners = self._by_key.get(key)
+            if owners is not None:
+                owners.discard(container_id)
+                if not owners:
+                    del self._by_key[key]
+        for kind, reference in references:
+            dependents = self._dependents.get(reference)
+            if dependents is not None:
+                dependents.discard((container_id, kind))
+                if not dependents:
+                    del self._dependents[reference]
+
+    def find(self, reference: str) -> Optional[str]:
+        """Container id for a name, id or short id."""
+        with self._lock:
+            owners = self._by_key.get(reference.lstrip('/'))
+            return next(iter(owners)) if owners and len(owners) == 1 else None
+
+    def name_of(self, container_id: str) -> Optional[str]:
+        with self._lock:
+            node = self._nodes.get(container_id)
+            return node[0] if node else None
+
+    def dependents_of(self, container_id: str, kinds: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+        """Direct dependents of a container as ``(container_id, kind)`` pairs."""
+        with self._lock:
+            return self._direct_dependents(container_id, set(kinds) if kinds else None)
+
+    def _direct_dependents(self, container_id: str, kinds: Optional[Set[str]]) -> List[Tuple[str, str]]:
+        node = self._nodes.get(container_id)
+        if node is None:
+            return []
+        found = set()
+        for key in node[1]:
+            for dependent_id, kind in self._dependents.get(key, ()):
+                if dependent_id != container_id and (kinds is None or kind in kinds):
+                    found.add((dependent_id, kind))
+        return sorted(found)
+
+    def recreate_order(self, container_id: str, kinds: Iterable[str] = RECREATE_KINDS) -> List[List[str]]:
+        """Transitive dependents of a container, grouped into levels.
+
+        Every container's own dependencies come from the root or an earlier
+        level, so containers within one level can be recreated in parallel.
+        """
+        kinds = set(kinds)
+        with self._lock:
+            depends_on: Dict[str, Set[str]] = {}
+            pending = [container_id]
+            while pending:
+                current = pending.pop()
+                for dependent_id, _ in self._direct_dependents(current, kinds):
+                    if dependent_id == container_id:
+                        continue
+                    if dependent_id not in depends_on:
+                        depends_on[dependent_id] = set()
+                        pending.append(dependent_id)
+                    depends_on[dependent_id].add(current)
+
+        levels = []
+        done = {container_id}
+        remaining = dict(depends_on)
+        while remaining:
+            level = sorted(cid for cid, parents in remaining.items() if parents <= done)
+            if not level:
+                # A cycle cannot be ordered; recreate what is left last rather than not at all.
+                logger.warning(f"Dependency cycle among containers {sorted(remaining)}")
+                level = sorted(remaining)
+            levels.append(level)
+            done.update(level)
+            for cid in level:
+                del remaining[cid]
+        return levels
@@ -3,15 +3,20 @@ import re
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 from urllib.parse import urlparse
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import docker
 from docker.client import DockerClient
 from flask import request, has_request_context
-from threading import Lock
+from threading import BoundedSemaphore, Lock, Thread
 import time
 
+from .shared_snapshot import SnapshotStore, get_snapshot_dir, is_snapshot_reader
+from .deadline import DeadlineDockerClient, deadline
+from .circuit_breaker import CircuitBreakerRegistry
+from .metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 
@@ -127,31 +132,42 @@ class DockerClientFactory:
         from config import Config
         self.timeout = timeout if timeout is not None else Config.DOCKER_CONNECTION_TIMEOUT
         self.long_timeout = long_timeout
+        self.api_timeout = Config.DOCKER_API_TIMEOUT
         
-    def create_client(self, url: str, use_long_timeout: bool = False) -> DockerClient:
+    def create_client(self, url: str, use_long_timeout: bool = False, version: Optional[str] = None,
+                      max_pool_size: int = 20) -> DockerClient:
         timeout = self.long_timeout if use_long_timeout else self.timeout
         
-        return DockerClient(
+        return DeadlineDockerClient(
             base_url=url, 
             timeout=timeout,
-            max_pool_size=20
+            version=version,
+            max_pool_size=max_pool_size
+        )
+
+    def create_watch_client(self, url: str, read_timeout: float) -> DockerClient:
+        return DeadlineDockerClient(
+            base_url=url,
+            timeout=read_timeout,
+            max_pool_size=2
         )
 
-    
     def create_default_client(self) -> DockerClient:
-        return docker.from_env(timeout=self.timeout)
+        return DeadlineDockerClient.from_env(timeout=self.timeout)
     
-    def test_connection(self, client: DockerClient) -> bool:
+    def test_connection(self, client: DockerClient, host: Optional[str] = None) -> bool:
         try:
-            client.ping()
+            with deadline(self.timeout, host, "ping"):
+                client.ping()
             return True
         except Exception as e:
             logger.debug(f"Connection test failed: {e}")
             return False
 
-    def get_host_name_from_api(self, client: DockerClient) -> Optional[str]:
+    def get_host_name_from_api(self, client: DockerClient, host: Optional[str] = None) -> Optional[str]:
         try:
-            info = client.info()
+            with deadline(self.timeout, host, "info"):
+                info = client.info()
             return info.get('Name')
         except Exception as e:
             logger.debug(f"Failed to get host name from Docker API: {e}")
@@ -221,7 +237,16 @@ class EnvironmentConfigParser:
         return configs
 
 
+def _label_host_metrics(client: DockerClient, name: str):
+    # Metrics must never fail discovery, whatever client object the factory returned.
+    base_url = getattr(getattr(client, 'api', None), 'base_url', None)
+    if base_url:
+        metrics.name_host(base_url, name)
+
+
 class DockerClientDiscovery:
+    PROBE_INTERVAL = 1.0
+
     def __init__(self, client_factory: Optional[DockerClientFactory] = None, 
              discovery_timeout: float = 10.0):
         self.client_factory = client_factory or DockerClientFactory()
@@ -230,12 +255,31 @@ class DockerClientDiscovery:
         self._cache = None
         self._cache_time = 0
         self._cache_ttl = 30
+        self._snapshot_store = SnapshotStore(get_snapshot_dir()) if is_snapshot_reader() else None
+        self._snapshot_clients = {}
+        self.breakers = CircuitBreakerRegistry(self.client_factory.timeout)
+        self._clients: Dict[str, DockerClient] = {}
+        self._api_names: Dict[str, str] = {}
+        self._refreshing = False
+        self._probe_configs: Dict[str, DockerHostConfig] = {}
+        self._probe_thread = None
     
     def discover(self, use_cache: bool = True) -> List[DockerHost]:
+        if self._snapshot_store is not None:
+            hosts = self._hosts_from_snapshot()
+            if hosts is not None:
+                return hosts
+
         if use_cache:
+            # Serve the last known hosts and refresh them in the background once stale.
             with self._lock:
-                if self._cache and (time.time() - self._cache_time) < self._cache_ttl:
-                    return self._cache
+                hosts = self._cache
+                is_stale = (time.time() - self._cache_time) >= self._cache_ttl
+                if hosts and is_stale and not self._refreshing:
+                    self._refreshing = True
+                    Thread(target=self._refresh, name="docker-discovery", daemon=True).start()
+            if hosts:
+                return hosts
         
         hosts = self._perform_discovery()
         
@@ -246,15 +290,39 @@ class DockerClientDiscovery:
         
         return hosts
     
+    def _refresh(self):
+        try:
+            hosts = self._perform_discovery()
+            with self._lock:
+                self._cache = hosts
+                self._cache_time = time.time()
+        except Exception as e:
+            logger.error(f"Background host discovery failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
     def _perform_discovery(self) -> List[DockerHost]:
         configs = EnvironmentConfigParser.parse()
     
         if not configs:
-            return [self._create_fallback_host()]
+            started = time.monotonic()
+            host = self._create_fallback_host()
+            self._record_discovery(host, started)
+            return [host]
     
         hosts = []
-        with ThreadPoolExecutor(max_workers=len(configs)) as executor:
-            future_to_host = {executor.submit(self._create_host_from_config, config): config for config in configs}
+        reachable = []
+        for config in configs:
+            # Hosts with an open circuit cost nothing here; the prober brings them back.
+            if self.breakers.get(config.url, config.name).allow_request():
+                reachable.append(config)
+            else:
+                hosts.append(self._create_inactive_host(config))
+                self._schedule_probe(config)
+
+        with ThreadPoolExecutor(max_workers=max(len(reachable), 1)) as executor:
+            future_to_host = {executor.submit(self._create_host_from_config, config): config for config in reachable}
             for future in as_completed(future_to_host):
                 config = future_to_host[future]
                 try:
@@ -268,17 +336,63 @@ class DockerClientDiscovery:
                     hosts.append(self._create_inactive_host(config))
     
         hosts.sort(key=lambda h: h.order)
+        with self._lock:
+            configured = {config.url for config in configs}
+            for url in [url for url in self._clients if url not in configured]:
+                del self._clients[url]
+                self._api_names.pop(url, None)
         return hosts
     
     
     def _create_host_from_config(self, config: DockerHostConfig) -> DockerHost:
+        breaker = self.breakers.get(config.url, config.name)
+        started = time.monotonic()
         try:
-            client = self.client_factory.create_client(config.url)
+            with deadline(self.discovery_timeout, config.name, "discovery"):
+                host = self._connect_host(config, breaker)
+        except Exception as e:
+            logger.debug(f"Failed to create client for '{config.name}': {e}")
+            host = self._create_inactive_host(config)
+        self._record_discovery(host, started)
+
+        if host.status is HostStatus.INACTIVE:
+            breaker.record_failure()
+            if not breaker.allow_request():
+                self._schedule_probe(config)
+        return host
 
-            if self.client_factory.test_connection(client):
+    @staticmethod
+    def _record_discovery(host: DockerHost, started: float):
+        metrics.observe('dockpeek_host_discovery_duration_seconds', time.monotonic() - started,
+                        host=host.name, status=host.status.value)
+        if host.status is HostStatus.ACTIVE:
+            _label_host_metrics(host.client, host.name)
+
+    def _connect_host(self, config: DockerHostConfig, breaker) -> DockerHost:
+        # Reusing the previous client keeps its connection pool warm across refreshes.
+        with self._lock:
+            client = self._clients.get(config.url)
+        try:
+            # Budget derived from the host's observed latency, so a half-dead host fails fast.
+            with deadline(breaker.timeout(), config.name, "connect"):
+                if client is None:
+                    client = self.client_factory.create_client(config.url)
+                started = time.monotonic()
+                connected = self.client_factory.test_connection(client, config.name)
+                latency = time.monotonic() - started
+
+            if connected:
+                breaker.record_success(latency)
+                with self._lock:
+                    self._clients[config.url] = client
+                    api_name = self._api_names.get(config.url)
                 host_name = config.name
                 if host_name in [f"server{config.order}", "default"] and config.order > 0:
-                    api_name = self.client_factory.get_host_name_from_api(client)
+                    if api_name is None:
+                        api_name = self.client_factory.get_host_name_from_api(client, config.name)
+                        if api_name:
+                            with self._lock:
+                                self._api_names[config.url] = api_name
                     if api_name:
                         host_name = api_name
 
@@ -294,10 +408,12 @@ class DockerClientDiscovery:
                 )
             else:
                 logger.warning(f"Could not connect to Docker host '{config.name}' at {config.url}")
-                return self._create_inactive_host(config)
         except Exception as e:
             logger.debug(f"Failed to create client for '{config.name}': {e}")
-            return self._create_inactive_host(config)
+
+        with self._lock:
+            self._clients.pop(config.url, None)
+        return self._create_inactive_host(config)
     
     def _create_inactive_host(self, config: DockerHostConfig) -> DockerHost:
         return DockerHost(
@@ -315,14 +431,24 @@ class DockerClientDiscovery:
         public_hostname = os.environ.get("DOCKER_HOST_PUBLIC_HOSTNAME", "")
         url = "unix:///var/run/docker.sock"
 
+        with self._lock:
+            client = self._clients.get(url)
         try:
-            client = self.client_factory.create_default_client()
-
-            if self.client_factory.test_connection(client):
-                if not fallback_name:
-                    api_name = self.client_factory.get_host_name_from_api(client)
-                    fallback_name = api_name or "default"
-
+            with deadline(self.discovery_timeout, fallback_name or "default", "discovery"):
+                if client is None:
+                    client = self.client_factory.create_default_client()
+                is_connected = self.client_factory.test_connection(client, fallback_name or "default")
+                if is_connected and not fallback_name:
+                    with self._lock:
+                        fallback_name = self._api_names.get(url)
+                    if not fallback_name:
+                        fallback_name = self.client_factory.get_host_name_from_api(client) or "default"
+                        with self._lock:
+                            self._api_names[url] = fallback_name
+
+            if is_connected:
+                with self._lock:
+                    self._clients[url] = client
                 logger.debug(f"Connected to default Docker socket")
                 return DockerHost(
                     name=fallback_name,
@@ -336,6 +462,8 @@ class DockerClientDiscovery:
         except Exception as e:
             logger.warning(f"Could not connect to default Docker socket: {e}")
 
+        with self._lock:
+            self._clients.pop(url, None)
         return DockerHost(
             name=fallback_name or "default",
             client=None,
@@ -346,57 +474,108 @@ class DockerClientDiscovery:
             order=0
         )
     
+    def _hosts_from_snapshot(self) -> Optional[List[DockerHost]]:
+        # The collector has already probed every host; workers only need a client
+        # for the actions they perform themselves.
+        index = self._snapshot_store.read_index()
+        if index is None:
+            return None
+
+        hosts = []
+        for entry in index['hosts']:
+            status = HostStatus(entry['status'])
+            client = None
+            if status == HostStatus.ACTIVE:
+                with self._lock:
+                    client = self._snapshot_clients.get(entry['url'])
+                    if client is None:
+                        try:
+                            client = self.client_factory.create_client(entry['url'])
+                            self._snapshot_clients[entry['url']] = client
+                            _label_host_metrics(client, entry['name'])
+                        except Exception as e:
+                            logger.debug(f"Failed to create client for '{entry['name']}': {e}")
+                            status = HostStatus.INACTIVE
+            hosts.append(DockerHost(
+                name=entry['name'],
+                client=client,
+                url=entry['url'],
+                public_hostname=entry['public_hostname'],
+                status=status,
+                is_docker_host=entry['is_docker_host'],
+                order=entry['order']
+            ))
+        return hosts
+
+    def api_version(self, url: str) -> Optional[str]:
+        with self._lock:
+            client = self._clients.get(url) or self._snapshot_clients.get(url)
+        return client.api.api_version if client is not None else None
+
     def invalidate_cache(self):
+        # Marks the hosts stale; the next discover() still answers from them while refreshing.
         with self._lock:
-            self._cache = None
             self._cache_time = 0
 
+    def _schedule_probe(self, config: DockerHostConfig):
+        with self._lock:
+            self._probe_configs[config.url] = config
+            if self._probe_thread is None:
+                self._probe_thread = Thread(target=self._probe_loop, name="docker-host-prober", daemon=True)
+                self._probe_thread.start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.PROBE_INTERVAL)
+            with self._lock:
+                configs = list(self._probe_configs.values())
+                if not configs:
+                    self._probe_thread = None
+                    return
+
+            for config in configs:
+                breaker = self.breakers.get(config.url, config.name)
+                if breaker.allow_request():
+                    recovered = True
+                elif breaker.probe_due():
+                    recovered = self._create_host_from_config(config).status is HostStatus.ACTIVE
+                else:
+                    continue
+
+                if recovered:
+                    with self._lock:
+                        self._probe_configs.pop(config.url, None)
+                    self.invalidate_cache()
+
 
 class ContainerStatusExtractor:
     @staticmethod
-    def get_status_with_exit_code(container, timeout: float = 5.0) -> Tuple[str, Optional[int]]:
+    def get_status_with_exit_code(container) -> Tuple[str, Optional[int]]:
+        # Reads only the attrs already fetched with the container, so no API call can block here.
         try:
-            import signal
-            
-            def timeout_handler(signum, frame):
-                raise TimeoutError("Container attrs fetch timeout")
-            
-            if hasattr(signal, 'SIGALRM'):
-                old_handler = signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(int(timeout))
-            
-            try:
-                base_status = container.status
-                state = container.attrs.get('State', {})
-                exit_code = state.get('ExitCode')
-                
-                if base_status in ['exited', 'dead']:
-                    return base_status, exit_code
-                
-                if base_status in ['paused', 'restarting', 'removing', 'created']:
-                    return base_status, None
-                
-                if base_status == 'running':
-                    health = state.get('Health', {})
-                    if health:
-                        health_status = health.get('Status', '')
-                        if health_status == 'healthy':
-                            return 'healthy', None
-                        if health_status == 'unhealthy':
-                            return 'unhealthy', exit_code
-                        if health_status == 'starting':
-                            return 'starting', None
-                    return 'running', None
-                
+            base_status = container.status
+            state = container.attrs.get('State', {})
+            exit_code = state.get('ExitCode')
+
+            if base_status in ['exited', 'dead']:
+                return base_status, exit_code
+
+            if base_status in ['paused', 'restarting', 'removing', 'created']:
                 return base_status, None
-            finally:
-                if hasattr(signal, 'SIGALRM'):
-                    signal.alarm(0)
-                    signal.signal(signal.SIGALRM, old_handler)
-                    
-        except TimeoutError:
-            logger.warning(f"Timeout getting status for container {getattr(container, 'name', 'unknown')}")
-            return 'timeout', None
+
+            if base_status == 'running':
+                health = state.get('Health', {})
+                if health:
+                    health_status = health.get('Status', '')
+                    if health_status == 'healthy':
+                        return 'healthy', None
+                    if health_status == 'unhealthy':
+                        return 'unhealthy', exit_code
+                    if health_status == 'starting':
+                        return 'starting', None
+                return 'running', None
+
+            return base_status, None
         except Exception as e:
             logger.warning(f"Error getting status for container {getattr(container, 'name', 'unknown')}: {e}")
             try:
@@ -416,12 +595,107 @@ def invalidate_docker_clients_cache():
     _discovery_instance.invalidate_cache()
 
 
+def get_host_circuit_states() -> Dict[str, Dict]:
+    return _discovery_instance.breakers.snapshot()
+
+
 def get_container_status_with_exit_code(container) -> Tuple[str, Optional[int]]:
     return ContainerStatusExtractor.get_status_with_exit_code(container)
 
-def create_streaming_client(server_url: str) -> DockerClient:
-    factory = DockerClientFactory(long_timeout=60)
-    return factory.create_client(server_url, use_long_timeout=True)
+class StreamingClientLease:
+    def __init__(self, client: DockerClient, on_release: Callable[[], None]):
+        self.client = client
+        self._on_release = on_release
+        self._released = False
+        self._lock = Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._on_release()
+
+    def __enter__(self) -> DockerClient:
+        return self.client
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class StreamingClientPool:
+    """One long-timeout client per host, shared by log streams and slow operations.
+
+    The client keeps its connections and the API version negotiated on first
+    use; a per-host semaphore bounds how many long-lived requests a daemon
+    sees at once.
+    """
+
+    ACQUIRE_TIMEOUT = 5.0
+
+    def __init__(self, client_factory: Optional[DockerClientFactory] = None, max_per_host: int = 10,
+                 version_lookup: Optional[Callable[[str], Optional[str]]] = None, name: str = 'streaming'):
+        self.client_factory = client_factory or DockerClientFactory(long_timeout=60)
+        self.max_per_host = max_per_host
+        self.version_lookup = version_lookup
+        self.name = name
+        self._clients: Dict[str, DockerClient] = {}
+        self._semaphores: Dict[str, BoundedSemaphore] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = Lock()
+        metrics.add_gauges(self._metric_gauges)
+
+    def acquire(self, url: str) -> StreamingClientLease:
+        with self._lock:
+            semaphore = self._semaphores.get(url)
+            if semaphore is None:
+                semaphore = self._semaphores[url] = BoundedSemaphore(self.max_per_host)
+
+        if not semaphore.acquire(timeout=self.ACQUIRE_TIMEOUT):
+            raise RuntimeError(f"Too many concurrent streaming requests to {url}")
+        try:
+            lease = StreamingClientLease(self._get_client(url), lambda: self._release(url, semaphore))
+        except Exception:
+            semaphore.release()
+            raise
+        with self._lock:
+            self._in_use[url] = self._in_use.get(url, 0) + 1
+        return lease
+
+    def _release(self, url: str, semaphore: BoundedSemaphore):
+        with self._lock:
+            self._in_use[url] -= 1
+        semaphore.release()
+
+    def _metric_gauges(self):
+        with self._lock:
+            in_use = [(url, count, self._clients.get(url)) for url, count in self._in_use.items()]
+        gauges = []
+        for url, count, client in in_use:
+            labels = {'executor': self.name, 'host': metrics.host_label(client.api.base_url if client else url)}
+            gauges.append(('dockpeek_executor_active', labels, count))
+            gauges.append(('dockpeek_executor_capacity', labels, self.max_per_host))
+        return gauges
+
+    def _get_client(self, url: str) -> DockerClient:
+        with self._lock:
+            client = self._clients.get(url)
+        if client is not None:
+            return client
+
+        # Pinning the version discovery already negotiated skips a /version round-trip.
+        version = self.version_lookup(url) if self.version_lookup else None
+        client = self.client_factory.create_client(url, use_long_timeout=True, version=version,
+                                                   max_pool_size=self.max_per_host)
+        with self._lock:
+            existing = self._clients.setdefault(url, client)
+        if existing is not client:
+            client.close()
+        return existing
+
+
+streaming_clients = StreamingClientPool(max_per_host=int(os.getenv('STREAMING_MAX_PER_HOST', '10')),
+                                       version_lookup=_discovery_instance.api_version)
 
 def _get_link_hostname(public_hostname: Optional[str], host_ip: Optional[str], 
                        is_docker_host: bool, request_hostname: Optional[str] = None) -> str:
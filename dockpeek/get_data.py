@@ -1,108 +1,32 @@
-import re
+import hashlib
 import logging
 from flask import current_app, request, has_request_context
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from .docker_utils import discover_docker_clients, get_container_status_with_exit_code, _get_link_hostname
 from .update import update_checker
+from .inventory import inventory_manager
+from .metrics import metrics
+from .label_pipeline import label_pipeline
 
 logger = logging.getLogger(__name__)
 
 
-def parse_comma_separated(value):
-    if not value:
-        return []
-    try:
-        return [item.strip() for item in value.split(',') if item.strip()]
-    except:
-        return []
-
-
-def extract_traefik_routes(labels, traefik_enabled):
-    if not traefik_enabled or labels.get('traefik.enable', '').lower() == 'false':
-        return []
-    
-    routes = []
-    for key, value in labels.items():
-        if key.startswith('traefik.http.routers.') and key.endswith('.rule'):
-            router_name = key.split('.')[3]
-            host_matches = re.findall(r'Host\(`([^`]+)`\)', value)
-            
-            for host_ in host_matches:
-                tls_key = f'traefik.http.routers.{router_name}.tls'
-                is_tls = labels.get(tls_key, '').lower() == 'true'
-                
-                entrypoints_key = f'traefik.http.routers.{router_name}.entrypoints'
-                entrypoints = labels.get(entrypoints_key, '')
-                
-                is_https_entrypoint = False
-                if entrypoints:
-                    entrypoint_list = [ep.strip().lower() for ep in entrypoints.split(',')]
-                    is_https_entrypoint = any(
-                        any(key in ep for key in ("https", "443", "secure", "ssl", "tls"))
-                        for ep in entrypoint_list
-                    )
-                
-                protocol = 'https' if is_tls or is_https_entrypoint else 'http'
-                url = f"{protocol}://{host_}"
-                
-                path_match = re.search(r'PathPrefix\(`([^`]+)`\)', value)
-                if path_match:
-                    url += path_match.group(1)
-                
-                routes.append({
-                    'router': router_name,
-                    'url': url,
-                    'rule': value,
-                    'host': host_
-                })
-    
-    return routes
-
-
-def should_use_https(port_str, container_port, https_ports_list):
-    return (
-        container_port == "443/tcp" or
-        port_str == "443" or
-        port_str.endswith("443") or
-        port_str in https_ports_list
-    )
-
-
-def create_port_link(port, https_ports_list, link_hostname, container_port=""):
-    is_https = should_use_https(port, container_port, https_ports_list)
-    protocol = "https" if is_https else "http"
-    
-    if port == "443":
-        return f"{protocol}://{link_hostname}"
-    else:
-        return f"{protocol}://{link_hostname}:{port}"
-
-
-def build_port_map(published_ports, custom_ports_list, https_ports_list, public_hostname, host_ip, is_docker_host, request_hostname=None):
+def render_port_map(port_specs, public_hostname, is_docker_host, request_hostname=None):
+    """Attach links to cached port specs; only the hostname depends on the request."""
+    hostnames = {}
     port_map = []
-
-    for container_port, host_port, protocol in published_ports:
-        link_hostname = _get_link_hostname(public_hostname, host_ip, is_docker_host, request_hostname)
-        link = create_port_link(host_port, https_ports_list, link_hostname, container_port)
-
+    for spec in port_specs:
+        link_hostname = hostnames.get(spec.host_ip)
+        if link_hostname is None:
+            link_hostname = hostnames[spec.host_ip] = _get_link_hostname(
+                public_hostname, spec.host_ip, is_docker_host, request_hostname)
+        protocol = "https" if spec.is_https else "http"
         port_map.append({
-            'container_port': container_port,
-            'host_port': host_port,
-            'link': link,
-            'is_custom': False
+            'container_port': spec.container_port,
+            'host_port': spec.host_port,
+            'link': f"{protocol}://{link_hostname}" if spec.host_port == "443" else f"{protocol}://{link_hostname}:{spec.host_port}",
+            'is_custom': spec.is_custom
         })
-
-    if custom_ports_list:
-        link_hostname = _get_link_hostname(public_hostname, None, is_docker_host, request_hostname)
-        for port in custom_ports_list:
-            link = create_port_link(port, https_ports_list, link_hostname)
-            port_map.append({
-                'container_port': '',
-                'host_port': port,
-                'link': link,
-                'is_custom': True
-            })
-
     return port_map
 
 
@@ -135,61 +59,33 @@ def extract_container_ports(container_attrs):
     return published_ports
 
 
-def extract_labels_data(labels, tags_enable):
-    stack_name = labels.get('com.docker.compose.project', '') or labels.get('com.docker.stack.namespace', '')
-    source_url = labels.get('org.opencontainers.image.source') or labels.get('org.opencontainers.image.url', '')
-    custom_url = labels.get('dockpeek.link', '')
-    custom_ports = labels.get('dockpeek.ports', '') or labels.get('dockpeek.port', '')
-    custom_tags = labels.get('dockpeek.tags', '') or labels.get('dockpeek.tag', '')
-    https_ports = labels.get('dockpeek.https', '')
-    port_range_grouping = labels.get('dockpeek.port-range-grouping', '')
+def get_or_check_update(client, container_or_service, server_name, image_name, is_swarm, image_lookup=None,
+                        update_records=None):
+    # Any stored result is worth showing; the TTL only decides when to pull again.
+    image_id = None if is_swarm else container_or_service.attrs.get('Image')
+    cached_update, _ = update_checker.get_cached_result(server_name, image_name, image_id, update_records)
     
-    tags = []
-    if tags_enable and custom_tags:
-        tags = parse_comma_separated(custom_tags)
-    
-    return {
-        'stack_name': stack_name,
-        'source_url': source_url,
-        'custom_url': custom_url,
-        'custom_ports_list': parse_comma_separated(custom_ports),
-        'https_ports_list': parse_comma_separated(https_ports),
-        'port_range_grouping': port_range_grouping.lower() if port_range_grouping else None,
-        'tags': tags
-    }
-
-
-def get_or_check_update(cache_key, client, container_or_service, server_name, image_name, is_swarm):
-    cached_update, is_cache_valid = update_checker.get_cached_result(cache_key)
-    
-    if cached_update is not None and is_cache_valid:
+    if cached_update is not None:
         return cached_update
     
     if is_swarm:
         return False
     else:
-        return update_checker.check_local_image_updates(client, container_or_service, server_name)
+        return update_checker.check_local_image_updates(client, container_or_service, server_name, image_lookup)
 
 
-def process_swarm_service(service, tasks_by_service, client, server_name, public_hostname, is_docker_host, traefik_enabled, tags_enable, port_range_grouping_enabled, request_hostname=None):
+def process_swarm_service(service, tasks_by_service, client, server_name, public_hostname, is_docker_host, traefik_enabled, tags_enable, port_range_grouping_enabled, request_hostname=None, update_records=None):
     try:
         s_attrs = service.attrs
         spec = s_attrs.get('Spec', {})
         labels = spec.get('Labels', {}) or {}
         image_name = spec.get('TaskTemplate', {}).get('ContainerSpec', {}).get('Image', 'unknown')
 
-        labels_data = extract_labels_data(labels, tags_enable)
-        traefik_routes = extract_traefik_routes(labels, traefik_enabled)
-        published_ports = extract_swarm_service_ports(s_attrs)
-        port_map = build_port_map(
-            published_ports,
-            labels_data['custom_ports_list'],
-            labels_data['https_ports_list'],
-            public_hostname,
-            None,
-            is_docker_host,
-            request_hostname
+        published_ports = [(cp, hp, None) for cp, hp, _ in extract_swarm_service_ports(s_attrs)]
+        labels_data, traefik_routes, port_specs = label_pipeline.derive(
+            service.id, labels, published_ports, traefik_enabled, tags_enable
         )
+        port_map = render_port_map(port_specs, public_hostname, is_docker_host, request_hostname)
 
         # Determine if port range grouping should be enabled for this container
         container_port_range_grouping = labels_data['port_range_grouping']
@@ -205,8 +101,8 @@ def process_swarm_service(service, tasks_by_service, client, server_name, public
         total = len(service_tasks)
         status = f"running ({running}/{total})" if total else "no-tasks"
 
-        cache_key = update_checker.get_cache_key(server_name, service.name, image_name)
-        update_available = get_or_check_update(cache_key, client, service, server_name, image_name, True)
+        update_available = get_or_check_update(client, service, server_name, image_name, True,
+                                               update_records=update_records)
 
         container_info = {
             'server': server_name,
@@ -235,51 +131,23 @@ def process_swarm_service(service, tasks_by_service, client, server_name, public
             'ports': []
         }
 
-def process_container(container, client, server_name, public_hostname, is_docker_host, traefik_enabled, tags_enable, port_range_grouping_enabled, request_hostname=None):
+def process_container(container, client, server_name, public_hostname, is_docker_host, traefik_enabled, tags_enable, port_range_grouping_enabled, request_hostname=None, image_lookup=None, update_records=None):
     try:
         original_image = container.attrs.get('Config', {}).get('Image', '')
         if original_image:
             image_name = original_image
         else:
-            if hasattr(container, 'image') and container.image:
-                if hasattr(container.image, 'tags') and container.image.tags:
-                    image_name = container.image.tags[0]
-                else:
-                    image_name = container.image.id[:12] if hasattr(container.image, 'id') else "unknown"
+            image_id = container.attrs.get('Image', '')
+            image_name = image_id.split(':', 1)[-1][:12] if image_id else "unknown"
 
         container_status, exit_code = get_container_status_with_exit_code(container)
         start_time = container.attrs.get('State', {}).get('StartedAt', '')
 
         labels = container.attrs.get('Config', {}).get('Labels', {}) or {}
-        labels_data = extract_labels_data(labels, tags_enable)
-        traefik_routes = extract_traefik_routes(labels, traefik_enabled)
-
-        published_ports_data = extract_container_ports(container.attrs)
-        published_ports = [(cp, hp, None) for cp, hp, hi in published_ports_data]
-        host_ips = {cp: hi for cp, hp, hi in published_ports_data}
-
-        port_map = []
-        for container_port, host_port, _ in published_ports:
-            host_ip = host_ips.get(container_port, '0.0.0.0')
-            link_hostname = _get_link_hostname(public_hostname, host_ip, is_docker_host, request_hostname)
-            link = create_port_link(host_port, labels_data['https_ports_list'], link_hostname, container_port)
-            port_map.append({
-                'container_port': container_port,
-                'host_port': host_port,
-                'link': link,
-                'is_custom': False
-            })
-
-        if labels_data['custom_ports_list']:
-            link_hostname = _get_link_hostname(public_hostname, None, is_docker_host, request_hostname)
-            for port in labels_data['custom_ports_list']:
-                link = create_port_link(port, labels_data['https_ports_list'], link_hostname)
-                port_map.append({
-                    'container_port': '',
-                    'host_port': port,
-                    'link': link,
-                    'is_custom': True
-                })
+        labels_data, traefik_routes, port_specs = label_pipeline.derive(
+            container.id, labels, extract_container_ports(container.attrs), traefik_enabled, tags_enable
+        )
+        port_map = render_port_map(port_specs, public_hostname, is_docker_host, request_hostname)
 
         # Determine if port range grouping should be enabled for this container
         container_port_range_grouping = labels_data['port_range_grouping']
@@ -290,8 +158,8 @@ def process_container(container, client, server_name, public_hostname, is_docker
             # Use per-container setting
             port_range_grouping = container_port_range_grouping == 'true'
 
-        cache_key = update_checker.get_cache_key(server_name, container.name, image_name)
-        update_available = get_or_check_update(cache_key, client, container, server_name, image_name, False)
+        update_available = get_or_check_update(client, container, server_name, image_name, False, image_lookup,
+                                               update_records)
 
         container_info = {
             'server': server_name,
@@ -322,7 +190,12 @@ def process_container(container, client, server_name, public_hostname, is_docker
             'ports': []
         }
     
-def process_single_host_data(host, traefik_enabled, tags_enable, port_range_grouping_enabled, request_hostname=None):
+def process_single_host_data(host, *args, **kwargs):
+    with metrics.time('dockpeek_host_processing_duration_seconds', host=host.get('name', 'unknown')):
+        return _process_single_host_data(host, *args, **kwargs)
+
+
+def _process_single_host_data(host, traefik_enabled, tags_enable, port_range_grouping_enabled, request_hostname=None, object_ids=None):
     if host['status'] == 'inactive':
         return []
 
@@ -335,26 +208,32 @@ def process_single_host_data(host, traefik_enabled, tags_enable, port_range_grou
         is_docker_host = host["is_docker_host"]
 
         try:
-            info = client.info()
-            is_swarm = info.get('Swarm', {}).get('LocalNodeState', '').lower() == 'active'
-        except Exception:
-            is_swarm = False
+            inventory = inventory_manager.sync_host(host)
+        except Exception as list_error:
+            logger.error(f"Failed to list containers on {server_name}: {list_error}")
+            return [{
+                'server': server_name,
+                'name': 'error',
+                'status': 'list-error',
+                'image': 'error-loading',
+                'ports': []
+            }]
 
-        if is_swarm:
+        if inventory.is_swarm:
             try:
-                services = client.services.list()
-                tasks = client.api.tasks()
-
-                tasks_by_service = {}
-                for t in tasks:
-                    sid = t['ServiceID']
-                    tasks_by_service.setdefault(sid, []).append(t)
+                services, tasks_by_service = inventory.swarm_state()
+                if object_ids is not None:
+                    services = [s for s in services if s.id in object_ids]
+                update_records = update_checker.preload_cached_results(server_name, [
+                    s.attrs.get('Spec', {}).get('TaskTemplate', {}).get('ContainerSpec', {}).get('Image')
+                    for s in services
+                ])
 
                 for service in services:
                     container_info = process_swarm_service(
                         service, tasks_by_service, client, server_name,
                         public_hostname, is_docker_host, traefik_enabled, tags_enable, port_range_grouping_enabled,
-                        request_hostname
+                        request_hostname, update_records
                     )
                     container_data.append(container_info)
             except Exception as swarm_error:
@@ -368,24 +247,20 @@ def process_single_host_data(host, traefik_enabled, tags_enable, port_range_grou
                 })
             return container_data
 
-        try:
-            containers = client.containers.list(all=True)
-        except Exception as list_error:
-            logger.error(f"Failed to list containers on {server_name}: {list_error}")
-            return [{
-                'server': server_name,
-                'name': 'error',
-                'status': 'list-error',
-                'image': 'error-loading',
-                'ports': []
-            }]
+        containers = inventory.containers()
+        if object_ids is not None:
+            containers = [c for c in containers if c.id in object_ids]
+        # One query for the host's stored results rather than one per container.
+        update_records = update_checker.preload_cached_results(
+            server_name, [c.attrs.get('Config', {}).get('Image') for c in containers]
+        )
 
         for container in containers:
             try:
                 container_info = process_container(
                     container, client, server_name, public_hostname,
                     is_docker_host, traefik_enabled, tags_enable, port_range_grouping_enabled,
-                    request_hostname
+                    request_hostname, image_lookup=inventory.image_id_for, update_records=update_records
                 )
                 container_data.append(container_info)
             except Exception as container_error:
@@ -411,14 +286,7 @@ def process_single_host_data(host, traefik_enabled, tags_enable, port_range_grou
 
     return container_data
 
-def get_all_data():
-    servers = discover_docker_clients()
-
-    TRAEFIK_ENABLE = current_app.config['TRAEFIK_ENABLE']
-    TAGS_ENABLE = current_app.config['TAGS_ENABLE']
-    PORT_RANGE_GROUPING = current_app.config['PORT_RANGE_GROUPING']
-    PORT_RANGE_THRESHOLD = current_app.config['PORT_RANGE_THRESHOLD']
-
+def _get_render_settings():
     request_hostname = None
     if has_request_context():
         try:
@@ -426,18 +294,97 @@ def get_all_data():
         except Exception:
             pass
 
+    return {
+        'traefik_enabled': current_app.config['TRAEFIK_ENABLE'],
+        'tags_enable': current_app.config['TAGS_ENABLE'],
+        'port_range_grouping': current_app.config['PORT_RANGE_GROUPING'],
+        'port_range_threshold': current_app.config['PORT_RANGE_THRESHOLD'],
+        'request_hostname': request_hostname
+    }
+
+
+def _get_server_list(servers):
+    return [{"name": s["name"], "status": s["status"], "order": s["order"], "url": s["url"]} for s in servers]
+
+
+def _get_swarm_servers(servers):
+    swarm_servers = []
+    for host in servers:
+        if host['status'] == 'inactive':
+            continue
+        inventory = inventory_manager.get_host_inventory(host)
+        if inventory.is_synced and inventory.is_swarm:
+            swarm_servers.append(host["name"])
+    return swarm_servers
+
+
+def get_data_revision():
+    """Opaque cursor covering every inventory and update-cache change seen so far."""
+    cache_epoch, cache_sequence = update_checker.get_cache_state_token()
+    return f"{inventory_manager.epoch}{cache_epoch}-{inventory_manager.revision}-{cache_sequence}"
+
+
+def parse_data_revision(revision):
+    try:
+        epoch, inventory_revision, update_sequence = revision.split('-')
+    except (AttributeError, ValueError):
+        return None
+    if epoch != f"{inventory_manager.epoch}{update_checker.cache_epoch}":
+        return None
+    try:
+        return int(inventory_revision), int(update_sequence)
+    except ValueError:
+        return None
+
+
+def get_data_etag():
+    """ETag for the current /data payload, or None while any host is still unsynced."""
+    servers = discover_docker_clients()
+    settings = _get_render_settings()
+
+    parts = [inventory_manager.epoch, inventory_manager.revision, update_checker.get_cache_state_token(),
+             sorted(settings.items())]
+    for host in servers:
+        parts.append((host['name'], host['status'], host['order'], host['url']))
+        if host['status'] == 'inactive':
+            continue
+        inventory = inventory_manager.get_host_inventory(host)
+        if not inventory.is_synced:
+            return None
+        try:
+            inventory.ensure_synced(host['client'])
+        except Exception:
+            return None
+
+    # Swarm refreshes above may have moved the inventory revision on.
+    parts.append(inventory_manager.revision)
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def get_all_data():
+    with metrics.time('dockpeek_get_all_data_duration_seconds'):
+        return _get_all_data()
+
+
+def _get_all_data():
+    servers = discover_docker_clients()
+    settings = _get_render_settings()
+    revision = get_data_revision()
+
     if not servers:
-        return {"servers": [], "containers": [], "swarm_servers": []}
+        return {"servers": [], "containers": [], "swarm_servers": [], "revision": revision}
 
     all_container_data = []
-    swarm_servers = []
-    server_list_for_json = [{"name": s["name"], "status": s["status"], "order": s["order"], "url": s["url"]} for s in servers]
+    server_list_for_json = _get_server_list(servers)
 
     HOST_PROCESSING_TIMEOUT = 30.0
 
     with ThreadPoolExecutor(max_workers=len(servers)) as executor:
         future_to_host = {
-            executor.submit(process_single_host_data, host, TRAEFIK_ENABLE, TAGS_ENABLE, PORT_RANGE_GROUPING, request_hostname): host 
+            executor.submit(
+                process_single_host_data, host, settings['traefik_enabled'], settings['tags_enable'],
+                settings['port_range_grouping'], settings['request_hostname']
+            ): host
             for host in servers
         }
 
@@ -447,16 +394,6 @@ def get_all_data():
                 host_containers = future.result(timeout=HOST_PROCESSING_TIMEOUT)
                 all_container_data.extend(host_containers)
 
-                if host['status'] != 'inactive':
-                    try:
-                        client = host["client"]
-                        info = client.info()
-                        is_swarm = info.get('Swarm', {}).get('LocalNodeState', '').lower() == 'active'
-                        if is_swarm:
-                            swarm_servers.append(host["name"])
-                    except:
-                        pass
-
             except FuturesTimeoutError:
                 logger.error(f"Timeout processing host {host['name']} after {HOST_PROCESSING_TIMEOUT}s")
                 for s in server_list_for_json:
@@ -480,8 +417,117 @@ def get_all_data():
     return {
         "servers": server_list_for_json, 
         "containers": all_container_data,
-        "traefik_enabled": TRAEFIK_ENABLE,
-        "port_range_grouping_enabled": PORT_RANGE_GROUPING,
-        "port_range_threshold": PORT_RANGE_THRESHOLD,
-        "swarm_servers": swarm_servers
-    }
\ No newline at end of file
+        "traefik_enabled": settings['traefik_enabled'],
+        "port_range_grouping_enabled": settings['port_range_grouping'],
+        "port_range_threshold": settings['port_range_threshold'],
+        "swarm_servers": _get_swarm_servers(servers),
+        "revision": revision
+    }
+
+
+def get_delta_data(since):
+    servers = discover_docker_clients()
+    settings = _get_render_settings()
+    revision = get_data_revision()
+    reset = {"revision": revision, "reset": True}
+
+    parsed = parse_data_revision(since)
+    if parsed is None:
+        return reset
+    inventory_revision, update_sequence = parsed
+
+    added, changed, removed = [], [], []
+    for host in servers:
+        if host['status'] == 'inactive':
+            continue
+        try:
+            inventory = inventory_manager.sync_host(host)
+        except Exception as e:
+            logger.error(f"Error computing delta for {host['name']}: {e}")
+            return reset
+
+        changes = inventory.changes_since(inventory_revision)
+        if changes is None:
+            return reset
+
+        added_ids = set(changes['added'])
+        object_ids = added_ids | set(changes['changed'])
+        update_changes = update_checker.get_changed_containers(update_sequence, {host['name']: inventory.containers()})
+        for _, name in update_changes:
+            obj = inventory.find_by_name(name)
+            if obj is not None:
+                object_ids.add(obj.id)
+
+        if object_ids:
+            added_short_ids = {object_id[:12] for object_id in added_ids}
+            records = process_single_host_data(
+                host, settings['traefik_enabled'], settings['tags_enable'],
+                settings['port_range_grouping'], settings['request_hostname'], object_ids=object_ids
+            )
+            for record in records:
+                if record.get('container_id') in added_short_ids:
+                    added.append(record)
+                else:
+                    changed.append(record)
+
+        removed.extend({'server': host['name'], 'name': name} for name in changes['removed'])
+
+    return {
+        "revision": revision,
+        "reset": False,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "servers": _get_server_list(servers),
+        "swarm_servers": _get_swarm_servers(servers)
+    }
+
+
+def get_host_statuses(host):
+    inventory = inventory_manager.sync_host(host)
+    statuses = []
+
+    if inventory.is_swarm:
+        services, tasks_by_service = inventory.swarm_state()
+        for service in services:
+            service_tasks = tasks_by_service.get(service.id, [])
+            running = sum(1 for t in service_tasks if t['Status']['State'] == 'running')
+            total = len(service_tasks)
+            status = f"running ({running}/{total})" if total else "no-tasks"
+
+            statuses.append({
+                'server': host['name'],
+                'name': service.name,
+                'status': status,
+                'exit_code': None,
+                'started_at': None
+            })
+        return statuses
+
+    for container in inventory.containers():
+        container_status, exit_code = get_container_status_with_exit_code(container)
+        start_time = container.attrs.get('State', {}).get('StartedAt', '')
+
+        statuses.append({
+            'server': host['name'],
+            'name': container.name,
+            'status': container_status,
+            'exit_code': exit_code,
+            'started_at': start_time
+        })
+    return statuses
+
+
+def get_status_data():
+    statuses = []
+
+    for server in discover_docker_clients():
+        if server['status'] != 'active':
+            continue
+
+        try:
+            statuses.extend(get_host_statuses(server))
+        except Exception as e:
+            logger.error(f"Error getting status from {server['name']}: {e}")
+
+    return statuses
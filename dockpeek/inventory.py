@@ -0,0 +1,678 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import docker
+from docker.client import DockerClient
+from docker.models.containers import Container
+from docker.models.services import Service
+
+from config import Config
+
+from .docker_utils import DockerClientFactory
+from .deadline import deadline
+from .container_listing import ContainerSummaryAdapter, list_containers
+from .shared_snapshot import SnapshotStore, get_snapshot_dir, is_snapshot_reader
+from .registry import normalize_reference
+from .dependency_graph import DependencyGraph
+
+logger = logging.getLogger(__name__)
+
+
+CONTAINER_EVENT_ACTIONS = [
+    'create', 'start', 'restart', 'die', 'destroy', 'rename',
+    'health_status', 'pause', 'unpause', 'update', 'oom'
+]
+SERVICE_EVENT_ACTIONS = ['create', 'update', 'remove']
+IMAGE_EVENT_ACTIONS = ['pull', 'tag', 'untag', 'delete', 'load', 'import']
+
+
+def _container_signature(attrs: Dict) -> Tuple:
+    """The parts of a container's attrs that end up in a rendered record."""
+    state = attrs.get('State', {}) or {}
+    status = state.get('Status', '')
+    health = (state.get('Health') or {}).get('Status')
+    exit_code = state.get('ExitCode') if status in ('exited', 'dead') else None
+    started_at = state.get('StartedAt') if status in ContainerSummaryAdapter.STATES_WITH_UPTIME else None
+    config = attrs.get('Config', {}) or {}
+    host_config = attrs.get('HostConfig', {}) or {}
+    ports = (attrs.get('NetworkSettings', {}) or {}).get('Ports') or {}
+
+    return (
+        attrs.get('Name'),
+        status,
+        health,
+        exit_code,
+        started_at,
+        attrs.get('Image'),
+        config.get('Image'),
+        tuple(sorted((config.get('Labels') or {}).items())),
+        tuple(sorted(
+            (port, tuple((m.get('HostIp'), m.get('HostPort')) for m in mappings or []))
+            for port, mappings in ports.items()
+        )),
+        host_config.get('NetworkMode'),
+        tuple(host_config.get('VolumesFrom') or ()),
+    )
+
+
+def _trim_container_attrs(attrs: Dict) -> Dict:
+    """Keep only what rendering needs, so snapshots stay small."""
+    state = attrs.get('State', {}) or {}
+    config = attrs.get('Config', {}) or {}
+    host_config = attrs.get('HostConfig', {}) or {}
+    trimmed_state = {k: state[k] for k in ('Status', 'ExitCode', 'StartedAt') if k in state}
+    if state.get('Health'):
+        trimmed_state['Health'] = {'Status': state['Health'].get('Status')}
+
+    return {
+        'Id': attrs.get('Id'),
+        'Name': attrs.get('Name'),
+        'Image': attrs.get('Image'),
+        'Created': attrs.get('Created'),
+        'State': trimmed_state,
+        'Config': {'Image': config.get('Image'), 'Labels': config.get('Labels') or {}},
+        'HostConfig': {'NetworkMode': host_config.get('NetworkMode'), 'VolumesFrom': host_config.get('VolumesFrom')},
+        'NetworkSettings': {'Ports': (attrs.get('NetworkSettings', {}) or {}).get('Ports') or {}},
+    }
+
+
+def _service_signature(service, tasks: List[Dict]) -> Tuple:
+    return (
+        repr(service.attrs.get('Spec')),
+        repr(service.attrs.get('Endpoint')),
+        tuple(sorted((t.get('ID'), t['Status']['State']) for t in tasks)),
+    )
+
+
+class HostInventory:
+    """In-memory model of a single Docker host, kept current by its /events stream.
+
+    Every record carries the revision at which it was created and last changed,
+    and removals leave a tombstone, so callers can ask what changed since a
+    revision they have already seen.
+    """
+
+    EVENTS_WINDOW = 60
+    RESYNC_INTERVAL = 300
+    SWARM_REFRESH_INTERVAL = 10
+    RECONNECT_BACKOFF_MAX = 60
+    MAX_TOMBSTONES = 1000
+
+    def __init__(self, name: str, url: str, client_factory: DockerClientFactory,
+                 next_revision: Callable[[], int]):
+        self.name = name
+        self.url = url
+        self.client_factory = client_factory
+        self.is_swarm = False
+        self.revision = 0
+        self.image_revision = 0
+        self._next_revision = next_revision
+        self._lock = Lock()
+        self._sync_lock = Lock()
+        self._objects = {}
+        self._signatures = {}
+        self._records = {}
+        self._tasks_by_service = {}
+        self._tombstones = deque()
+        self._tombstone_floor = 0
+        self._synced = False
+        self._synced_at = 0
+        self._swarm_synced_at = 0
+        self._swarm_dirty = False
+        self._client = None
+        self._watcher = None
+        self._stop_event = threading.Event()
+        self._image_lock = Lock()
+        self._image_index = {}
+        self._image_index_revision = None
+        self._graph = DependencyGraph()
+        self._volumes_from = {}
+
+    @property
+    def is_synced(self) -> bool:
+        return self._synced
+
+    def ensure_synced(self, client: DockerClient):
+        self._client = client
+        with self._sync_lock:
+            if not self._synced:
+                self._full_sync(client)
+            elif self.is_swarm and self._swarm_is_stale():
+                self._sync_swarm(client)
+        self._start_watcher()
+
+    def refresh_swarm_if_stale(self):
+        """Swarm task state has no events; re-read it when it gets old."""
+        if not (self._synced and self.is_swarm and self._client is not None):
+            return
+        with self._sync_lock:
+            if self._swarm_is_stale():
+                self._sync_swarm(self._client)
+
+    def containers(self) -> List:
+        with self._lock:
+            return [] if self.is_swarm else list(self._objects.values())
+
+    def swarm_state(self) -> Tuple[List, Dict[str, List]]:
+        with self._lock:
+            if not self.is_swarm:
+                return [], {}
+            return list(self._objects.values()), dict(self._tasks_by_service)
+
+    def find_by_name(self, name: str):
+        with self._lock:
+            return next((obj for obj in self._objects.values() if obj.name == name), None)
+
+    def get_objects(self, object_ids) -> List:
+        with self._lock:
+            return [self._objects[oid] for oid in object_ids if oid in self._objects]
+
+    def get_tasks(self, service_id: str) -> List[Dict]:
+        with self._lock:
+            return list(self._tasks_by_service.get(service_id, []))
+
+    def dependency_graph(self) -> DependencyGraph:
+        return self._graph
+
+    def image_id_for(self, reference: str) -> Optional[str]:
+        """Local image id for a tag or digest reference, without a daemon round-trip per lookup."""
+        return self._current_image_index().get(normalize_reference(reference))
+
+    def _current_image_index(self) -> Dict[str, str]:
+        # Rebuilt from a single image listing whenever an image event or a full sync has moved image_revision.
+        with self._image_lock:
+            revision = self.image_revision
+            if self._image_index_revision != revision and self._client is not None and not self.is_swarm:
+                try:
+                    with deadline(self.client_factory.api_timeout, self.name, "image listing"):
+                        self._image_index = self._build_image_index(self._client)
+                    self._image_index_revision = revision
+                except Exception as e:
+                    logger.debug(f"[{self.name}] Could not list images: {e}")
+            return self._image_index
+
+    @staticmethod
+    def _build_image_index(client: DockerClient) -> Dict[str, str]:
+        index = {}
+        for image in client.api.images():
+            for reference in (image.get('RepoTags') or []) + (image.get('RepoDigests') or []):
+                if not reference.startswith('<none>'):
+                    index[normalize_reference(reference)] = image['Id']
+        return index
+
+    def changes_since(self, revision: int) -> Optional[Dict]:
+        """Records created, changed and removed after ``revision``.
+
+        Returns None when tombstones older than ``revision`` have already been
+        discarded and the caller has to start over from a full snapshot.
+        """
+        with self._lock:
+            if revision < self._tombstone_floor:
+                return None
+            added, changed = [], []
+            for object_id, (created, updated) in self._records.items():
+                if created > revision:
+                    added.append(object_id)
+                elif updated > revision:
+                    changed.append(object_id)
+            removed = [name for rev, name in self._tombstones if rev > revision]
+            return {'added': added, 'changed': changed, 'removed': removed}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def export(self) -> Dict:
+        """Serializable copy of the model, as published to snapshot readers."""
+        images = self._current_image_index()
+        with self._lock:
+            objects = []
+            for object_id, obj in self._objects.items():
+                created, updated = self._records.get(object_id, (0, 0))
+                if self.is_swarm:
+                    attrs = {k: obj.attrs.get(k) for k in ('ID', 'Spec', 'Endpoint')}
+                else:
+                    attrs = _trim_container_attrs(obj.attrs)
+                objects.append({'id': object_id, 'attrs': attrs, 'created': created, 'updated': updated})
+
+            return {
+                'name': self.name,
+                'url': self.url,
+                'synced': self._synced,
+                'is_swarm': self.is_swarm,
+                'revision': self.revision,
+                'image_revision': self.image_revision,
+                'tombstone_floor': self._tombstone_floor,
+                'tombstones': list(self._tombstones),
+                'tasks_by_service': self._tasks_by_service if self.is_swarm else {},
+                'images': images,
+                'objects': objects,
+            }
+
+    def _swarm_is_stale(self) -> bool:
+        return self._swarm_dirty or (time.time() - self._swarm_synced_at) >= self.SWARM_REFRESH_INTERVAL
+
+    def _full_sync(self, client: DockerClient):
+        started_at = time.time()
+        with deadline(self.client_factory.api_timeout, self.name, "inventory sync"):
+            try:
+                info = client.info()
+                is_swarm = info.get('Swarm', {}).get('LocalNodeState', '').lower() == 'active'
+            except Exception:
+                is_swarm = False
+
+            if is_swarm != self.is_swarm:
+                with self._lock:
+                    self._replace_all({}, {})
+                self.is_swarm = is_swarm
+
+            if is_swarm:
+                self._sync_swarm(client)
+            else:
+                containers = list_containers(client, all=True, with_state=True)
+                with self._lock:
+                    for c in containers:
+                        self._track_volumes_from(c.attrs)
+                    self._replace_all(
+                        {c.id: c for c in containers},
+                        {c.id: _container_signature(c.attrs) for c in containers}
+                    )
+
+        # Image events missed while the stream was down would otherwise leave the tag index stale.
+        self.image_revision = self._next_revision()
+        self._synced_at = started_at
+        self._synced = True
+        logger.debug(f"[{self.name}] Inventory synced in {time.time() - started_at:.2f}s")
+
+    def _sync_swarm(self, client: DockerClient):
+        started_at = time.time()
+        with deadline(self.client_factory.api_timeout, self.name, "swarm sync"):
+            services = client.services.list()
+            tasks = client.api.tasks()
+
+        tasks_by_service = {}
+        for t in tasks:
+            tasks_by_service.setdefault(t['ServiceID'], []).append(t)
+
+        with self._lock:
+            self._tasks_by_service = tasks_by_service
+            self._replace_all(
+                {s.id: s for s in services},
+                {s.id: _service_signature(s, tasks_by_service.get(s.id, [])) for s in services}
+            )
+        self._swarm_synced_at = started_at
+        self._swarm_dirty = False
+
+    def _replace_all(self, objects: Dict, signatures: Dict):
+        for object_id in [oid for oid in self._objects if oid not in objects]:
+            self._remove(object_id)
+        for object_id, obj in objects.items():
+            self._upsert(object_id, obj, signatures[object_id])
+
+    def _track_volumes_from(self, attrs: Dict):
+        # Summaries leave VolumesFrom out, but it never changes, so one inspect per container is enough.
+        host_config = attrs.setdefault('HostConfig', {})
+        if 'VolumesFrom' in host_config:
+            host_config['VolumesFrom'] = host_config['VolumesFrom'] or []
+            self._volumes_from[attrs['Id']] = host_config['VolumesFrom']
+        elif attrs['Id'] in self._volumes_from:
+            host_config['VolumesFrom'] = self._volumes_from[attrs['Id']]
+
+    def _learn_volumes_from(self, client: DockerClient):
+        with self._lock:
+            unknown = [] if self.is_swarm else [
+                object_id for object_id in self._objects if object_id not in self._volumes_from
+            ]
+        for object_id in unknown:
+            if self._stop_event.is_set():
+                return
+            try:
+                with deadline(self.client_factory.api_timeout, self.name, f"inspect {object_id[:12]}"):
+                    attrs = client.api.inspect_container(object_id)
+            except Exception as e:
+                logger.debug(f"[{self.name}] Could not inspect {object_id[:12]}: {e}")
+                continue
+            with self._lock:
+                obj = self._objects.get(object_id)
+                if obj is None or self.is_swarm:
+                    continue
+                obj.attrs.setdefault('HostConfig', {})['VolumesFrom'] = (attrs.get('HostConfig') or {}).get('VolumesFrom')
+                self._track_volumes_from(obj.attrs)
+                self._upsert(object_id, obj, _container_signature(obj.attrs))
+
+    def _upsert(self, object_id: str, obj, signature: Tuple):
+        previous = self._objects.get(object_id)
+        self._objects[object_id] = obj
+        if previous is not None and self._signatures.get(object_id) == signature:
+            return
+        if not self.is_swarm:
+            self._graph.upsert(obj.attrs)
+
+        revision = self._next_revision()
+        if previous is not None and previous.name != obj.name:
+            self._add_tombstone(revision, previous.name)
+        created = self._records[object_id][0] if object_id in self._records else revision
+        self._signatures[object_id] = signature
+        self._records[object_id] = (created, revision)
+        self.revision = revision
+
+    def _remove(self, object_id: str):
+        obj = self._objects.pop(object_id, None)
+        self._signatures.pop(object_id, None)
+        self._records.pop(object_id, None)
+        self._volumes_from.pop(object_id, None)
+        self._graph.remove(object_id)
+        if obj is None:
+            return
+        revision = self._next_revision()
+        self._add_tombstone(revision, obj.name)
+        self.revision = revision
+
+    def _add_tombstone(self, revision: int, name: str):
+        self._tombstones.append((revision, name))
+        while len(self._tombstones) > self.MAX_TOMBSTONES:
+            self._tombstone_floor = self._tombstones.popleft()[0]
+
+    def _start_watcher(self):
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, name=f"inventory-{self.name}", daemon=True
+        )
+        self._watcher.start()
+
+    def _watch(self):
+        backoff = 1
+        while not self._stop_event.is_set():
+            client = None
+            try:
+                client = self.client_factory.create_watch_client(self.url, self.EVENTS_WINDOW + 10)
+                with self._sync_lock:
+                    if not self._synced or (time.time() - self._synced_at) >= self.RESYNC_INTERVAL:
+                        self._full_sync(client)
+                since = int(self._synced_at)
+                backoff = 1
+                self._learn_volumes_from(client)
+
+                while not self._stop_event.is_set():
+                    if (time.time() - self._synced_at) >= self.RESYNC_INTERVAL:
+                        break
+                    until = int(time.time()) + self.EVENTS_WINDOW
+                    for event in client.events(since=since, until=until, decode=True, filters=self._event_filters()):
+                        self._apply_event(client, event)
+                        if self._stop_event.is_set():
+                            break
+                    since = until
+            except Exception as e:
+                self._synced = False
+                logger.warning(f"[{self.name}] Event stream interrupted: {e}; retrying in {backoff}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.RECONNECT_BACKOFF_MAX)
+            finally:
+                if client is not None:
+                    try:
+                        client.close()
+                    except Exception:
+                        pass
+
+    @staticmethod
+    def _event_filters() -> Dict:
+        return {
+            'type': ['container', 'service', 'image'],
+            'event': sorted(set(CONTAINER_EVENT_ACTIONS) | set(SERVICE_EVENT_ACTIONS) | set(IMAGE_EVENT_ACTIONS)),
+        }
+
+    def _apply_event(self, client: DockerClient, event: Dict):
+        event_type = event.get('Type')
+        action = (event.get('Action') or '').split(':', 1)[0]
+        actor_id = event.get('id') or event.get('Actor', {}).get('ID')
+
+        if event_type == 'image':
+            if action in IMAGE_EVENT_ACTIONS:
+                self.image_revision = self._next_revision()
+            return
+
+        if event_type == 'service':
+            if action in SERVICE_EVENT_ACTIONS:
+                self._swarm_dirty = True
+            return
+
+        if event_type != 'container' or not actor_id or action not in CONTAINER_EVENT_ACTIONS:
+            return
+
+        if self.is_swarm:
+            self._swarm_dirty = True
+            return
+
+        if action == 'destroy':
+            with self._lock:
+                self._remove(actor_id)
+            return
+
+        try:
+            with deadline(self.client_factory.api_timeout, self.name, f"inspect {actor_id[:12]}"):
+                container = client.containers.get(actor_id)
+        except docker.errors.NotFound:
+            with self._lock:
+                self._remove(actor_id)
+            return
+
+        with self._lock:
+            self._track_volumes_from(container.attrs)
+            self._upsert(container.id, container, _container_signature(container.attrs))
+        logger.debug(f"[{self.name}] Inventory updated for {container.name} ({action})")
+
+
+class InventoryManager:
+    def __init__(self, client_factory: Optional[DockerClientFactory] = None):
+        self.client_factory = client_factory or DockerClientFactory()
+        self.epoch = uuid.uuid4().hex[:8]
+        self._hosts = {}
+        self._lock = Lock()
+        self._revision_changed = threading.Condition()
+        self._revision = 0
+
+    @property
+    def revision(self) -> int:
+        with self._revision_changed:
+            return self._revision
+
+    def next_revision(self) -> int:
+        with self._revision_changed:
+            self._revision += 1
+            self._revision_changed.notify_all()
+            return self._revision
+
+    def wait_for_revision(self, revision: int, timeout: float) -> int:
+        """Block until the revision moves past ``revision`` or ``timeout`` elapses."""
+        with self._revision_changed:
+            self._revision_changed.wait_for(lambda: self._revision > revision, timeout)
+            return self._revision
+
+    def hosts(self) -> List[HostInventory]:
+        with self._lock:
+            return list(self._hosts.values())
+
+    def get_host_inventory(self, host: Dict) -> HostInventory:
+        with self._lock:
+            inventory = self._hosts.get(host['url'])
+            if inventory is None:
+                inventory = HostInventory(host['name'], host['url'], self.client_factory, self.next_revision)
+                self._hosts[host['url']] = inventory
+            else:
+                inventory.name = host['name']
+            return inventory
+
+    def sync_host(self, host: Dict) -> HostInventory:
+        inventory = self.get_host_inventory(host)
+        inventory.ensure_synced(host['client'])
+        return inventory
+
+
+class SnapshotHostInventory:
+    """Read-only host inventory materialized from a collector snapshot."""
+
+    def __init__(self, data: Dict):
+        self.name = data['name']
+        self.url = data['url']
+        self.is_swarm = data['is_swarm']
+        self.revision = data['revision']
+        self.image_revision = data['image_revision']
+        self._synced = data['synced']
+        self._tombstone_floor = data['tombstone_floor']
+        self._tombstones = [tuple(t) for t in data['tombstones']]
+        self._tasks_by_service = data['tasks_by_service']
+        self._records = {o['id']: (o['created'], o['updated']) for o in data['objects']}
+        self._image_index = data.get('images', {})
+
+        model = Service if self.is_swarm else Container
+        self._objects = {o['id']: model(attrs=o['attrs']) for o in data['objects']}
+        self._graph = None
+
+    @property
+    def is_synced(self) -> bool:
+        return self._synced
+
+    def ensure_synced(self, client: DockerClient):
+        if not self._synced:
+            raise RuntimeError(f"Inventory for {self.name} is not available yet")
+
+    def refresh_swarm_if_stale(self):
+        pass
+
+    def containers(self) -> List:
+        return [] if self.is_swarm else list(self._objects.values())
+
+    def swarm_state(self) -> Tuple[List, Dict[str, List]]:
+        if not self.is_swarm:
+            return [], {}
+        return list(self._objects.values()), dict(self._tasks_by_service)
+
+    def find_by_name(self, name: str):
+        return next((obj for obj in self._objects.values() if obj.name == name), None)
+
+    def get_objects(self, object_ids) -> List:
+        return [self._objects[oid] for oid in object_ids if oid in self._objects]
+
+    def get_tasks(self, service_id: str) -> List[Dict]:
+        return list(self._tasks_by_service.get(service_id, []))
+
+    def image_id_for(self, reference: str) -> Optional[str]:
+        return self._image_index.get(normalize_reference(reference))
+
+    def dependency_graph(self) -> DependencyGraph:
+        # Built on first use; a new snapshot comes with a new instance.
+        if self._graph is None:
+            self._graph = DependencyGraph([] if self.is_swarm else [obj.attrs for obj in self._objects.values()])
+        return self._graph
+
+    def changes_since(self, revision: int) -> Optional[Dict]:
+        if revision < self._tombstone_floor:
+            return None
+        added, changed = [], []
+        for object_id, (created, updated) in self._records.items():
+            if created > revision:
+                added.append(object_id)
+            elif updated > revision:
+                changed.append(object_id)
+        removed = [name for rev, name in self._tombstones if rev > revision]
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+
+class SharedInventoryManager:
+    """Inventory manager for web workers: reads what the collector publishes."""
+
+    POLL_INTERVAL = 0.25
+    FIRST_SNAPSHOT_TIMEOUT = 10.0
+
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+        self._lock = Lock()
+        self._hosts = {}
+
+    def _index(self) -> Dict:
+        return self.store.read_index() or {'epoch': 'pending', 'revision': 0, 'hosts': []}
+
+    @property
+    def epoch(self) -> str:
+        return self._index()['epoch']
+
+    @property
+    def revision(self) -> int:
+        return self._index()['revision']
+
+    def wait_for_revision(self, revision: int, timeout: float) -> int:
+        deadline = time.time() + timeout
+        while True:
+            current = self.revision
+            if current > revision or time.time() >= deadline:
+                return current
+            time.sleep(min(self.POLL_INTERVAL, max(0.0, deadline - time.time())))
+
+    def _load_host(self, entry: Dict) -> Optional[SnapshotHostInventory]:
+        if not entry.get('file'):
+            return None
+        data = self.store.read_host(entry['file'])
+        if data is None:
+            return None
+        with self._lock:
+            cached = self._hosts.get(entry['url'])
+            if cached is not None and cached[0] is data:
+                return cached[1]
+            inventory = SnapshotHostInventory(data)
+            self._hosts[entry['url']] = (data, inventory)
+            return inventory
+
+    def hosts(self) -> List[SnapshotHostInventory]:
+        inventories = []
+        for entry in self._index()['hosts']:
+            inventory = self._load_host(entry)
+            if inventory is not None:
+                inventories.append(inventory)
+        return inventories
+
+    def get_host_inventory(self, host: Dict) -> SnapshotHostInventory:
+        entry = next((h for h in self._index()['hosts'] if h['url'] == host['url']), None)
+        inventory = self._load_host(entry) if entry else None
+        if inventory is None:
+            return SnapshotHostInventory({
+                'name': host['name'], 'url': host['url'], 'synced': False, 'is_swarm': False,
+                'revision': 0, 'image_revision': 0, 'tombstone_floor': 0, 'tombstones': [],
+                'tasks_by_service': {}, 'images': {}, 'objects': []
+            })
+        return inventory
+
+    def sync_host(self, host: Dict) -> SnapshotHostInventory:
+        deadline = time.time() + self.FIRST_SNAPSHOT_TIMEOUT
+        inventory = self.get_host_inventory(host)
+        while not inventory.is_synced and time.time() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            inventory = self.get_host_inventory(host)
+        inventory.ensure_synced(host.get('client'))
+        return inventory
+
+
+def _create_inventory_manager():
+    snapshot_dir = get_snapshot_dir()
+    if is_snapshot_reader():
+        logger.debug(f"Reading inventory snapshots from {snapshot_dir}")
+        return SharedInventoryManager(SnapshotStore(snapshot_dir))
+    return InventoryManager()
+
+
+inventory_manager = _create_inventory_manager()
+
+
+def get_dependency_graph(host: Dict) -> DependencyGraph:
+    """The host's dependency graph from its inventory, or from a fresh listing if that is unavailable."""
+    try:
+        return inventory_manager.sync_host(host).dependency_graph()
+    except Exception as e:
+        logger.debug(f"[{host['name']}] Inventory unavailable for dependency lookup: {e}")
+    with deadline(Config.DOCKER_API_TIMEOUT, host['name'], "container listing"):
+        return DependencyGraph([c.attrs for c in list_containers(host['client'])])
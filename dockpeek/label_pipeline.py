@@ -0,0 +1,161 @@
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+HOST_RULE_PATTERN = re.compile(r'Host\(`([^`]+)`\)')
+PATH_PREFIX_PATTERN = re.compile(r'PathPrefix\(`([^`]+)`\)')
+HTTPS_ENTRYPOINT_HINTS = ("https", "443", "secure", "ssl", "tls")
+ROUTER_PREFIX = 'traefik.http.routers.'
+
+
+def parse_comma_separated(value):
+    if not value:
+        return []
+    try:
+        return [item.strip() for item in value.split(',') if item.strip()]
+    except:
+        return []
+
+
+def extract_traefik_routes(labels, traefik_enabled):
+    if not traefik_enabled or labels.get('traefik.enable', '').lower() == 'false':
+        return []
+
+    routes = []
+    for key, value in labels.items():
+        if not (key.startswith(ROUTER_PREFIX) and key.endswith('.rule')):
+            continue
+        host_matches = HOST_RULE_PATTERN.findall(value)
+        if not host_matches:
+            continue
+
+        router_name = key.split('.')[3]
+        is_tls = labels.get(f'{ROUTER_PREFIX}{router_name}.tls', '').lower() == 'true'
+        entrypoints = labels.get(f'{ROUTER_PREFIX}{router_name}.entrypoints', '')
+        entrypoint_list = [ep.strip().lower() for ep in entrypoints.split(',')] if entrypoints else []
+        is_https_entrypoint = any(hint in ep for ep in entrypoint_list for hint in HTTPS_ENTRYPOINT_HINTS)
+        protocol = 'https' if is_tls or is_https_entrypoint else 'http'
+        path_match = PATH_PREFIX_PATTERN.search(value)
+        path = path_match.group(1) if path_match else ''
+
+        for host_ in host_matches:
+            routes.append({
+                'router': router_name,
+                'url': f"{protocol}://{host_}{path}",
+                'rule': value,
+                'host': host_
+            })
+
+    return routes
+
+
+def extract_labels_data(labels, tags_enable):
+    stack_name = labels.get('com.docker.compose.project', '') or labels.get('com.docker.stack.namespace', '')
+    source_url = labels.get('org.opencontainers.image.source') or labels.get('org.opencontainers.image.url', '')
+    custom_url = labels.get('dockpeek.link', '')
+    custom_ports = labels.get('dockpeek.ports', '') or labels.get('dockpeek.port', '')
+    custom_tags = labels.get('dockpeek.tags', '') or labels.get('dockpeek.tag', '')
+    https_ports = labels.get('dockpeek.https', '')
+    port_range_grouping = labels.get('dockpeek.port-range-grouping', '')
+
+    tags = []
+    if tags_enable and custom_tags:
+        tags = parse_comma_separated(custom_tags)
+
+    return {
+        'stack_name': stack_name,
+        'source_url': source_url,
+        'custom_url': custom_url,
+        'custom_ports_list': parse_comma_separated(custom_ports),
+        'https_ports_list': parse_comma_separated(https_ports),
+        'port_range_grouping': port_range_grouping.lower() if port_range_grouping else None,
+        'tags': tags
+    }
+
+
+def should_use_https(port_str, container_port, https_ports_list):
+    return (
+        container_port == "443/tcp" or
+        port_str == "443" or
+        port_str.endswith("443") or
+        port_str in https_ports_list
+    )
+
+
+class PortSpec(NamedTuple):
+    """A port link with everything but the hostname resolved."""
+    container_port: str
+    host_port: str
+    host_ip: Optional[str]
+    is_https: bool
+    is_custom: bool
+
+
+def build_port_specs(published_ports, custom_ports_list, https_ports_list) -> List[PortSpec]:
+    """``published_ports`` holds ``(container_port, host_port, host_ip)`` tuples."""
+    specs = [
+        PortSpec(container_port, host_port, host_ip,
+                 should_use_https(host_port, container_port, https_ports_list), False)
+        for container_port, host_port, host_ip in published_ports
+    ]
+    specs.extend(
+        PortSpec('', port, None, should_use_https(port, '', https_ports_list), True)
+        for port in custom_ports_list
+    )
+    return specs
+
+
+class DerivedLabels(NamedTuple):
+    labels_data: Dict
+    traefik_routes: List[Dict]
+    port_specs: List[PortSpec]
+
+
+class LabelPipeline:
+    """Caches what labels and published ports derive to, per object id.
+
+    An entry is reused while the object's labels, ports and the global label
+    settings are unchanged, which in practice means until it is recreated.
+    Callers must treat the returned values as read-only.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Tuple, DerivedLabels]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def derive(self, object_id: str, labels: Dict, published_ports: List[Tuple],
+               traefik_enabled: bool, tags_enable: bool) -> DerivedLabels:
+        fingerprint = (frozenset(labels.items()), tuple(published_ports), traefik_enabled, tags_enable)
+        with self._lock:
+            entry = self._entries.get(object_id)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(object_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        labels_data = extract_labels_data(labels, tags_enable)
+        derived = DerivedLabels(
+            labels_data,
+            extract_traefik_routes(labels, traefik_enabled),
+            build_port_specs(published_ports, labels_data['custom_ports_list'], labels_data['https_ports_list'])
+        )
+
+        with self._lock:
+            self._entries[object_id] = (fingerprint, derived)
+            self._entries.move_to_end(object_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return derived
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+label_pipeline = LabelPipeline()
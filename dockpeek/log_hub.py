@@ -0,0 +1,180 @@
+import os
+import json
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from threading import Lock
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import gevent
+
+from .docker_utils import streaming_clients
+from .logs_manager import stream_container_logs, stream_service_logs
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def encode_log_line(line: str) -> str:
+    return json.dumps({"line": line}) + "\n"
+
+
+class LogBatch(NamedTuple):
+    payload: str
+    skipped: int
+    ended: bool
+    error: Optional[str]
+
+
+class LogChannel:
+    """One upstream follow stream and a ring of its recent lines, already NDJSON-encoded.
+
+    Lines carry absolute sequence numbers; each subscriber keeps a cursor into
+    the ring, and one that falls behind by more than the ring holds skips the
+    oldest lines instead of holding up the others.
+    """
+
+    def __init__(self, key: Tuple, lease, name: str, is_swarm: bool, tail, capacity: int):
+        self.key = key
+        self.name = name
+        self.is_swarm = is_swarm
+        self.tail = tail
+        self.subscribers = 0
+        self.ended = False
+        self.error = None
+        self._lease = lease
+        self._lines = deque(maxlen=capacity)
+        self._first_seq = 0
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self._greenlet = None
+
+    def start(self):
+        self._greenlet = gevent.spawn(self._read)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill(block=False)
+
+    def _read(self):
+        stream_func = stream_service_logs if self.is_swarm else stream_container_logs
+        try:
+            for line in stream_func(self._lease.client, self.name, self.tail):
+                self._append(encode_log_line(line))
+        except Exception as e:
+            logger.error(f"Log stream for {self.name} failed: {e}")
+            self.error = str(e)
+        finally:
+            with self._cond:
+                self.ended = True
+                self._cond.notify_all()
+            self._lease.release()
+
+    def _append(self, record: str):
+        with self._cond:
+            if len(self._lines) == self._lines.maxlen:
+                self._first_seq += 1
+            self._lines.append(record)
+            self._next_seq += 1
+            self._cond.notify_all()
+
+    def replay_cursor(self, tail) -> int:
+        with self._cond:
+            try:
+                count = int(tail)
+            except (TypeError, ValueError):
+                count = len(self._lines)
+            return max(self._first_seq, self._next_seq - max(count, 0))
+
+    def read(self, cursor: int, timeout: float) -> Tuple[int, LogBatch]:
+        with self._cond:
+            if cursor >= self._next_seq and not self.ended:
+                self._cond.wait(timeout)
+            skipped = max(0, self._first_seq - cursor)
+            cursor = max(cursor, self._first_seq)
+            payload = ''.join(islice(self._lines, cursor - self._first_seq, None))
+            cursor = self._next_seq
+            return cursor, LogBatch(payload, skipped, self.ended, self.error)
+
+
+class LogSubscription:
+    def __init__(self, hub: 'LogHub', channel: LogChannel, cursor: int):
+        self._hub = hub
+        self._channel = channel
+        self._cursor = cursor
+        self._closed = False
+
+    def read(self, timeout: float) -> LogBatch:
+        self._cursor, batch = self._channel.read(self._cursor, timeout)
+        return batch
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._hub.unsubscribe(self._channel)
+
+
+class LogHub:
+    """Shares one upstream log stream per (host, container) between the viewers served by this worker.
+
+    Each gunicorn worker keeps its own hub, so viewers on different workers open separate streams.
+    """
+
+    def __init__(self, capacity: int = 2000):
+        self.capacity = capacity
+        self._channels: Dict[Tuple, LogChannel] = {}
+        self._lock = Lock()
+        metrics.add_gauges(self._metric_gauges)
+
+    def subscribe(self, url: str, name: str, is_swarm: bool, tail) -> LogSubscription:
+        key = (url, 'service' if is_swarm else 'container', name)
+        subscription = self._join(key, tail)
+        if subscription is not None:
+            return subscription
+
+        # Acquired outside the hub lock: it may wait for a free slot on the host.
+        lease = streaming_clients.acquire(url)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is not None and not channel.ended:
+                lease.release()
+            else:
+                channel = self._channels[key] = LogChannel(key, lease, name, is_swarm, tail, self.capacity)
+                channel.start()
+                logger.debug(f"Opened shared log stream for {name} on {url}")
+            channel.subscribers += 1
+            return LogSubscription(self, channel, channel.replay_cursor(tail))
+
+    def _join(self, key: Tuple, tail) -> Optional[LogSubscription]:
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None or channel.ended:
+                return None
+            channel.subscribers += 1
+            return LogSubscription(self, channel, channel.replay_cursor(tail))
+
+    def unsubscribe(self, channel: LogChannel):
+        with self._lock:
+            channel.subscribers -= 1
+            if channel.subscribers > 0:
+                return
+            if self._channels.get(channel.key) is channel:
+                del self._channels[channel.key]
+        channel.stop()
+        logger.debug(f"Closed shared log stream for {channel.name}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'channels': len(self._channels),
+                'subscribers': sum(c.subscribers for c in self._channels.values())
+            }
+
+    def _metric_gauges(self):
+        stats = self.get_stats()
+        return [('dockpeek_log_streams_active', {}, stats['channels']),
+                ('dockpeek_log_stream_subscribers', {}, stats['subscribers'])]
+
+
+log_hub = LogHub(capacity=int(os.getenv('LOG_HUB_BUFFER', '2000')))
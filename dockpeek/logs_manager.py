@@ -1,8 +1,91 @@
+import os
+import re
+import codecs
+import time
+import calendar
 import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 from flask import current_app
 
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
 logger = logging.getLogger(__name__)
 
+LOG_FETCH_MAX_CHARS = int(os.getenv('LOG_FETCH_MAX_CHARS', str(8 * 1024 * 1024)))
+LOG_MAX_LINE_CHARS = 64 * 1024
+
+
+def iter_log_lines(chunks: Iterable[bytes], keepends: bool = False,
+                   max_line_chars: int = LOG_MAX_LINE_CHARS) -> Iterator[str]:
+    """Yield decoded lines from raw log frames as they arrive.
+
+    Frames from the daemon line up with neither newlines nor UTF-8 character
+    boundaries, so decoding is incremental. A line longer than
+    ``max_line_chars`` is yielded in pieces rather than buffered whole.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    ending = '\n' if keepends else ''
+    pending = ''
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if not text:
+            continue
+        pending += text
+        if '\n' in text:
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                yield line + ending
+        while len(pending) > max_line_chars:
+            yield pending[:max_line_chars] + ending
+            pending = pending[max_line_chars:]
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _close_stream(log_stream):
+    if log_stream is not None and hasattr(log_stream, 'close'):
+        try:
+            log_stream.close()
+        except Exception:
+            pass
+
+
+def _collect_log_tail(log_stream, max_chars: int):
+    """Join the newest lines of a finite stream, dropping the oldest past ``max_chars``."""
+    lines = deque()
+    size = 0
+    dropped = 0
+    try:
+        for line in iter_log_lines(log_stream, keepends=True):
+            lines.append(line)
+            size += len(line)
+            while size > max_chars and len(lines) > 1:
+                size -= len(lines.popleft())
+                dropped += 1
+    finally:
+        _close_stream(log_stream)
+    return ''.join(lines), len(lines), dropped
+
+
+def _log_result(name, log_stream):
+    logs_text, line_count, dropped = _collect_log_tail(log_stream, LOG_FETCH_MAX_CHARS)
+    if dropped:
+        logger.warning(f"Logs for {name} exceeded {LOG_FETCH_MAX_CHARS} characters, dropped {dropped} oldest lines")
+    return {
+        'success': True,
+        'logs': logs_text,
+        'container_name': name,
+        'lines': line_count,
+        'truncated': dropped > 0
+    }
+
+
 def get_service_logs(client, service_name, tail=500, timestamps=True, follow=False):
     try:
         service = client.services.get(service_name)
@@ -16,18 +99,7 @@ def get_service_logs(client, service_name, tail=500, timestamps=True, follow=Fal
             details=True
         )
         
-        logs_lines = []
-        for log_line in log_generator:
-            logs_lines.append(log_line.decode('utf-8', errors='replace'))
-        
-        logs_text = ''.join(logs_lines)
-        
-        return {
-            'success': True,
-            'logs': logs_text,
-            'container_name': service_name,
-            'lines': len(logs_text.splitlines())
-        }
+        return _log_result(service_name, log_generator)
         
     except Exception as e:
         logger.error(f"Error fetching logs for service {service_name}: {e}")
@@ -37,9 +109,8 @@ def get_service_logs(client, service_name, tail=500, timestamps=True, follow=Fal
             'container_name': service_name
         }
 
-
 def stream_service_logs(client, service_name, tail=100):
-    service = None
+    log_generator = None
     try:
         service = client.services.get(service_name)
         log_generator = service.logs(
@@ -51,32 +122,26 @@ def stream_service_logs(client, service_name, tail=100):
             details=True
         )
         
-        for log_line in log_generator:
-            yield log_line.decode('utf-8', errors='replace')
+        yield from iter_log_lines(log_generator, keepends=True)
             
     except Exception as e:
         logger.error(f"Error streaming logs for service {service_name}: {e}")
         yield f"Error: {str(e)}\n"
+    finally:
+        _close_stream(log_generator)
 
 def get_container_logs(client, container_name, tail=500, timestamps=True, follow=False):
     try:
         container = client.containers.get(container_name)
         
-        logs = container.logs(
+        log_stream = container.logs(
             tail=tail,
             timestamps=timestamps,
             follow=follow,
-            stream=False
+            stream=True
         )
         
-        logs_text = logs.decode('utf-8', errors='replace')
-        
-        return {
-            'success': True,
-            'logs': logs_text,
-            'container_name': container_name,
-            'lines': len(logs_text.splitlines())
-        }
+        return _log_result(container_name, log_stream)
         
     except Exception as e:
         logger.error(f"Error fetching logs for {container_name}: {e}")
@@ -88,7 +153,6 @@ def get_container_logs(client, container_name, tail=500, timestamps=True, follow
 
 
 def stream_container_logs(client, container_name, tail=100):
-    container = None
     log_stream = None
     try:
         container = client.containers.get(container_name)
@@ -99,15 +163,299 @@ def stream_container_logs(client, container_name, tail=100):
             stream=True
         )
         
-        for log_line in log_stream:
-            yield log_line.decode('utf-8', errors='replace')
+        yield from iter_log_lines(log_stream, keepends=True)
             
     except Exception as e:
         logger.error(f"Error streaming logs for {container_name}: {e}")
         yield f"Error: {str(e)}\n"
     finally:
-        if log_stream:
-            try:
-                log_stream.close()
-            except:
-                pass
+        _close_stream(log_stream)
+
+
+LOG_QUERY_MAX_LIMIT = 5000
+LOG_QUERY_MAX_PATTERN = 500
+LOG_QUERY_REGEX_TIMEOUT = float(os.getenv('LOG_QUERY_REGEX_TIMEOUT', '10'))
+# First window, in seconds, of a backward page without ``since``; each further window is four times wider.
+LOG_QUERY_BACKWARD_WINDOW = 60
+
+
+class LogQueryError(ValueError):
+    pass
+
+
+def parse_log_time(value) -> Optional[int]:
+    """Nanoseconds since the epoch from unix seconds or an ISO 8601 / RFC 3339 string."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value * 1_000_000_000)
+    text = str(value).strip()
+    try:
+        return int(float(text) * 1_000_000_000)
+    except ValueError:
+        pass
+
+    # Docker emits RFC 3339 with up to nine fractional digits, more than datetime keeps.
+    fraction_ns = 0
+    match = re.match(r'^(.*T\d{2}:\d{2}:\d{2})\.(\d+)(.*)$', text)
+    if match:
+        digits = match.group(2)[:9]
+        fraction_ns = int(digits.ljust(9, '0'))
+        text = match.group(1) + match.group(3)
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        raise LogQueryError(f"Invalid time: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return calendar.timegm(parsed.utctimetuple()) * 1_000_000_000 + fraction_ns
+
+
+def _parse_cursor(cursor) -> Optional[Tuple[int, int]]:
+    """``(timestamp_ns, offset)`` from ``"<ns>:<offset>"``.
+
+    The offset counts earlier consecutive lines with the same timestamp, so
+    lines written within one nanosecond are not lost between pages.
+    """
+    if cursor is None or cursor == '':
+        return None
+    timestamp, _, offset = str(cursor).partition(':')
+    try:
+        return int(timestamp), int(offset or 0)
+    except ValueError:
+        raise LogQueryError(f"Invalid cursor: {cursor}")
+
+
+def _format_cursor(line_ns: int, offset: int) -> str:
+    return f"{line_ns}:{offset}"
+
+
+def _line_timestamp_ns(timestamp: str, seconds_cache: dict) -> int:
+    # Fast path for the daemon's own format, e.g. 2024-05-01T12:00:00.123456789Z; many lines share a second.
+    if len(timestamp) < 20 or timestamp[-1] != 'Z' or timestamp[19] not in '.Z':
+        return parse_log_time(timestamp)
+    base = timestamp[:19]
+    seconds = seconds_cache.get(base)
+    if seconds is None:
+        try:
+            seconds = seconds_cache[base] = calendar.timegm(time.strptime(base, '%Y-%m-%dT%H:%M:%S'))
+        except ValueError:
+            raise LogQueryError(f"Invalid time: {timestamp}")
+    fraction = timestamp[20:-1]
+    if fraction and not fraction.isdigit():
+        raise LogQueryError(f"Invalid time: {timestamp}")
+    return seconds * 1_000_000_000 + int(fraction[:9].ljust(9, '0') if fraction else 0)
+
+
+_REPEATS = ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+
+
+def _has_nested_repeat(parsed, outer_max: int = 1) -> bool:
+    """Whether a quantified part of the pattern holds another quantifier or an alternation.
+
+    That is what makes backtracking blow up, e.g. ``(a+)+$`` or ``(a|a)*$``.
+    Nesting between bounded quantifiers, as in ``(\\d{1,3}\\.){3}``, is allowed.
+    """
+    outer_unbounded = outer_max == sre_parse.MAXREPEAT
+    for op, av in parsed:
+        name = str(op)
+        if name in _REPEATS:
+            max_count = av[1]
+            if outer_max > 1 and max_count > 1 and (outer_unbounded or max_count == sre_parse.MAXREPEAT):
+                return True
+            if _has_nested_repeat(av[2], max(outer_max, max_count)):
+                return True
+        elif name == 'BRANCH':
+            if outer_unbounded:
+                return True
+            if any(_has_nested_repeat(branch, outer_max) for branch in av[1]):
+                return True
+        elif name == 'SUBPATTERN':
+            if _has_nested_repeat(av[-1], outer_max):
+                return True
+        elif name in ('ASSERT', 'ASSERT_NOT'):
+            if _has_nested_repeat(av[1], outer_max):
+                return True
+        elif name == 'ATOMIC_GROUP':
+            if _has_nested_repeat(av, outer_max):
+                return True
+        elif name == 'GROUPREF_EXISTS':
+            if any(b is not None and _has_nested_repeat(b, outer_max) for b in av[1:]):
+                return True
+    return False
+
+
+def _build_matcher(pattern: Optional[str], regex: bool, case_sensitive: bool) -> Optional[Callable[[str], bool]]:
+    if not pattern:
+        return None
+    if len(pattern) > LOG_QUERY_MAX_PATTERN:
+        raise LogQueryError(f"Pattern longer than {LOG_QUERY_MAX_PATTERN} characters")
+    if regex:
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            compiled = re.compile(pattern, flags)
+            nested = _has_nested_repeat(sre_parse.parse(pattern, flags))
+        except re.error as e:
+            raise LogQueryError(f"Invalid regular expression: {e}")
+        if nested:
+            raise LogQueryError("Regular expressions may not nest an unbounded quantifier or repeat an alternation")
+        return lambda text: compiled.search(text) is not None
+    if case_sensitive:
+        return lambda text: pattern in text
+    needle = pattern.lower()
+    return lambda text: needle in text.lower()
+
+
+class _LogScan:
+    """Bounds, cursor and pattern checks for the lines of one query, across its daemon requests."""
+
+    def __init__(self, lower, upper, position, direction, matches, regex_deadline):
+        self.lower = lower
+        self.upper = upper
+        self.position = position
+        self.direction = direction
+        self.matches = matches
+        self.regex_deadline = regex_deadline
+        self.scanned = self.matched = 0
+
+    def run(self, chunks, limit: int, window: Tuple[int, Optional[int]] = (None, None)):
+        """Matches of one daemon stream within ``window`` (ns, end exclusive).
+
+        A backward scan keeps only the last ``limit`` of them.
+        """
+        lower = self.lower if window[0] is None else max(self.lower or 0, window[0])
+        upper, window_end = self.upper, window[1]
+        page = deque(maxlen=limit) if self.direction == 'backward' else []
+        seconds_cache = {}
+        previous_ns, offset = None, 0
+        try:
+            for line in iter_log_lines(chunks):
+                timestamp, _, message = line.partition(' ')
+                try:
+                    line_ns = _line_timestamp_ns(timestamp, seconds_cache)
+                except LogQueryError:
+                    continue
+                self.scanned += 1
+                offset = offset + 1 if line_ns == previous_ns else 0
+                previous_ns = line_ns
+                if (lower is not None and line_ns < lower) or (upper is not None and line_ns > upper) or (
+                        window_end is not None and line_ns >= window_end):
+                    continue
+                if self.position is not None and line_ns == self.position[0] and (
+                        offset <= self.position[1] if self.direction == 'forward' else offset >= self.position[1]):
+                    continue
+                if (self.regex_deadline is not None and self.scanned % 256 == 0
+                        and time.monotonic() > self.regex_deadline):
+                    raise LogQueryError(
+                        f"Regular expression search exceeded {LOG_QUERY_REGEX_TIMEOUT:g}s; narrow since/until")
+                if self.matches is not None and not self.matches(message):
+                    continue
+
+                self.matched += 1
+                page.append((line_ns, offset, line))
+                if self.direction == 'forward' and self.matched > limit:
+                    break
+        finally:
+            _close_stream(chunks)
+        return page
+
+
+def _scan_backward_windows(container, options: dict, scan: _LogScan, upper: Optional[int], limit: int):
+    """Scan a container's log newest part first, in widening windows, until more than ``limit`` lines match.
+
+    The daemon applies ``tail`` before ``until``, so it cannot return the lines
+    just before a cursor by itself.
+    """
+    created = parse_log_time(container.attrs.get('Created'))
+    floor = max(created // 1_000_000_000, 0) if created else 0
+    end = None if upper is None else upper // 1_000_000_000 + 1
+    width = LOG_QUERY_BACKWARD_WINDOW
+    segments = []
+    while scan.matched <= limit:
+        start = max((end or int(time.time()) + 1) - width, floor)
+        window_options = dict(options)
+        if start > 0:
+            window_options['since'] = start
+        if end is not None:
+            window_options['until'] = end
+        chunks = container.logs(stream=True, **window_options)
+        window = (start * 1_000_000_000, None if end is None else end * 1_000_000_000)
+        segments.append(scan.run(chunks, limit, window))
+        if start <= floor:
+            break
+        end, width = start, width * 4
+    return segments
+
+
+def query_logs(client, name, is_swarm=False, since=None, until=None, pattern=None, regex=False,
+               case_sensitive=False, streams='both', limit=500, cursor=None, direction='backward'):
+    """Return one page of timestamped log lines matching a filter, scanning the daemon stream once.
+
+    ``direction='backward'`` returns the newest matches older than ``cursor``,
+    ``'forward'`` the oldest matches newer than it; the stream is closed as
+    soon as a forward page is full. Without ``since``, a container's backward
+    page reads the log in windows from the cursor back, so earlier pages are
+    not read again. Pages carry ``before_cursor`` and ``after_cursor`` for
+    fetching the adjacent pages.
+    """
+    if direction not in ('backward', 'forward'):
+        raise LogQueryError("direction must be 'backward' or 'forward'")
+    if streams not in ('both', 'stdout', 'stderr'):
+        raise LogQueryError("streams must be 'both', 'stdout' or 'stderr'")
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise LogQueryError("limit must be a number")
+    limit = max(1, min(limit, LOG_QUERY_MAX_LIMIT))
+
+    lower = parse_log_time(since)
+    upper = parse_log_time(until)
+    position = _parse_cursor(cursor)
+    if position is not None:
+        # Lines at the cursor's own timestamp are kept here and split by offset in _LogScan.
+        cursor_ns = position[0]
+        if direction == 'forward':
+            lower = cursor_ns if lower is None else max(lower, cursor_ns)
+        else:
+            upper = cursor_ns if upper is None else min(upper, cursor_ns)
+
+    matches = _build_matcher(pattern, regex, case_sensitive)
+    options = {
+        'stdout': streams in ('both', 'stdout'),
+        'stderr': streams in ('both', 'stderr'),
+        'timestamps': True,
+        'follow': False,
+    }
+
+    # A regex is checked for nested quantifiers, but many lines can still add up.
+    regex_deadline = time.monotonic() + LOG_QUERY_REGEX_TIMEOUT if regex and matches is not None else None
+    scan = _LogScan(lower, upper, position, direction, matches, regex_deadline)
+
+    if is_swarm:
+        target = client.services.get(name)
+        if lower is not None:
+            options['since'] = lower // 1_000_000_000
+        segments = [scan.run(target.logs(**options), limit)]
+    elif direction == 'backward' and lower is None:
+        segments = _scan_backward_windows(client.containers.get(name), options, scan, upper, limit)
+    else:
+        target = client.containers.get(name)
+        # The daemon's range is only a coarse pre-filter; exact bounds are applied per line below.
+        if lower is not None:
+            options['since'] = max(lower // 1_000_000_000, 1)
+        if upper is not None:
+            options['until'] = upper // 1_000_000_000 + 1
+        segments = [scan.run(target.logs(stream=True, **options), limit)]
+
+    entries = [entry for segment in reversed(segments) for entry in segment]
+    entries = entries[-limit:] if direction == 'backward' else entries[:limit]
+    return {
+        'success': True,
+        'container_name': name,
+        'lines': [line for _, _, line in entries],
+        'count': len(entries),
+        'scanned': scan.scanned,
+        'has_more': scan.matched > limit,
+        'before_cursor': _format_cursor(*entries[0][:2]) if entries else cursor,
+        'after_cursor': _format_cursor(*entries[-1][:2]) if entries else cursor,
+    }
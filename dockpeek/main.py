@@ -1,16 +1,28 @@
+import hmac
 import json
 from datetime import datetime
 from functools import wraps
 
-import docker
 from flask import Blueprint, render_template, jsonify, request, current_app, make_response, Response
 from flask_login import login_required, current_user
 
-from .get_data import get_all_data
+from .get_data import get_all_data, get_status_data, get_data_etag, get_delta_data
 from .update_manager import update_container
-from .docker_utils import discover_docker_clients, create_streaming_client, DockerClientFactory, get_container_status_with_exit_code
+from .docker_utils import discover_docker_clients, streaming_clients, DockerClientFactory, get_host_circuit_states
 from .update import update_checker
-from .logs_manager import get_container_logs, stream_container_logs, get_service_logs, stream_service_logs
+from .update_jobs import update_jobs
+from .update_queue import bulk_updates
+from .container_listing import list_containers
+from .inventory import get_dependency_graph
+from .dependency_graph import DEPENDS_ON
+from .deadline import timeout_stats
+from .serialization import compressor, iter_json_document
+from .status_stream import status_broadcaster, format_sse
+from .logs_manager import get_container_logs, get_service_logs, query_logs, LogQueryError
+from .log_hub import log_hub
+from .prune_planner import prune_planner
+from .label_pipeline import label_pipeline
+from .metrics import metrics
 
 
 main_bp = Blueprint('main', __name__)
@@ -40,144 +52,46 @@ def health():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "version": current_app.config['APP_VERSION']
+        "version": current_app.config['APP_VERSION'],
+        "docker_api_timeouts": timeout_stats.snapshot(),
+        "host_circuits": get_host_circuit_states(),
+        "label_cache": label_pipeline.get_stats()
     }), 200
 
+@main_bp.route("/metrics")
+def prometheus_metrics():
+    # Labels name hosts and images, so a logged-in session or METRICS_TOKEN is required
+    # unless authentication is disabled and no token is set. Scrapers use the token.
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                      f"Bearer {token}".encode())
+    else:
+        allowed = current_app.config.get('DISABLE_AUTH', False)
+    if not allowed and not current_user.is_authenticated:
+        return Response(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @main_bp.route("/data")
 @conditional_login_required
 def data():
-    return jsonify(get_all_data())
-
-@main_bp.route("/check-updates", methods=["POST"])
-@conditional_login_required
-def check_updates():
-    update_checker.start_check()
-    request_data = request.get_json() or {}
-    server_filter = request_data.get('server_filter', 'all')
-    
-    servers = discover_docker_clients()
-    active_servers = [s for s in servers if s['status'] == 'active']
-    
-    if server_filter != 'all':
-        active_servers = [s for s in active_servers if s['name'] == server_filter]
-    
-    updates = {}
-    was_cancelled = False
-    total_containers = 0
-    processed_containers = 0
-    
-    for server in active_servers:
-        try:
-            containers = server['client'].containers.list(all=True)
-            total_containers += len(containers)
-        except Exception:
-            pass    
-    for server in active_servers:
-        if update_checker.is_cancelled:
-            was_cancelled = True
-            break
-            
-        try:
-            containers = server['client'].containers.list(all=True)
-            for container in containers:
-                if update_checker.is_cancelled:
-                    was_cancelled = True
-                    break
-                
-                processed_containers += 1
-                key = f"{server['name']}:{container.name}"
-                try:
-                    update_available = update_checker.check_image_updates(
-                        server['client'], container, server['name']
-                    )
-                    updates[key] = update_available
-                except Exception as e:
-                    updates[key] = False
-                    current_app.logger.error(f"Error during update check for {key}: {e}")
-                
-                if update_checker.is_cancelled:
-                    was_cancelled = True
-                    break
-                    
-        except Exception as e:
-            current_app.logger.error(f"Error accessing containers on {server['name']}: {e}")
-        
-        if was_cancelled:
-            break
+    etag = get_data_etag()
+    # The tag names a data revision rather than exact bytes, which differ once compressed.
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(get_all_data())
 
-    return jsonify({
-        "updates": updates, 
-        "cancelled": was_cancelled,
-        "progress": {
-            "processed": processed_containers,
-            "total": total_containers
-        }
-    })
+    if etag:
+        response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-@main_bp.route("/check-single-update", methods=["POST"])
+@main_bp.route("/data/delta")
 @conditional_login_required
-def check_single_update():
-    update_checker.start_check()
-    request_data = request.get_json() or {}
-    server_name = request_data.get('server_name')
-    container_name = request_data.get('container_name')
-    
-    if not server_name or not container_name:
-        return jsonify({"error": "Missing server_name or container_name"}), 400
-    
-    if update_checker.is_cancelled:
-        return jsonify({"cancelled": True}), 200
-    
-    servers = discover_docker_clients()
-    server = next((s for s in servers if s['name'] == server_name and s['status'] == 'active'), None)
-    
-    if not server:
-        return jsonify({"error": f"Server {server_name} not found or inactive"}), 404
-    
-    try:
-        # Detect if this is a Swarm service
-        is_swarm = False
-        try:
-            info = server['client'].info()
-            is_swarm = info.get('Swarm', {}).get('LocalNodeState', '').lower() == 'active'
-        except Exception:
-            pass
-        
-        # Block update checks for Swarm
-        if is_swarm:
-            current_app.logger.info(
-                f"[{server_name}] Container '{container_name}' is part of a Swarm service — update check skipped."
-            )
-            key = f"{server_name}:{container_name}"
-            return jsonify({
-                "key": key,
-                "update_available": False,
-                "server_name": server_name,
-                "container_name": container_name,
-                "cancelled": False
-            }), 200
-        
-        container = server['client'].containers.get(container_name)
-        
-        if update_checker.is_cancelled:
-            return jsonify({"cancelled": True}), 200
-            
-        update_available = update_checker.check_image_updates(
-            server['client'], container, server_name
-        )
-        
-        key = f"{server_name}:{container_name}" 
-        return jsonify({
-            "key": key,
-            "update_available": update_available,
-            "server_name": server_name,
-            "container_name": container_name,
-            "cancelled": update_checker.is_cancelled
-        })
-        
-    except Exception as e:
-        current_app.logger.error(f"Error checking update for {server_name}:{container_name}: {e}")
-        return jsonify({"error": str(e)}), 500
+def data_delta():
+    since = request.args.get('since', '')
+    return jsonify(get_delta_data(since))
 
 @main_bp.route("/get-containers-list", methods=["POST"])  
 @conditional_login_required
@@ -195,7 +109,7 @@ def get_containers_list():
     
     for server in active_servers:
         try:
-            for container in server['client'].containers.list(all=True):
+            for container in list_containers(server['client']):
                 containers_list.append({
                     "server_name": server['name'],
                     "container_name": container.name,
@@ -215,17 +129,83 @@ def get_containers_list():
 @conditional_login_required
 def get_update_check_status():
     return jsonify({
-        "is_cancelled": update_checker.is_cancelled,
         "cache_stats": update_checker.get_cache_stats()
     })
 
-@main_bp.route("/cancel-updates", methods=["POST"])
+@main_bp.route("/update-jobs", methods=["POST"])
+@conditional_login_required
+def create_update_job():
+    request_data = request.get_json(silent=True) or {}
+    job_id = update_jobs.start(request_data.get('server_filter', 'all'))
+    return jsonify({"job_id": job_id}), 202
+
+@main_bp.route("/update-jobs/<job_id>", methods=["GET"])
 @conditional_login_required
-def cancel_updates():
-    update_checker.cancel_check()
-    current_app.logger.info("Cancellation request received.")
+def get_update_job(job_id):
+    job = update_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@main_bp.route("/update-jobs/<job_id>/cancel", methods=["POST"])
+@conditional_login_required
+def cancel_update_job(job_id):
+    if not update_jobs.cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 404
     return jsonify({"status": "cancellation_requested"})
 
+@main_bp.route("/update-jobs/<job_id>/events")
+@conditional_login_required
+def update_job_events(job_id):
+    if update_jobs.status(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    after = request.args.get('after', 0, type=int)
+
+    def generate():
+        for event in update_jobs.stream(job_id, after):
+            yield json.dumps(event) + "\n"
+
+    response = Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            'Connection': 'keep-alive'
+        }
+    )
+    response.timeout = None
+    return response
+
+@main_bp.route("/bulk-updates", methods=["POST"])
+@conditional_login_required
+def create_bulk_update():
+    request_data = request.get_json(silent=True) or {}
+    items = request_data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing items"}), 400
+
+    keys = []
+    for item in items:
+        server_name = item.get('server_name') if isinstance(item, dict) else None
+        container_name = item.get('container_name') if isinstance(item, dict) else None
+        if not server_name or not container_name:
+            return jsonify({"error": "Each item needs server_name and container_name"}), 400
+        if (server_name, container_name) not in keys:
+            keys.append((server_name, container_name))
+
+    # Progress and cancellation go through /update-jobs/<job_id>/events and /cancel.
+    job_id = bulk_updates.start(keys, force=bool(request_data.get('force', False)))
+    return jsonify({"job_id": job_id, "total": len(keys)}), 202
+
+@main_bp.route("/bulk-updates/<job_id>", methods=["GET"])
+@conditional_login_required
+def get_bulk_update(job_id):
+    job = bulk_updates.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
 @main_bp.route("/check-dependent-containers", methods=["POST"])
 @conditional_login_required
 def check_dependent_containers():
@@ -243,17 +223,14 @@ def check_dependent_containers():
         return jsonify({"error": f"Server '{server_name}' not found or inactive"}), 404
     
     try:
-        container = server['client'].containers.get(container_name)
-        dependent = []
-        all_containers = server['client'].containers.list(all=True)
-        for other in all_containers:
-            if other.id == container.id:
-                continue
-            network_mode = other.attrs.get('HostConfig', {}).get('NetworkMode', '')
-            if network_mode in [f'container:{container.name}', f'container:{container.id}']:
-                dependent.append(other.name)
+        graph = get_dependency_graph(server)
+        container_id = graph.find(container_name)
+        if container_id is None:
+            container_id = server['client'].containers.get(container_name).id
+        dependent = [graph.name_of(cid) for level in graph.recreate_order(container_id) for cid in level]
+        startup_dependents = [graph.name_of(cid) for cid, _ in graph.dependents_of(container_id, [DEPENDS_ON])]
         
-        return jsonify({'dependent_containers': dependent}), 200
+        return jsonify({'dependent_containers': dependent, 'startup_dependents': startup_dependents}), 200
     except Exception as e:
         current_app.logger.error(f"Error checking dependent containers: {e}")
         return jsonify({'dependent_containers': [], 'error': str(e)}), 200
@@ -275,7 +252,7 @@ def update_container_route():
         return jsonify({"error": f"Server '{server_name}' not found or inactive"}), 404
     
     try:
-        result = update_container(server['client'], server_name, container_name)
+        result = update_container(server['client'], server_name, container_name, server=server)
         return jsonify(result), 200
     except Exception as e:
         if hasattr(e, 'html_message'):
@@ -287,22 +264,6 @@ def update_container_route():
 
 
 
-def parse_image_name(image_name):
-    if ':' in image_name:
-        base_name, tag = image_name.rsplit(':', 1)
-    else:
-        base_name, tag = image_name, 'latest'
-    return base_name, tag
-
-def get_image_creation_time(image):
-    created_str = image.attrs.get('Created', '')
-    if created_str:
-        try:
-            return datetime.fromisoformat(created_str.replace('Z', '+00:00'))
-        except:
-            pass
-    return None
-
 @main_bp.route("/get-prune-info", methods=["POST"])
 @conditional_login_required
 def get_prune_info():
@@ -315,89 +276,26 @@ def get_prune_info():
     if server_name != 'all':
         active_servers = [s for s in active_servers if s['name'] == server_name]
     
+    plans, errors = prune_planner.plan(active_servers)
+    for failed_server, error in errors.items():
+        current_app.logger.error(f"Error getting prune info for {failed_server}: {error}")
+    
     total_size = 0
     total_count = 0
     server_details = []
     
-    for server in active_servers:
-        try:
-            all_images = server['client'].images.list()
-            used_images = set()
-            container_images_info = {}
+    for plan in plans:
+        if plan.images:
+            count = len(plan.removable_ids)
+            total_count += count
+            total_size += plan.reclaimable
             
-            for container in server['client'].containers.list(all=True):
-                image_id = container.image.id
-                used_images.add(image_id)
-                
-                image_name = container.attrs.get('Config', {}).get('Image', '')
-                if image_name:
-                    base_name, tag = parse_image_name(image_name)
-                    key = f"{base_name}:{tag}"
-                    creation_time = get_image_creation_time(container.image)
-                    
-                    if key not in container_images_info or (creation_time and container_images_info[key]['created'] and creation_time > container_images_info[key]['created']):
-                        container_images_info[key] = {
-                            'id': image_id,
-                            'created': creation_time
-                        }
-            
-            unused_images = []
-            unused_size = 0
-            
-            for image in all_images:
-                if image.id not in used_images:
-                    size = image.attrs.get('Size', 0)
-                    
-                    if image.tags:
-                        tags = image.tags
-                    else:
-                        repo_tags = image.attrs.get('RepoTags', [])
-                        if repo_tags and len(repo_tags) > 0:
-                            tags = [repo_tags[0]]
-                        else:
-                            repo_digests = image.attrs.get('RepoDigests', [])
-                            if repo_digests and len(repo_digests) > 0:
-                                repo_name = repo_digests[0].split('@')[0]
-                                tags = [f"{repo_name}:<none>"]
-                            else:
-                                tags = ["<none>:<none>"]
-                    
-                    pending_update = False
-                    image_created = get_image_creation_time(image)
-                    
-                    for tag in tags:
-                        if tag != "<none>:<none>":
-                            if tag in container_images_info:
-                                used_image_info = container_images_info[tag]
-                                if image_created and used_image_info['created']:
-                                    if image_created > used_image_info['created']:
-                                        pending_update = True
-                                        break
-                    
-                    unused_images.append({
-                        'id': image.id,
-                        'tags': tags,
-                        'size': size,
-                        'pending_update': pending_update
-                    })
-                    
-                    if not pending_update:
-                        unused_size += size
-            
-            if unused_images:
-                count = sum(1 for img in unused_images if not img['pending_update'])
-                total_count += count
-                total_size += unused_size
-                
-                server_details.append({
-                    'server': server['name'],
-                    'count': count,
-                    'size': unused_size,
-                    'images': unused_images
-                })
-                
-        except Exception as e:
-            current_app.logger.error(f"Error getting prune info for {server['name']}: {e}")
+            server_details.append({
+                'server': plan.server,
+                'count': count,
+                'size': plan.reclaimable,
+                'images': plan.images
+            })
     
     return jsonify({
         'total_count': total_count,
@@ -417,76 +315,16 @@ def prune_images():
     if server_name != 'all':
         active_servers = [s for s in active_servers if s['name'] == server_name]
     
-    total_size = 0
-    total_count = 0
-    server_results = []
+    results, errors = prune_planner.prune(active_servers)
     
-    for server in active_servers:
-        try:
-            all_images = server['client'].images.list()
-            used_images = set()
-            container_images_info = {}
-            
-            for container in server['client'].containers.list(all=True):
-                image_id = container.image.id
-                used_images.add(image_id)
-                
-                image_name = container.attrs.get('Config', {}).get('Image', '')
-                if image_name:
-                    base_name, tag = parse_image_name(image_name)
-                    key = f"{base_name}:{tag}"
-                    creation_time = get_image_creation_time(container.image)
-                    
-                    if key not in container_images_info or (creation_time and container_images_info[key]['created'] and creation_time > container_images_info[key]['created']):
-                        container_images_info[key] = {
-                            'id': image_id,
-                            'created': creation_time
-                        }
-            
-            removed_count = 0
-            removed_size = 0
-            
-            for image in all_images:
-                if image.id not in used_images:
-                    pending_update = False
-                    image_created = get_image_creation_time(image)
-                    
-                    tags = image.tags if image.tags else []
-                    for tag in tags:
-                        if tag != "<none>:<none>":
-                            if tag in container_images_info:
-                                used_image_info = container_images_info[tag]
-                                if image_created and used_image_info['created']:
-                                    if image_created > used_image_info['created']:
-                                        pending_update = True
-                                        break
-                    
-                    if not pending_update:
-                        try:
-                            size = image.attrs.get('Size', 0)
-                            long_client = docker.DockerClient(base_url=server['url'], timeout=60)
-                            long_client.images.remove(image.id, force=True)
-                            long_client.close()
-                            removed_count += 1
-                            removed_size += size
-                        except Exception as e:
-                            current_app.logger.warning(f"Could not remove image {image.id}: {e}")
-            
-            total_count += removed_count
-            total_size += removed_size
-            
-            if removed_count > 0:
-                server_results.append({
-                    'server': server['name'],
-                    'count': removed_count,
-                    'size': removed_size
-                })
-                
-            current_app.logger.info(f"Pruned {removed_count} images from {server['name']}, reclaimed {removed_size} bytes")
-            
-        except Exception as e:
-            current_app.logger.error(f"Error pruning images on {server['name']}: {e}")
-            return jsonify({"error": f"Failed to prune on {server['name']}: {str(e)}"}), 500
+    total_size = sum(result['size'] for result in results)
+    total_count = sum(result['count'] for result in results)
+    server_results = [result for result in results if result['count'] > 0]
+    
+    if errors:
+        failed_server, error = next(iter(errors.items()))
+        current_app.logger.error(f"Error pruning images on {failed_server}: {error}")
+        return jsonify({"error": f"Failed to prune on {failed_server}: {error}"}), 500
     
     return jsonify({
         'total_count': total_count,
@@ -535,12 +373,51 @@ def get_logs():
         return jsonify(result), 500
 
 
+@main_bp.route("/query-container-logs", methods=["POST"])
+@conditional_login_required
+def query_container_logs():
+    request_data = request.get_json() or {}
+    server_name = request_data.get('server_name')
+    container_name = request_data.get('container_name')
+    
+    if not server_name or not container_name:
+        return jsonify({"error": "Missing server_name or container_name"}), 400
+    
+    servers = discover_docker_clients()
+    server = next((s for s in servers if s['name'] == server_name and s['status'] == 'active'), None)
+    
+    if not server:
+        return jsonify({"error": f"Server {server_name} not found or inactive"}), 404
+    
+    try:
+        # Scanning a long log can take a while, so use the pooled long-timeout client.
+        with streaming_clients.acquire(server['url']) as client:
+            result = query_logs(
+                client,
+                container_name,
+                is_swarm=request_data.get('is_swarm', False),
+                since=request_data.get('since'),
+                until=request_data.get('until'),
+                pattern=request_data.get('query'),
+                regex=request_data.get('regex', False),
+                case_sensitive=request_data.get('case_sensitive', False),
+                streams=request_data.get('streams', 'both'),
+                limit=request_data.get('limit', 500),
+                cursor=request_data.get('cursor'),
+                direction=request_data.get('direction', 'backward')
+            )
+    except LogQueryError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error querying logs for {container_name}: {e}")
+        return jsonify({"success": False, "error": str(e), "container_name": container_name}), 500
+    
+    return jsonify(result), 200
+
 @main_bp.route("/stream-container-logs", methods=["POST"])
 @conditional_login_required
 def stream_logs():
     import time
-    import gevent
-    from gevent.queue import Queue, Empty
     
     request_data = request.get_json() or {}
     server_name = request_data.get('server_name')
@@ -557,65 +434,43 @@ def stream_logs():
     if not server:
         return jsonify({"error": f"Server {server_name} not found or inactive"}), 404
     
-    stream_client = create_streaming_client(server['url'])
+    # Viewers of the same container share one upstream stream.
+    try:
+        subscription = log_hub.subscribe(server['url'], container_name, is_swarm, tail)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
     logger = current_app.logger
     
     def generate():
-        queue = Queue()
-        stop_flag = [False]
         heartbeat_interval = 20
         last_yield = time.time()
         
-        def log_reader():
-            try:
-                if is_swarm:
-                    stream_func = stream_service_logs
-                else:
-                    stream_func = stream_container_logs
-                
-                for log_line in stream_func(stream_client, container_name, tail):
-                    if stop_flag[0]:
-                        break
-                    queue.put(('log', log_line))
-                    
-                queue.put(('end', None))
-            except Exception as e:
-                queue.put(('error', str(e)))
-        
-        reader_greenlet = gevent.spawn(log_reader)
-        
         try:
             while True:
-                try:
-                    msg_type, data = queue.get(timeout=1)
-                    
-                    if msg_type == 'log':
-                        last_yield = time.time()
-                        yield json.dumps({"line": data}) + "\n"
-                    elif msg_type == 'end':
-                        break
-                    elif msg_type == 'error':
-                        logger.error(f"Stream error: {data}")
-                        yield json.dumps({"error": data}) + "\n"
-                        break
-                        
-                except Empty:
-                    current_time = time.time()
-                    if current_time - last_yield >= heartbeat_interval:
-                        last_yield = current_time
-                        yield json.dumps({"heartbeat": True}) + "\n"
+                batch = subscription.read(timeout=1)
+                
+                if batch.skipped:
+                    yield json.dumps({"line": f"... {batch.skipped} lines skipped, the viewer fell behind ...\n"}) + "\n"
+                if batch.payload:
+                    last_yield = time.time()
+                    yield batch.payload
+                
+                if batch.ended:
+                    if batch.error:
+                        logger.error(f"Stream error: {batch.error}")
+                        yield json.dumps({"error": batch.error}) + "\n"
+                    break
+                
+                current_time = time.time()
+                if current_time - last_yield >= heartbeat_interval:
+                    last_yield = current_time
+                    yield json.dumps({"heartbeat": True}) + "\n"
                         
         except GeneratorExit:
             logger.debug(f"Stream closed for {container_name}")
-            stop_flag[0] = True
             raise
         finally:
-            stop_flag[0] = True
-            reader_greenlet.kill()
-            try:
-                stream_client.close()
-            except:
-                pass
+            subscription.close()
     
     response = Response(
         generate(),
@@ -627,6 +482,8 @@ def stream_logs():
         }
     )
     response.timeout = None
+    # The generator's finally never runs if the client goes away before streaming starts.
+    response.call_on_close(subscription.close)
     return response
 
 @main_bp.route("/export/json")
@@ -639,84 +496,80 @@ def export_json():
     if server_filter != 'all':
         filtered_containers = [c for c in filtered_containers if c.get("server") == server_filter]
         
-    export_data = {
-        "export_info": {
-            "timestamp": datetime.now().isoformat(),
-            "dockpeek_version": current_app.config['APP_VERSION'],
-            "server_filter": server_filter,
-            "total_containers": len(filtered_containers),
-        },
-        "containers": []
+    export_info = {
+        "timestamp": datetime.now().isoformat(),
+        "dockpeek_version": current_app.config['APP_VERSION'],
+        "server_filter": server_filter,
+        "total_containers": len(filtered_containers),
     }
-    for c in filtered_containers:
-        export_container = {k: v for k, v in c.items() if k in ['name', 'server', 'stack', 'image', 'status', 'exit_code', 'custom_url']}
-        if c.get("ports"): 
-            export_container["ports"] = c["ports"]
-        if c.get("traefik_routes"): 
-            export_container["traefik_routes"] = [
-                {"router": r["router"], "url": r["url"]} 
-                for r in c["traefik_routes"]
-            ]
-        export_data["containers"].append(export_container)
-
-    formatted_json = json.dumps(export_data, indent=2, ensure_ascii=False)
+
+    def export_containers():
+        for c in filtered_containers:
+            export_container = {k: v for k, v in c.items() if k in ['name', 'server', 'stack', 'image', 'status', 'exit_code', 'custom_url']}
+            if c.get("ports"): 
+                export_container["ports"] = c["ports"]
+            if c.get("traefik_routes"): 
+                export_container["traefik_routes"] = [
+                    {"router": r["router"], "url": r["url"]} 
+                    for r in c["traefik_routes"]
+                ]
+            yield export_container
+
     filename = f'dockpeek-export-{server_filter}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.json'
-    
-    response = make_response(formatted_json)
+    chunks = iter_json_document({"export_info": export_info}, "containers", export_containers())
+    response = compressor.stream(chunks, mimetype='application/json')
     response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    response.headers['Content-Type'] = 'application/json'
     return response
 
 @main_bp.route("/status")
 @conditional_login_required
 def get_status():
-    servers = discover_docker_clients()
-    statuses = []
-    
-    for server in servers:
-        if server['status'] != 'active':
-            continue
-            
+    return jsonify({'statuses': get_status_data()})
+
+@main_bp.route("/status-stream")
+@conditional_login_required
+def status_stream():
+    import time
+
+    # Make sure every host has an inventory watcher before we start listening.
+    get_status_data()
+    subscription = status_broadcaster.subscribe()
+    logger = current_app.logger
+
+    def generate():
+        heartbeat_interval = 20
+        last_yield = time.time()
+        yield "retry: 5000\n\n"
+
         try:
-            client = server['client']
-            info = client.info()
-            is_swarm = info.get('Swarm', {}).get('LocalNodeState', '').lower() == 'active'
-            
-            if is_swarm:
-                services = client.services.list()
-                tasks = client.api.tasks()
-                tasks_by_service = {}
-                for t in tasks:
-                    sid = t['ServiceID']
-                    tasks_by_service.setdefault(sid, []).append(t)
-                
-                for service in services:
-                    service_tasks = tasks_by_service.get(service.id, [])
-                    running = sum(1 for t in service_tasks if t['Status']['State'] == 'running')
-                    total = len(service_tasks)
-                    status = f"running ({running}/{total})" if total else "no-tasks"
-                    
-                    statuses.append({
-                        'server': server['name'],
-                        'name': service.name,
-                        'status': status,
-                        'exit_code': None,
-                        'started_at': None
-                    })
-            else:
-                containers = client.containers.list(all=True)
-                for container in containers:
-                    container_status, exit_code = get_container_status_with_exit_code(container)
-                    start_time = container.attrs.get('State', {}).get('StartedAt', '')
-                    
-                    statuses.append({
-                        'server': server['name'],
-                        'name': container.name,
-                        'status': container_status,
-                        'exit_code': exit_code,
-                        'started_at': start_time
-                    })
-        except Exception as e:
-            current_app.logger.error(f"Error getting status from {server['name']}: {e}")
-    
-    return jsonify({'statuses': statuses})
\ No newline at end of file
+            while True:
+                if subscription.overflowed:
+                    subscription.reset()
+                    last_yield = time.time()
+                    yield format_sse({'type': 'resync'})
+                    continue
+
+                event = subscription.get(timeout=1)
+                if event is not None:
+                    last_yield = time.time()
+                    yield format_sse(event)
+                elif time.time() - last_yield >= heartbeat_interval:
+                    last_yield = time.time()
+                    yield ": heartbeat\n\n"
+        except GeneratorExit:
+            logger.debug("Status stream closed")
+            raise
+        finally:
+            status_broadcaster.unsubscribe(subscription)
+
+    response = Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            'Connection': 'keep-alive'
+        }
+    )
+    response.timeout = None
+    return response
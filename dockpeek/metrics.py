@@ -0,0 +1,430 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR_ENV = "DOCKPEEK_METRICS_DIR"
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PULL_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# name: (type, help, buckets)
+METRICS = {
+    'dockpeek_docker_api_requests_total': (
+        COUNTER, "Docker API requests by host, endpoint and response status.", None),
+    'dockpeek_docker_api_request_duration_seconds': (
+        HISTOGRAM, "Docker API request latency until the response headers arrive.", LATENCY_BUCKETS),
+    'dockpeek_host_discovery_duration_seconds': (
+        HISTOGRAM, "Time to connect to and ping a Docker host during discovery.", LATENCY_BUCKETS),
+    'dockpeek_host_processing_duration_seconds': (
+        HISTOGRAM, "Time to build the container rows of one host for /data.", LATENCY_BUCKETS),
+    'dockpeek_get_all_data_duration_seconds': (
+        HISTOGRAM, "Time to build the full /data payload.", LATENCY_BUCKETS),
+    'dockpeek_update_cache_requests_total': (
+        COUNTER, "Update-check cache lookups by result (hit, stale or miss).", None),
+    'dockpeek_image_pull_duration_seconds': (
+        HISTOGRAM, "Image pull time by image and by what pulled it (check or update).", PULL_BUCKETS),
+    'dockpeek_log_streams_active': (
+        GAUGE, "Shared upstream log streams currently open.", None),
+    'dockpeek_log_stream_subscribers': (
+        GAUGE, "Log viewers attached to the shared log streams.", None),
+    'dockpeek_status_stream_queued_events': (
+        GAUGE, "Events waiting in the queues of connected status streams.", None),
+    'dockpeek_gevent_loop_pending_callbacks': (
+        GAUGE, "Callbacks pending in the gevent event loop.", None),
+    'dockpeek_gevent_loop_active_watchers': (
+        GAUGE, "Active watchers in the gevent event loop.", None),
+    'dockpeek_gevent_threadpool_queued_tasks': (
+        GAUGE, "Tasks waiting for a thread in the gevent thread pool.", None),
+    'dockpeek_executor_active': (
+        GAUGE, "Tasks running in a bounded executor or connection pool.", None),
+    'dockpeek_executor_capacity': (
+        GAUGE, "Task limit of a bounded executor or connection pool.", None),
+}
+
+# Gauges that describe one process, such as its event loop or the pools it owns,
+# are reported per process with a ``pid`` label instead of being summed.
+PROCESS_GAUGES = frozenset({
+    'dockpeek_gevent_loop_pending_callbacks',
+    'dockpeek_gevent_loop_active_watchers',
+    'dockpeek_gevent_threadpool_queued_tasks',
+    'dockpeek_executor_active',
+    'dockpeek_executor_capacity',
+})
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def get_metrics_dir() -> Optional[str]:
+    return os.environ.get(METRICS_DIR_ENV) or None
+
+
+def default_metrics_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"dockpeek-metrics-{os.getpid()}")
+
+
+def reset_metrics_dir(directory: str):
+    """Drop samples left by an earlier run; called by the gunicorn master before forking."""
+    os.makedirs(directory, exist_ok=True)
+    for file_name in os.listdir(directory):
+        if file_name.endswith('.json'):
+            try:
+                os.unlink(os.path.join(directory, file_name))
+            except OSError:
+                pass
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _strip_userinfo(url: str) -> str:
+    """``url`` without credentials, e.g. the user of an ``ssh://`` host."""
+    parts = urlsplit(url)
+    if '@' not in parts.netloc:
+        return url
+    return parts._replace(netloc=parts.netloc.rsplit('@', 1)[1]).geturl()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for this process, merged across processes when scraped.
+
+    Every gunicorn worker and the collector write their samples to their own
+    file in a shared directory, and a scrape sums the files, except for the
+    per-process gauges in ``PROCESS_GAUGES``. Files of exited
+    processes are folded into one archive so counters never go backwards when
+    gunicorn recycles a worker; their gauges are dropped. Without a directory
+    only this process is reported.
+    """
+
+    ARCHIVE_FILE = "archive.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 5.0):
+        self._directory = directory
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], List] = {}
+        self._gauge_sources: List[Callable[[], Iterable[Tuple[str, Dict, float]]]] = []
+        self._host_names: Dict[str, str] = {}
+        self._flusher_pid = None
+
+    @property
+    def directory(self) -> Optional[str]:
+        # Read lazily: gunicorn sets the directory after this module may already be imported.
+        return self._directory or get_metrics_dir()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        self._ensure_flusher()
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        self._ensure_flusher()
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            sample = self._histograms.get(key)
+            if sample is None:
+                # Per-bucket counts, made cumulative when rendered; the last slot is +Inf.
+                sample = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            sample[0][bisect_left(buckets, value)] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def add_gauges(self, source: Callable[[], Iterable[Tuple[str, Dict, float]]]):
+        """Register a callable returning ``(name, labels, value)`` gauges, read at every flush."""
+        with self._lock:
+            self._gauge_sources.append(source)
+        self._ensure_flusher()
+
+    def name_host(self, base_url: str, name: str):
+        """Label requests to ``base_url`` with the host's display name."""
+        with self._lock:
+            self._host_names[base_url] = name
+
+    def host_label(self, base_url: str) -> str:
+        with self._lock:
+            name = self._host_names.get(base_url)
+        return name if name is not None else _strip_userinfo(base_url)
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self.directory is None or self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            if self._flusher_pid is not None:
+                # Forked: the parent's samples are its own to report.
+                self._counters.clear()
+                self._histograms.clear()
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.debug(f"Could not write metrics: {e}")
+
+    def _gauges(self) -> List[Tuple[str, Dict, float]]:
+        with self._lock:
+            sources = list(self._gauge_sources)
+        gauges = []
+        for source in sources:
+            try:
+                gauges.extend(source())
+            except Exception as e:
+                logger.debug(f"Metrics gauge source failed: {e}")
+        return gauges
+
+    def _sample(self) -> Dict:
+        gauges = [[name, sorted((k, str(v)) for k, v in labels.items()), value]
+                  for name, labels, value in self._gauges()]
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(counts), total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()],
+                'gauges': gauges
+            }
+
+    def flush(self):
+        if self.directory is not None:
+            self._write(f"process-{os.getpid()}.json", self._sample())
+
+    def _write(self, file_name: str, data: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, os.path.join(self.directory, file_name))
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read(self, file_name: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, file_name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _collect_samples(self) -> List[Dict]:
+        if self.directory is None:
+            return [self._sample()]
+
+        self.flush()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                archive = self._read(self.ARCHIVE_FILE) or {'counters': [], 'histograms': []}
+                samples = []
+                dead = []
+                for file_name in os.listdir(self.directory):
+                    if not (file_name.startswith('process-') and file_name.endswith('.json')):
+                        continue
+                    sample = self._read(file_name)
+                    if sample is None:
+                        continue
+                    if _pid_alive(sample['pid']):
+                        samples.append(sample)
+                    else:
+                        dead.append((file_name, sample))
+
+                if dead:
+                    merged = MetricsSnapshot([archive] + [sample for _, sample in dead])
+                    archive = merged.to_sample(include_gauges=False)
+                    self._write(self.ARCHIVE_FILE, archive)
+                    for file_name, _ in dead:
+                        os.unlink(os.path.join(self.directory, file_name))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return samples + [archive]
+
+    def render(self) -> str:
+        return MetricsSnapshot(self._collect_samples()).render()
+
+
+class MetricsSnapshot:
+    """Samples of several processes summed into one set of series."""
+
+    def __init__(self, samples: Iterable[Dict]):
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.histograms: Dict[Tuple[str, LabelKey], List] = {}
+        self.gauges: Dict[Tuple[str, LabelKey], float] = {}
+        for sample in samples:
+            self._add(sample)
+
+    def _add(self, sample: Dict):
+        for name, labels, value in sample.get('counters', ()):
+            key = (name, tuple(map(tuple, labels)))
+            self.counters[key] = self.counters.get(key, 0) + value
+        for name, labels, value in sample.get('gauges', ()):
+            labels = tuple(map(tuple, labels))
+            if name in PROCESS_GAUGES:
+                labels = tuple(sorted(labels + (('pid', str(sample.get('pid'))),)))
+            key = (name, labels)
+            self.gauges[key] = self.gauges.get(key, 0) + value
+        for name, labels, counts, total, count in sample.get('histograms', ()):
+            if name not in METRICS or len(counts) != len(METRICS[name][2]) + 1:
+                continue
+            key = (name, tuple(map(tuple, labels)))
+            merged = self.histograms.get(key)
+            if merged is None:
+                self.histograms[key] = [list(counts), total, count]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+    def to_sample(self, include_gauges: bool = True) -> Dict:
+        sample = {
+            'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            'histograms': [[name, list(labels), counts, total, count]
+                           for (name, labels), (counts, total, count) in self.histograms.items()]
+        }
+        if include_gauges:
+            sample['gauges'] = [[name, list(labels), value] for (name, labels), value in self.gauges.items()]
+        return sample
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        series: Dict[str, List[str]] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            series.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            series.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total, count) in sorted(self.histograms.items()):
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(METRICS[name][2] + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        output = []
+        for name, lines in series.items():
+            if name in METRICS:
+                kind, help_text, _ = METRICS[name]
+                output.append(f"# HELP {name} {help_text}")
+                output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{k}="' + v.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for k, v in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class ExecutorGauge:
+    """Counts the tasks running in one named executor or pool for the saturation gauges."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.active = 0
+        self._lock = Lock()
+        metrics.add_gauges(self.gauges)
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def wrap(self, fn: Callable) -> Callable:
+        def tracked(*args, **kwargs):
+            with self.track():
+                return fn(*args, **kwargs)
+        return tracked
+
+    def gauges(self):
+        labels = {'executor': self.name}
+        return [('dockpeek_executor_active', labels, self.active),
+                ('dockpeek_executor_capacity', labels, self.capacity)]
+
+
+def _gevent_gauges():
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return []
+    # Only gunicorn's gevent workers run on the hub; elsewhere asking for it would create one.
+    if not monkey.is_module_patched('socket'):
+        return []
+    hub = get_hub()
+    gauges = []
+    for name, attr in (('dockpeek_gevent_loop_pending_callbacks', 'pendingcnt'),
+                       ('dockpeek_gevent_loop_active_watchers', 'activecnt')):
+        value = getattr(hub.loop, attr, None)
+        if value is not None:
+            gauges.append((name, {}, value))
+    threadpool = getattr(hub, '_threadpool', None)
+    if threadpool is not None:
+        gauges.append(('dockpeek_gevent_threadpool_queued_tasks', {}, threadpool.task_queue.qsize()))
+    return gauges
+
+
+metrics = MetricsRegistry(flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '5')))
+metrics.add_gauges(_gevent_gauges)
@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import Config
+
+from .deadline import deadline
+from .docker_utils import streaming_clients
+
+logger = logging.getLogger(__name__)
+
+
+def parse_image_name(image_name):
+    if ':' in image_name:
+        base_name, tag = image_name.rsplit(':', 1)
+    else:
+        base_name, tag = image_name, 'latest'
+    return base_name, tag
+
+
+def display_tags(image: Dict) -> List[str]:
+    tags = [tag for tag in image.get('RepoTags') or [] if tag != '<none>:<none>']
+    if tags:
+        return tags
+    repo_digests = image.get('RepoDigests') or []
+    if repo_digests:
+        return [f"{repo_digests[0].split('@')[0]}:<none>"]
+    return ["<none>:<none>"]
+
+
+def unique_size(image: Dict) -> int:
+    """Bytes only this image holds; the daemon reports SharedSize -1 when it did not compute it."""
+    size = image.get('Size') or 0
+    shared = image.get('SharedSize') or 0
+    return size - shared if 0 < shared <= size else size
+
+
+class HostPrunePlan(NamedTuple):
+    server: str
+    url: str
+    created_at: float
+    images: List[Dict]
+    removable_ids: Tuple[str, ...]
+    reclaimable: int
+
+
+class PrunePlanner:
+    """Works out which unused images each host can drop, from one image and one container listing per host.
+
+    ``/images/json?shared-size=1`` returns every image with its size and the
+    part of it shared with other images, and ``/containers/json`` the image of
+    every container, so no per-container or per-image lookups are needed.
+    Unlike ``/system/df``, neither call sizes volumes, the build cache or
+    container layers. Plans are cached for ``ttl`` seconds so the confirm step
+    removes exactly what the preview showed.
+    """
+
+    def __init__(self, ttl: float = 60.0, remove_concurrency: int = 4):
+        self.ttl = ttl
+        self.remove_concurrency = remove_concurrency
+        self.api_timeout = Config.DOCKER_API_TIMEOUT
+        self._plans: Dict[str, HostPrunePlan] = {}
+        self._lock = Lock()
+
+    def plan(self, servers: List[Dict]) -> Tuple[List[HostPrunePlan], Dict[str, str]]:
+        return self._for_each_server(servers, self._get_plan)
+
+    def prune(self, servers: List[Dict]) -> Tuple[List[Dict], Dict[str, str]]:
+        return self._for_each_server(servers, self._prune_server)
+
+    def invalidate(self, url: Optional[str] = None):
+        with self._lock:
+            if url is None:
+                self._plans.clear()
+            else:
+                self._plans.pop(url, None)
+
+    def _for_each_server(self, servers, fn):
+        results = []
+        errors = {}
+        if not servers:
+            return results, errors
+        with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+            futures = [(server, executor.submit(fn, server)) for server in servers]
+            for server, future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors[server['name']] = str(e)
+        return results, errors
+
+    def _get_plan(self, server: Dict) -> HostPrunePlan:
+        with self._lock:
+            cached = self._plans.get(server['url'])
+        if cached is not None and time.monotonic() - cached.created_at < self.ttl:
+            return cached
+
+        with deadline(self.api_timeout, server['name'], "image listing"):
+            usage = self._disk_usage(server['client'])
+        plan = self._build_plan(server, usage)
+        with self._lock:
+            self._plans[server['url']] = plan
+        return plan
+
+    @staticmethod
+    def _disk_usage(client) -> Dict:
+        # APIClient.images() has no shared-size option; daemons before API 1.42 report SharedSize -1.
+        response = client.api.get(client.api._url('/images/json'), params={'shared-size': 1},
+                                  timeout=client.api.timeout)
+        response.raise_for_status()
+        return {'Images': response.json() or [], 'Containers': client.api.containers(all=True)}
+
+    @staticmethod
+    def _build_plan(server: Dict, usage: Dict) -> HostPrunePlan:
+        images = usage.get('Images') or []
+        containers = usage.get('Containers') or []
+        created_by_id = {image['Id']: image.get('Created') or 0 for image in images}
+
+        used_ids = set()
+        newest_in_use = {}
+        for container in containers:
+            image_id = container.get('ImageID', '')
+            used_ids.add(image_id)
+            image_name = container.get('Image', '')
+            if not image_name or image_name.startswith('sha256:'):
+                continue
+            base_name, tag = parse_image_name(image_name)
+            key = f"{base_name}:{tag}"
+            created = created_by_id.get(image_id, 0)
+            if created > newest_in_use.get(key, 0):
+                newest_in_use[key] = created
+
+        planned = []
+        removable_ids = []
+        reclaimable = 0
+        for image in images:
+            if image['Id'] in used_ids or (image.get('Containers') or 0) > 0:
+                continue
+            tags = display_tags(image)
+            created = image.get('Created') or 0
+            # A newer image under a tag that a container runs is an update waiting to be applied.
+            pending_update = any(created > newest_in_use.get(tag, created) for tag in tags)
+            planned.append({
+                'id': image['Id'],
+                'tags': tags,
+                'size': image.get('Size') or 0,
+                'reclaimable_size': unique_size(image),
+                'pending_update': pending_update
+            })
+            if not pending_update:
+                removable_ids.append(image['Id'])
+                reclaimable += unique_size(image)
+
+        return HostPrunePlan(server['name'], server['url'], time.monotonic(), planned,
+                             tuple(removable_ids), reclaimable)
+
+    def _prune_server(self, server: Dict) -> Dict:
+        plan = self._get_plan(server)
+        self.invalidate(server['url'])
+        if not plan.removable_ids:
+            return {'server': server['name'], 'count': 0, 'size': 0}
+
+        # A container may have been created from one of the images since the plan was made.
+        with deadline(self.api_timeout, server['name'], "container listing"):
+            in_use = {c.get('ImageID') for c in server['client'].api.containers(all=True)}
+        sizes = {image['id']: image['reclaimable_size'] for image in plan.images}
+        targets = [image_id for image_id in plan.removable_ids if image_id not in in_use]
+
+        removed = []
+        with streaming_clients.acquire(server['url']) as client:
+            def remove(image_id):
+                try:
+                    client.images.remove(image_id, force=True)
+                    return image_id
+                except Exception as e:
+                    logger.warning(f"[{server['name']}] Could not remove image {image_id}: {e}")
+                    return None
+
+            with ThreadPoolExecutor(max_workers=max(1, min(self.remove_concurrency, len(targets)))) as executor:
+                removed = [image_id for image_id in executor.map(remove, targets) if image_id]
+
+        size = sum(sizes[image_id] for image_id in removed)
+        logger.info(f"[{server['name']}] Pruned {len(removed)} images, reclaimed {size} bytes")
+        return {'server': server['name'], 'count': len(removed), 'size': size}
+
+
+prune_planner = PrunePlanner(
+    ttl=float(os.getenv('PRUNE_PLAN_TTL', '60')),
+    remove_concurrency=int(os.getenv('PRUNE_CONCURRENCY', '4'))
+)
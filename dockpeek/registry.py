@@ -0,0 +1,183 @@
+import re
+import time
+import logging
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DOCKER_HUB_REGISTRY = "registry-1.docker.io"
+DOCKER_HUB_ALIASES = {"docker.io", "index.docker.io", "registry-1.docker.io"}
+
+MANIFEST_LIST_TYPES = {
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+}
+MANIFEST_TYPES = {
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+}
+
+
+class RegistryError(Exception):
+    pass
+
+
+class ImageReference(NamedTuple):
+    registry: str
+    repository: str
+    tag: str
+
+    @classmethod
+    def parse(cls, base_name: str, tag: str) -> 'ImageReference':
+        parts = base_name.split('/', 1)
+        if len(parts) == 2 and ('.' in parts[0] or ':' in parts[0] or parts[0] == 'localhost'):
+            registry, repository = parts
+        else:
+            registry, repository = DOCKER_HUB_REGISTRY, base_name
+
+        if registry in DOCKER_HUB_ALIASES:
+            registry = DOCKER_HUB_REGISTRY
+            if '/' not in repository:
+                repository = f"library/{repository}"
+        return cls(registry, repository, tag)
+
+
+def normalize_reference(reference: str) -> str:
+    """Canonical form of a tag or digest reference, so ``nginx`` and ``docker.io/library/nginx:latest`` match."""
+    name, _, digest = reference.partition('@')
+    slash = name.rfind('/')
+    colon = name.rfind(':')
+    if colon > slash:
+        name, tag = name[:colon], name[colon + 1:]
+    else:
+        tag = 'latest'
+
+    ref = ImageReference.parse(name, tag)
+    if digest:
+        return f"{ref.registry}/{ref.repository}@{digest}"
+    return f"{ref.registry}/{ref.repository}:{ref.tag}"
+
+
+class Platform(NamedTuple):
+    os: str
+    architecture: str
+    variant: Optional[str] = None
+
+
+# `uname -m` of the daemon host (docker info "Architecture") -> manifest list variant.
+MACHINE_VARIANTS = {
+    "armv5l": "v5", "armv5tel": "v5", "armv6l": "v6", "armv7l": "v7", "armv8l": "v8",
+    "aarch64": "v8", "arm64": "v8",
+}
+
+
+class RemoteManifest(NamedTuple):
+    digest: str
+    media_type: str
+
+
+class RegistryClient:
+    """Minimal Docker distribution API client for manifest digests.
+
+    Only manifest HEAD requests are needed to learn whether a tag moved; the
+    manifest list is fetched solely to resolve a platform-specific digest.
+    """
+
+    ACCEPT = ", ".join(sorted(MANIFEST_LIST_TYPES | MANIFEST_TYPES))
+
+    def __init__(self, timeout: float = 10.0, insecure_registries: Tuple[str, ...] = ()):
+        self.timeout = timeout
+        self.insecure_registries = set(insecure_registries)
+        self._session = requests.Session()
+        self._tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._lock = Lock()
+
+    def _base_url(self, registry: str) -> str:
+        host = registry.split(':')[0]
+        insecure = registry in self.insecure_registries or host == 'localhost' or host.startswith('127.')
+        return f"{'http' if insecure else 'https'}://{registry}/v2"
+
+    def _request(self, method: str, ref: ImageReference, path: str, accept: str) -> requests.Response:
+        url = f"{self._base_url(ref.registry)}/{ref.repository}/{path}"
+        token_key = (ref.registry, ref.repository)
+
+        for attempt in range(2):
+            headers = {"Accept": accept}
+            with self._lock:
+                token = self._tokens.get(token_key)
+            if token and token[1] > time.time():
+                headers["Authorization"] = f"Bearer {token[0]}"
+
+            try:
+                response = self._session.request(method, url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                raise RegistryError(f"Cannot reach {ref.registry}: {e}")
+
+            if response.status_code == 401 and attempt == 0:
+                self._authenticate(token_key, response.headers.get("WWW-Authenticate", ""))
+                continue
+            if response.status_code != 200:
+                raise RegistryError(f"{method} {url} returned {response.status_code}")
+            return response
+
+        raise RegistryError(f"Authentication required for {ref.registry}/{ref.repository}")
+
+    def _authenticate(self, token_key: Tuple[str, str], challenge: str):
+        if not challenge.lower().startswith("bearer "):
+            raise RegistryError(f"Unsupported registry authentication: {challenge or 'none'}")
+
+        params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+        realm = params.pop("realm", None)
+        if not realm:
+            raise RegistryError("Registry token challenge has no realm")
+        params.setdefault("scope", f"repository:{token_key[1]}:pull")
+
+        try:
+            response = self._session.get(realm, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RegistryError(f"Cannot get registry token from {realm}: {e}")
+
+        token = body.get("token") or body.get("access_token")
+        if not token:
+            raise RegistryError(f"No token returned by {realm}")
+        expires_in = body.get("expires_in", 60)
+        with self._lock:
+            self._tokens[token_key] = (token, time.time() + max(expires_in - 10, 10))
+
+    def head_manifest(self, ref: ImageReference) -> RemoteManifest:
+        response = self._request("HEAD", ref, f"manifests/{ref.tag}", self.ACCEPT)
+        digest = response.headers.get("Docker-Content-Digest")
+        if not digest:
+            # Some registries omit the digest on HEAD; fall back to GET.
+            response = self._request("GET", ref, f"manifests/{ref.tag}", self.ACCEPT)
+            digest = response.headers.get("Docker-Content-Digest")
+        if not digest:
+            raise RegistryError(f"No manifest digest for {ref.repository}:{ref.tag}")
+        media_type = response.headers.get("Content-Type", "").split(';')[0].strip()
+        return RemoteManifest(digest, media_type)
+
+    def platform_digest(self, ref: ImageReference, index_digest: str, platform: Platform) -> Optional[str]:
+        response = self._request("GET", ref, f"manifests/{index_digest}", ", ".join(sorted(MANIFEST_LIST_TYPES)))
+        try:
+            manifests = response.json().get("manifests", [])
+        except ValueError:
+            raise RegistryError(f"Invalid manifest list for {ref.repository}:{ref.tag}")
+        return select_platform_digest(manifests, platform)
+
+
+def select_platform_digest(manifests: List[Dict], platform: Platform) -> Optional[str]:
+    candidates = [
+        m for m in manifests
+        if m.get("platform", {}).get("os") == platform.os
+        and m.get("platform", {}).get("architecture") == platform.architecture
+    ]
+    exact = [m for m in candidates if platform.variant and m["platform"].get("variant") == platform.variant]
+    # Without an exact match a variant-less entry is the generic build, not just whichever comes first.
+    plain = [m for m in candidates if not m["platform"].get("variant")]
+    candidates = exact or plain or candidates
+    return candidates[0]["digest"] if candidates else None
@@ -0,0 +1,155 @@
+import os
+import gzip
+import json
+import zlib
+import logging
+from typing import Any, Iterable, Iterator, Optional
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/html', 'text/plain'}
+
+
+def _select_backend() -> str:
+    requested = os.getenv('JSON_BACKEND', 'auto').lower()
+    if requested == 'json' or orjson is None:
+        if requested == 'orjson':
+            logger.warning("JSON_BACKEND=orjson but orjson is not installed, using the standard library")
+        return 'json'
+    return 'orjson'
+
+
+JSON_BACKEND = _select_backend()
+
+
+def _default(obj: Any) -> Any:
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes with the fastest available backend."""
+    if JSON_BACKEND == 'orjson':
+        # Dates go through Flask's default so they render the same with either backend.
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, ensure_ascii=False, indent=2 if indent else None,
+                      separators=None if indent else (',', ':')).encode()
+
+
+def iter_json_document(head: dict, list_key: str, items: Iterable[Any]) -> Iterator[bytes]:
+    """Yield an indented ``{**head, list_key: [*items]}`` document one list item at a time."""
+    def nested(obj: Any, depth: int) -> bytes:
+        return dumps(obj, indent=True).replace(b'\n', b'\n' + b' ' * depth)
+
+    prefix = b'{'
+    for key, value in head.items():
+        yield prefix + b'\n  ' + dumps(key) + b': ' + nested(value, 2)
+        prefix = b','
+
+    yield prefix + b'\n  ' + dumps(list_key) + b': ['
+    separator = b'\n    '
+    for item in items:
+        yield separator + nested(item, 4)
+        separator = b',\n    '
+    yield b'\n  ]\n}' if separator != b'\n    ' else b']\n}'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by ``dumps`` so jsonify uses orjson when installed."""
+
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+class ResponseCompressor:
+    """Compresses buffered and streamed responses according to Accept-Encoding."""
+
+    def __init__(self):
+        self.enabled = os.getenv('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+        self.min_size = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+        self.gzip_level = int(os.getenv('GZIP_LEVEL', '6'))
+        self.brotli_quality = int(os.getenv('BROTLI_QUALITY', '4'))
+
+    def choose_encoding(self) -> Optional[str]:
+        if not self.enabled:
+            return None
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_stream(self, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        # Each chunk is flushed so clients see progress instead of waiting for the whole body.
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+
+    def after_request(self, response: Response) -> Response:
+        if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        # A compressed body is a different byte sequence, so a strong validator would be wrong.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def stream(self, chunks: Iterable[bytes], **kwargs) -> Response:
+        """Response that sends ``chunks`` as they are produced, compressed when the client allows it."""
+        encoding = self.choose_encoding()
+        body = self.compress_stream(chunks, encoding) if encoding else chunks
+        response = Response(body, **kwargs)
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+compressor = ResponseCompressor()
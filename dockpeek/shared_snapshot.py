@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import hashlib
+import subprocess
+import threading
+from threading import Lock
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR_ENV = "DOCKPEEK_SNAPSHOT_DIR"
+ROLE_ENV = "DOCKPEEK_ROLE"
+COLLECTOR_ROLE = "collector"
+
+
+def default_snapshot_dir() -> str:
+    # /dev/shm is tmpfs on Linux, so snapshot files never touch the disk.
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"dockpeek-{os.getpid()}")
+
+
+def get_snapshot_dir() -> Optional[str]:
+    return os.environ.get(SNAPSHOT_DIR_ENV) or None
+
+
+def is_snapshot_reader() -> bool:
+    """True in web workers whose inventory is owned by a separate collector process."""
+    return bool(get_snapshot_dir()) and os.environ.get(ROLE_ENV) != COLLECTOR_ROLE
+
+
+class SnapshotStore:
+    """Inventory snapshots shared between the collector and web workers.
+
+    The collector writes one file per host plus a small index; every file is
+    replaced atomically, so readers always see a complete document. Readers
+    only re-parse a file when its on-disk identity changes.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = Lock()
+        self._parsed = {}
+
+    @staticmethod
+    def host_file_name(url: str) -> str:
+        return f"host-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def write_index(self, index: Dict):
+        self._write(self.INDEX_FILE, index)
+
+    def write_host(self, url: str, data: Dict) -> str:
+        file_name = self.host_file_name(url)
+        self._write(file_name, data)
+        return file_name
+
+    def read_index(self) -> Optional[Dict]:
+        return self._read(self.INDEX_FILE)
+
+    def read_host(self, file_name: str) -> Optional[Dict]:
+        return self._read(file_name)
+
+    def _write(self, file_name: str, data: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, os.path.join(self.directory, file_name))
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read(self, file_name: str) -> Optional[Dict]:
+        path = os.path.join(self.directory, file_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._parsed.get(file_name)
+            if cached and cached[0] == identity:
+                return cached[1]
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not read snapshot file {file_name}: {e}")
+            return None
+
+        with self._lock:
+            self._parsed[file_name] = (identity, data)
+        return data
+
+
+class CollectorProcess:
+    """Runs the collector as a child of the gunicorn master and restarts it if it dies."""
+
+    RESTART_BACKOFF_MAX = 30
+
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = snapshot_dir
+        self._process: Optional[subprocess.Popen] = None
+        self._stopping = threading.Event()
+        self._supervisor = None
+
+    def start(self):
+        self._spawn()
+        self._supervisor = threading.Thread(target=self._supervise, name="collector-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _spawn(self):
+        env = dict(os.environ)
+        env[SNAPSHOT_DIR_ENV] = self.snapshot_dir
+        env[ROLE_ENV] = COLLECTOR_ROLE
+        self._process = subprocess.Popen([sys.executable, '-m', 'dockpeek.collector'], env=env)
+
+    def _supervise(self):
+        backoff = 1
+        while not self._stopping.is_set():
+            returncode = self._process.wait()
+            if self._stopping.is_set() or returncode == 0:
+                return
+            logger.error(f"Collector exited with code {returncode}, restarting in {backoff}s")
+            if self._stopping.wait(backoff):
+                return
+            backoff = min(backoff * 2, self.RESTART_BACKOFF_MAX)
+            self._spawn()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
@@ -35,17 +35,19 @@ export async function fetchContainerData() {
   loadFilterStates();
   try {
     const response = await fetch(apiUrl("/data"), {
-      signal: fetchController.signal
+      signal: fetchController.signal,
+      cache: 'no-cache'
     });
     if (!response.ok) throw createResponseError(response);
 
-    const { servers = [], containers = [], traefik_enabled = true, port_range_grouping_enabled = true, port_range_threshold = 5, swarm_servers = [] } = await response.json();
+    const { servers = [], containers = [], traefik_enabled = true, port_range_grouping_enabled = true, port_range_threshold = 5, swarm_servers = [], revision = null } = await response.json();
 
     state.allServersData.splice(0, state.allServersData.length, ...servers);
     setCachedServerStatus(servers);
     state.allContainersData.splice(0, state.allContainersData.length, ...containers);
 
     state.swarmServers = swarm_servers;
+    state.dataRevision = revision;
 
     window.traefikEnabled = traefik_enabled;
     window.portRangeGroupingEnabled = port_range_grouping_enabled;
@@ -165,6 +167,50 @@ export async function checkForUpdates() {
   await checkUpdatesIndividually();
 }
 
+async function readJobEvents(jobId, onEvent) {
+  let lastSeq = 0;
+  let retries = 0;
+
+  while (state.isCheckingForUpdates) {
+    try {
+      const response = await fetch(apiUrl(`/update-jobs/${jobId}/events?after=${lastSeq}`));
+      if (!response.ok) throw new Error(`Failed to read job progress: ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        if (!state.isCheckingForUpdates) {
+          reader.cancel();
+          return null;
+        }
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.seq) lastSeq = event.seq;
+          retries = 0;
+          onEvent(event);
+          if (event.type === 'finished') return event;
+        }
+      }
+    } catch (error) {
+      // The job keeps running on the server; reconnect and resume after the last event.
+      if (++retries > 5) throw error;
+      console.warn(`Update job stream interrupted, reconnecting (${retries}/5)`, error);
+      await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+    }
+  }
+  return null;
+}
+
 async function checkUpdatesIndividually() {
   const checkUpdatesButton = document.getElementById('check-updates-button');
 
@@ -179,99 +225,40 @@ async function checkUpdatesIndividually() {
   `;
   checkUpdatesButton.disabled = false;
 
+  let jobId = null;
+
   try {
-    console.log('Fetching containers list...');
-    const containersResponse = await fetch(apiUrl("/get-containers-list"), {
+    const jobResponse = await fetch(apiUrl("/update-jobs"), {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ server_filter: state.currentServerFilter })
     });
 
-    if (!containersResponse.ok) {
-      throw new Error(`Failed to get containers list: ${containersResponse.status}`);
-    }
-
-    const { containers, total } = await containersResponse.json();
-    console.log(`Found ${total} containers to check`);
-
-    if (total === 0) {
-      showNoUpdatesModal();
-      return;
+    if (!jobResponse.ok) {
+      throw new Error(`Failed to start update check: ${jobResponse.status}`);
     }
 
-    showProgressModal(total);
+    ({ job_id: jobId } = await jobResponse.json());
+    state.updateJobId = jobId;
+    console.log(`Update check job ${jobId} started`);
 
     const updates = {};
     const updatedContainers = [];
-    let processed = 0;
-
-    const CONCURRENCY_LIMIT = 3; // Number of parallel checks
-    const queue = [...containers];
-
-    const checkContainer = async (container) => {
-      if (!state.isCheckingForUpdates) return null;
-
-      processed++;
-      updateProgressModal(processed, total, container.key);
-
-      console.log(`Checking ${container.key} (${processed + 1}/${total})`);
-      let updateResult = false;
-      let cancelled = false;
-
-      try {
-        const response = await fetch(apiUrl("/check-single-update"), {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
-            server_name: container.server_name,
-            container_name: container.container_name
-          })
-        });
-
-        if (!response.ok) {
-          console.error(`Failed to check ${container.key}: ${response.status}`);
-        } else {
-          const result = await response.json();
-          if (result.cancelled) {
-            cancelled = true;
-          } else {
-            updateResult = result.update_available;
-            console.log(`${container.key}: ${updateResult ? 'UPDATE AVAILABLE' : 'up to date'}`);
-          }
-        }
-      } catch (error) {
-        console.error(`Error checking ${container.key}:`, error);
-      }
-      if (cancelled) {
-        state.isCheckingForUpdates = false;
-      }
 
-      return { key: container.key, update_available: updateResult };
-    };
-
-    const workers = Array(CONCURRENCY_LIMIT).fill(null).map(async () => {
-      const workerResults = [];
-      while (queue.length > 0) {
-        if (!state.isCheckingForUpdates) break;
-        const container = queue.shift();
-        if (container) {
-          const result = await checkContainer(container);
-          if (result) {
-            workerResults.push(result);
-          }
-        }
+    const finished = await readJobEvents(jobId, (event) => {
+      if (event.type === 'started') {
+        console.log(`Found ${event.total} containers to check`);
+        if (event.total > 0) showProgressModal(event.total);
+      } else if (event.type === 'result') {
+        updates[event.key] = event.update_available;
+        updateProgressModal(event.processed, event.total, event.key);
+        console.log(`${event.key}: ${event.update_available ? 'UPDATE AVAILABLE' : 'up to date'}`);
+      } else if (event.type === 'error') {
+        console.error(`Update check error on ${event.server}: ${event.message}`);
       }
-      return workerResults;
     });
 
-    const allWorkerResults = await Promise.all(workers);
-    const allResults = allWorkerResults.flat();
-
-    const cancelled = !state.isCheckingForUpdates;
-
-    allResults.forEach(result => {
-      updates[result.key] = result.update_available;
-    });
+    const cancelled = !finished || finished.status === 'cancelled';
 
     state.allContainersData.forEach(container => {
       const key = `${container.server}:${container.name}`;
@@ -287,6 +274,10 @@ async function checkUpdatesIndividually() {
     updateUpdatesLabel();
     hideProgressModal();
 
+    if (finished && finished.status === 'failed') {
+      throw new Error(finished.error || 'Update check failed');
+    }
+
     if (!cancelled) {
       if (updatedContainers.length > 0) {
         showUpdatesModal(updatedContainers);
@@ -302,6 +293,7 @@ async function checkUpdatesIndividually() {
     hideProgressModal();
     alert("Failed to check for updates. Please try again.");
   } finally {
+    state.updateJobId = null;
     resetUpdateButton();
   }
 }
@@ -408,8 +400,38 @@ export async function installUpdate(serverName, containerName) {
 }
 let statusRefreshController = null;
 
+function serversChanged(servers) {
+  if (servers.length !== state.allServersData.length) return true;
+  return servers.some(server => {
+    const known = state.allServersData.find(s => s.name === server.name);
+    return !known || known.status !== server.status;
+  });
+}
+
+function applyDelta({ added = [], changed = [], removed = [] }) {
+  const keyOf = c => `${c.server}:${c.name}`;
+
+  const removedKeys = new Set(removed.map(keyOf));
+  for (let i = state.allContainersData.length - 1; i >= 0; i--) {
+    if (removedKeys.has(keyOf(state.allContainersData[i]))) {
+      state.allContainersData.splice(i, 1);
+    }
+  }
+
+  const indexByKey = new Map(state.allContainersData.map((c, i) => [keyOf(c), i]));
+  [...added, ...changed].forEach(record => {
+    const index = indexByKey.get(keyOf(record));
+    if (index === undefined) {
+      indexByKey.set(keyOf(record), state.allContainersData.length);
+      state.allContainersData.push(record);
+    } else {
+      state.allContainersData[index] = record;
+    }
+  });
+}
+
 export async function refreshContainerStatus() {
-  if (!state.isDataLoaded) return;
+  if (!state.isDataLoaded || !state.dataRevision) return;
 
   if (statusRefreshController) {
     statusRefreshController.abort();
@@ -418,51 +440,27 @@ export async function refreshContainerStatus() {
   statusRefreshController = new AbortController();
 
   try {
-    const response = await fetch(apiUrl("/status"), {
+    const response = await fetch(`${apiUrl("/data/delta")}?since=${encodeURIComponent(state.dataRevision)}`, {
       signal: statusRefreshController.signal
     });
     
     if (!response.ok) return;
 
-    const { statuses = [] } = await response.json();
-
-    if (statuses.length === 0) {
-      console.warn("Status refresh returned empty - skipping update");
-      return;
-    }
-
-    const existingKeys = new Set(
-      state.allContainersData.map(c => `${c.server}:${c.name}`)
-    );
-    const statusKeys = new Set(statuses.map(s => `${s.server}:${s.name}`));
-
-    const hasNewContainers = statuses.some(
-      s => !existingKeys.has(`${s.server}:${s.name}`)
-    );
+    const delta = await response.json();
 
-    if (hasNewContainers) {
-      console.log("New containers detected - reloading full data");
+    if (delta.reset || serversChanged(delta.servers || [])) {
+      console.log("Snapshot changed beyond delta - reloading full data");
       await fetchContainerData();
       return;
     }
 
-    for (let i = state.allContainersData.length - 1; i >= 0; i--) {
-      const container = state.allContainersData[i];
-      if (!statusKeys.has(`${container.server}:${container.name}`)) {
-        state.allContainersData.splice(i, 1);
-      }
+    state.dataRevision = delta.revision;
+    if (!delta.added.length && !delta.changed.length && !delta.removed.length) {
+      return;
     }
 
-    state.allContainersData.forEach(existing => {
-      const updated = statuses.find(
-        s => s.server === existing.server && s.name === existing.name
-      );
-      if (updated) {
-        existing.status = updated.status;
-        existing.exit_code = updated.exit_code;
-        existing.started_at = updated.started_at;
-      }
-    });
+    applyDelta(delta);
+    state.swarmServers = delta.swarm_servers || state.swarmServers;
 
     updateDisplay();
     updateUpdatesLabel();
@@ -475,16 +473,70 @@ export async function refreshContainerStatus() {
   }
 }
 
-let statusRefreshInterval = null;
+let statusEventSource = null;
+let statusRenderScheduled = false;
+
+function findContainer(server, name) {
+  return state.allContainersData.find(c => c.server === server && c.name === name);
+}
+
+function scheduleStatusRender() {
+  if (statusRenderScheduled) return;
+  statusRenderScheduled = true;
+  setTimeout(() => {
+    statusRenderScheduled = false;
+    updateDisplay();
+    updateUpdatesLabel();
+  }, 250);
+}
+
+function handleStatusEvent(event) {
+  const data = JSON.parse(event.data);
+  const container = findContainer(data.server, data.name);
+  if (!container) {
+    refreshContainerStatus();
+    return;
+  }
+  container.status = data.status;
+  container.exit_code = data.exit_code;
+  container.started_at = data.started_at;
+  scheduleStatusRender();
+}
+
+function handleUpdateEvent(event) {
+  const data = JSON.parse(event.data);
+  const container = findContainer(data.server, data.name);
+  if (!container) return;
+  container.update_available = data.update_available;
+  scheduleStatusRender();
+}
 
 export function startStatusRefresh() {
-  if (statusRefreshInterval) return;
-  statusRefreshInterval = setInterval(refreshContainerStatus, 60000);
+  if (statusEventSource) return;
+
+  statusEventSource = new EventSource(apiUrl("/status-stream"));
+  statusEventSource.addEventListener('status', handleStatusEvent);
+  statusEventSource.addEventListener('update', handleUpdateEvent);
+  ['added', 'removed', 'resync'].forEach(type => {
+    statusEventSource.addEventListener(type, () => refreshContainerStatus());
+  });
+
+  let disconnected = false;
+  statusEventSource.onerror = () => {
+    disconnected = true;
+  };
+  statusEventSource.onopen = () => {
+    // Catch up on anything missed while the stream was reconnecting.
+    if (disconnected) {
+      disconnected = false;
+      refreshContainerStatus();
+    }
+  };
 }
 
 export function stopStatusRefresh() {
-  if (statusRefreshInterval) {
-    clearInterval(statusRefreshInterval);
-    statusRefreshInterval = null;
+  if (statusEventSource) {
+    statusEventSource.close();
+    statusEventSource = null;
   }
-}
\ No newline at end of file
+}
@@ -19,6 +19,9 @@ export class LogsViewer {
     this.currentContainerIndex = -1;
     this.fetchController = null;
     this.streamController = null;
+    this.serverQuery = '';
+    this.querySince = null;
+    this.beforeCursor = null;
     this.initModal();
   }
 
@@ -121,21 +124,35 @@ export class LogsViewer {
           </div>
           
           <div class="logs-search-bar">
-            <input type="text" id="logs-search-input" placeholder="Search in logs..." class="logs-search-input">
-            <div class="logs-search-controls">
-              <button id="logs-search-clear" class="logs-search-clear hidden">×</button>
-              <span id="logs-search-count" class="logs-search-count hidden">0/0</span>
-              <button id="logs-search-prev" class="logs-search-nav hidden" title="Previous (Shift+Enter)">
-                <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                  <polyline points="15 18 9 12 15 6"></polyline>
-                </svg>
-              </button>
-              <button id="logs-search-next" class="logs-search-nav hidden" title="Next (Enter)">
-                <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                  <polyline points="9 18 15 12 9 6"></polyline>
-                </svg>
-              </button>
+            <div class="logs-search-field">
+              <input type="text" id="logs-search-input" placeholder="Search in logs..." class="logs-search-input">
+              <div class="logs-search-controls">
+                <button id="logs-search-clear" class="logs-search-clear hidden">×</button>
+                <span id="logs-search-count" class="logs-search-count hidden">0/0</span>
+                <button id="logs-search-prev" class="logs-search-nav hidden" title="Previous (Shift+Enter)">
+                  <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                    <polyline points="15 18 9 12 15 6"></polyline>
+                  </svg>
+                </button>
+                <button id="logs-search-next" class="logs-search-nav hidden" title="Next (Enter)">
+                  <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                    <polyline points="9 18 15 12 9 6"></polyline>
+                  </svg>
+                </button>
+              </div>
             </div>
+
+            <select id="logs-range-select" class="logs-select" data-tooltip="Time range">
+              <option value="" selected>Any time</option>
+              <option value="900">Last 15 minutes</option>
+              <option value="3600">Last hour</option>
+              <option value="86400">Last 24 hours</option>
+              <option value="604800">Last 7 days</option>
+            </select>
+
+            <button id="logs-search-server" class="logs-control-btn" data-tooltip="Search the whole log on the server">
+              Search all
+            </button>
           </div>
           
           <div id="logs-content" class="logs-content">
@@ -246,6 +263,24 @@ export class LogsViewer {
     document.getElementById('logs-search-clear').addEventListener('click', () => {
       searchInput.value = '';
       this.handleSearch('');
+      if (this.serverQuery) {
+        this.serverQuery = '';
+        this.refresh();
+      }
+    });
+
+    document.getElementById('logs-search-server').addEventListener('click', () => {
+      this.serverQuery = searchInput.value.trim();
+      this.refresh();
+    });
+
+    document.getElementById('logs-range-select').addEventListener('change', () => this.refresh());
+
+    this.logsContent.addEventListener('click', (e) => {
+      const button = e.target.closest('#logs-load-older');
+      if (!button) return;
+      button.disabled = true;
+      this.queryLogs(this.beforeCursor);
     });
 
     document.getElementById('logs-search-prev').addEventListener('click', () => {
@@ -397,6 +432,8 @@ export class LogsViewer {
     this.currentContainer = null;
     this.searchMatches = [];
     this.currentMatchIndex = -1;
+    this.serverQuery = '';
+    this.beforeCursor = null;
   }
 
   showLoading() {
@@ -412,6 +449,10 @@ export class LogsViewer {
   }
 
   async fetchLogs() {
+    if (this.serverQuery || document.getElementById('logs-range-select').value) {
+      return this.queryLogs();
+    }
+
     const tailSelect = document.getElementById('logs-tail-select');
     const tail = tailSelect.value === 'all' ? 10000 : parseInt(tailSelect.value);
 
@@ -446,6 +487,78 @@ export class LogsViewer {
     }
   }
 
+  // Search and time range are applied by the server, a page at a time.
+  async queryLogs(cursor = null) {
+    const tailSelect = document.getElementById('logs-tail-select');
+    const limit = tailSelect.value === 'all' ? 5000 : Math.min(parseInt(tailSelect.value), 5000);
+
+    if (!cursor) {
+      const range = document.getElementById('logs-range-select').value;
+      this.querySince = range ? Math.floor(Date.now() / 1000) - parseInt(range) : null;
+    }
+
+    try {
+      const response = await fetch(apiUrl('/query-container-logs'), {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          server_name: this.currentServer,
+          container_name: this.currentContainer,
+          is_swarm: this.isSwarm || false,
+          query: this.serverQuery || null,
+          since: this.querySince,
+          limit: limit,
+          cursor: cursor,
+          direction: 'backward'
+        }),
+        signal: this.fetchController.signal
+      });
+
+      const data = await response.json();
+
+      if (!data.success) {
+        this.displayError(data.error);
+        return;
+      }
+
+      this.beforeCursor = data.has_more ? data.before_cursor : null;
+      if (cursor) {
+        this.prependLogLines(data.lines);
+      } else {
+        this.displayLogs(data.lines.join('\n'));
+      }
+      this.updateLoadOlderButton();
+      this.updateLineCount(this.logsContent.querySelectorAll('.log-line').length);
+      this.updateStatus(this.serverQuery ? `Lines matching "${this.serverQuery}"` : 'Logs loaded');
+
+      const searchInput = document.getElementById('logs-search-input');
+      if (searchInput.value) this.handleSearch(searchInput.value);
+    } catch (error) {
+      if (error.name === 'AbortError') {
+        console.log('Fetch aborted');
+        return;
+      }
+      this.displayError(`Failed to fetch logs: ${error.message}`);
+    }
+  }
+
+  prependLogLines(lines) {
+    const pre = this.logsContent.querySelector('.logs-pre');
+    if (!pre) return;
+
+    const previousHeight = this.logsContent.scrollHeight;
+    pre.insertAdjacentHTML('afterbegin', lines.map(line => this.formatLogLine(line)).join(''));
+    this.logsContent.scrollTop += this.logsContent.scrollHeight - previousHeight;
+  }
+
+  updateLoadOlderButton() {
+    this.logsContent.querySelector('#logs-load-older')?.remove();
+    if (this.beforeCursor) {
+      this.logsContent.insertAdjacentHTML('afterbegin',
+        '<button id="logs-load-older" class="logs-control-btn logs-load-older">Load older lines</button>');
+    }
+  }
+
   displayLogs(logsText) {
     const lines = logsText.split('\n');
     const logsHTML = lines.map(line => this.formatLogLine(line)).join('');
@@ -581,6 +694,7 @@ export class LogsViewer {
   async startStreaming() {
     this.stopStreaming();
     this.clearLogs();
+    this.beforeCursor = null;
 
     const tailSelect = document.getElementById('logs-tail-select');
     const tail = Math.min(parseInt(tailSelect.value) || 100, 100);
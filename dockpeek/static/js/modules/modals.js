@@ -1,5 +1,6 @@
 import { updateDisplay } from './filters.js';
 import { state } from './state.js';
+import { apiUrl } from './config.js';
 
 export function showUpdatesModal(updatedContainers) {
   const updatesList = document.getElementById("updates-list");
@@ -111,6 +112,9 @@ export function showProgressModal(total) {
 
   const cancelHandler = () => {
     state.isCheckingForUpdates = false;
+    if (state.updateJobId) {
+      fetch(apiUrl(`/update-jobs/${state.updateJobId}/cancel`), { method: "POST" }).catch(() => {});
+    }
     hideProgressModal();
   };
 
@@ -8,6 +8,7 @@ export const state = {
   },
   filteredAndSortedContainers: [],
   swarmServers: [],
+  dataRevision: null,
   pruneInfoCache: null,
   currentSortColumn: "name",
   currentSortDirection: "asc",
@@ -15,6 +16,7 @@ export const state = {
   isDataLoaded: false,
   isCheckingForUpdates: false,
   updateCheckController: null,
+  updateJobId: null,
   columnOrder: ['name', 'stack', 'server', 'ports', 'traefik', 'image', 'tags', 'logs', 'status'],
   columnVisibility: {
     name: true,
@@ -0,0 +1,183 @@
+import json
+import logging
+import queue
+import threading
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from .docker_utils import get_container_status_with_exit_code
+from .inventory import inventory_manager
+from .metrics import metrics
+from .update import update_checker
+
+logger = logging.getLogger(__name__)
+
+
+class StatusSubscription:
+    def __init__(self, max_pending: int):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def push(self, event: Dict):
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # The client fell too far behind; tell it to resync instead of
+            # buffering without bound.
+            self.overflowed = True
+
+    def reset(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self.overflowed = False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class StatusBroadcaster:
+    """Fans inventory and update-cache changes out to every connected status stream.
+
+    A single watcher thread per worker follows the shared host inventories, so
+    the number of open browser tabs does not change the load on any daemon.
+    """
+
+    WAIT_TIMEOUT = 1.0
+    MAX_PENDING_EVENTS = 1000
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = Lock()
+        self._watcher = None
+        self._last_status = {}
+        metrics.add_gauges(self._metric_gauges)
+
+    def subscribe(self) -> StatusSubscription:
+        subscription = StatusSubscription(self.MAX_PENDING_EVENTS)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name="status-broadcaster", daemon=True)
+                self._watcher.start()
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _publish(self, events: List[Dict]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                subscription.push(event)
+
+    def _metric_gauges(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return [('dockpeek_status_stream_queued_events', {}, sum(s.pending() for s in subscribers))]
+
+    def _watch(self):
+        revision = inventory_manager.revision
+        sequence = update_checker.cache_sequence
+
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._watcher = None
+                    return
+
+            for inventory in inventory_manager.hosts():
+                try:
+                    inventory.refresh_swarm_if_stale()
+                except Exception as e:
+                    logger.debug(f"[{inventory.name}] Swarm refresh failed: {e}")
+
+            current_revision = inventory_manager.wait_for_revision(revision, self.WAIT_TIMEOUT)
+            current_sequence = update_checker.cache_sequence
+
+            try:
+                events = []
+                if current_revision != revision:
+                    events.extend(self._inventory_events(revision))
+                if current_sequence != sequence:
+                    events.extend(self._update_events(sequence))
+                if events:
+                    self._publish(events)
+            except Exception as e:
+                logger.warning(f"Status broadcaster failed to compute changes: {e}")
+
+            revision, sequence = current_revision, current_sequence
+
+    def _inventory_events(self, since: int) -> List[Dict]:
+        events = []
+        for inventory in inventory_manager.hosts():
+            changes = inventory.changes_since(since)
+            if changes is None:
+                events.append({'type': 'resync', 'server': inventory.name})
+                continue
+
+            for name in changes['removed']:
+                self._last_status.pop((inventory.name, name), None)
+                events.append({'type': 'removed', 'server': inventory.name, 'name': name})
+
+            for obj in inventory.get_objects(changes['added']):
+                events.append({'type': 'added', 'server': inventory.name, 'name': obj.name})
+
+            for obj in inventory.get_objects(changes['changed']):
+                status = self._status_of(inventory, obj)
+                key = (inventory.name, obj.name)
+                if self._last_status.get(key) == status:
+                    continue
+                self._last_status[key] = status
+                events.append({
+                    'type': 'status',
+                    'server': inventory.name,
+                    'name': obj.name,
+                    'status': status[0],
+                    'exit_code': status[1],
+                    'started_at': status[2]
+                })
+        return events
+
+    @staticmethod
+    def _status_of(inventory, obj) -> Tuple:
+        if inventory.is_swarm:
+            tasks = inventory.get_tasks(obj.id)
+            running = sum(1 for t in tasks if t['Status']['State'] == 'running')
+            status = f"running ({running}/{len(tasks)})" if tasks else "no-tasks"
+            return status, None, None
+
+        container_status, exit_code = get_container_status_with_exit_code(obj)
+        return container_status, exit_code, obj.attrs.get('State', {}).get('StartedAt', '')
+
+    @staticmethod
+    def _update_events(since: int) -> List[Dict]:
+        events = []
+        containers_by_server = {inventory.name: inventory.containers() for inventory in inventory_manager.hosts()}
+        for server_name, container_name, update_available in update_checker.get_changed_results(since, containers_by_server):
+            events.append({
+                'type': 'update',
+                'server': server_name,
+                'name': container_name,
+                'update_available': update_available
+            })
+        return events
+
+
+status_broadcaster = StatusBroadcaster()
+
+
+def format_sse(event: Dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -1,9 +1,16 @@
 import os
 import logging
-from datetime import datetime, timedelta
-from threading import Lock
+import threading
+from threading import Lock, BoundedSemaphore
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import docker
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+
+from .update_store import open_update_store
+from .metrics import ExecutorGauge, metrics
+from .registry import (
+    RegistryClient, RegistryError, ImageReference, Platform, RemoteManifest, MANIFEST_LIST_TYPES, MACHINE_VARIANTS
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,62 +33,36 @@ class CancellationToken:
             return self._cancelled
 
 
-class UpdateCache:
-    def __init__(self, duration_seconds=120):
-        self._cache = {}
-        self._lock = Lock()
-        self._duration = duration_seconds
-    
-    def get(self, key):
-        with self._lock:
-            if key in self._cache:
-                result, timestamp = self._cache[key]
-                if datetime.now() - timestamp < timedelta(seconds=self._duration):
-                    return result, True
-            return None, False
-    
-    def set(self, key, value):
-        with self._lock:
-            self._cache[key] = (value, datetime.now())
-    
-    def clear(self):
-        with self._lock:
-            self._cache.clear()
-    
-    def prune_expired(self):
-        with self._lock:
-            now = datetime.now()
-            expired_keys = [
-                key for key, (_, timestamp) in self._cache.items()
-                if now - timestamp >= timedelta(seconds=self._duration)
-            ]
-            for key in expired_keys:
-                del self._cache[key]
-            return len(expired_keys)
-    
-    def get_stats(self):
-        with self._lock:
-            total = len(self._cache)
-            now = datetime.now()
-            valid = sum(
-                1 for _, timestamp in self._cache.values()
-                if now - timestamp < timedelta(seconds=self._duration)
-            )
-            return {
-                "total_entries": total,
-                "valid_entries": valid,
-                "expired_entries": total - valid,
-                "cache_duration_seconds": self._duration
-            }
-
-
 class UpdateChecker:
     def __init__(self):
-        self._cache = UpdateCache(duration_seconds=120)
-        self._cancellation = CancellationToken()
+        data_dir = os.getenv('DATA_DIR', '/app/data')
+        self._store = open_update_store(
+            os.getenv('UPDATE_CACHE_PATH', os.path.join(data_dir, 'update-cache.db')),
+            ttl_seconds=int(os.getenv('UPDATE_CACHE_TTL', '120')),
+            max_entries=int(os.getenv('UPDATE_CACHE_MAX_ENTRIES', '5000')),
+            retention_seconds=int(os.getenv('UPDATE_CACHE_RETENTION', str(7 * 24 * 3600)))
+        )
+        self._pruned_at = 0.0
         self._pull_timeout = 300
-        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._check_concurrency = int(os.getenv('UPDATE_CHECK_CONCURRENCY', '8'))
+        self._host_concurrency = int(os.getenv('UPDATE_CHECK_HOST_CONCURRENCY', '4'))
+        self._host_semaphores = {}
+        self._host_semaphores_lock = Lock()
+        self._in_flight = {}
+        self._in_flight_lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self._check_concurrency)
+        self._pull_usage = ExecutorGauge('image_pull', self._check_concurrency)
+        self._check_usage = ExecutorGauge('update_check', self._check_concurrency)
         self._floating_tag_mode = os.getenv('UPDATE_FLOATING_TAGS', 'disabled').lower()
+        self._check_mode = os.getenv('UPDATE_CHECK_MODE', 'digest').lower()
+        self._registry = RegistryClient(
+            timeout=float(os.getenv('REGISTRY_TIMEOUT', '10')),
+            insecure_registries=tuple(
+                r.strip() for r in os.getenv('UPDATE_INSECURE_REGISTRIES', '').split(',') if r.strip()
+            )
+        )
+        self._platforms = {}
+        self._platforms_lock = Lock()
     
     def _resolve_floating_tag(self, current_tag: str) -> str:
         if self._floating_tag_mode == 'disabled' or current_tag == 'latest':
@@ -107,42 +88,165 @@ class UpdateChecker:
 
         return current_tag
         
-    @property
-    def is_cancelled(self):
-        return self._cancellation.is_cancelled()
-    
     @property
     def cache_duration(self):
-        return self._cache._duration
+        return self._store.ttl
         
-    def start_check(self):
-        self._cancellation.reset()
-        logger.debug("Update check started")
+    def get_image_ref(self, image_name):
+        """The reference actually checked for ``image_name``, after floating-tag resolution."""
+        base_name, current_tag = self._parse_image_name(image_name)
+        return f"{base_name}:{self._resolve_floating_tag(current_tag)}"
 
-    def cancel_check(self):
-        self._cancellation.cancel()
-        logger.info("Update check cancellation requested")
+    def get_cached_result(self, server_name, image_name, image_id, records=None):
+        """Return ``(update_available, is_valid)`` from the last stored check, or ``(None, False)``.
 
-    def get_cache_key(self, server_name, container_name, image_name):
-        return f"{server_name}:{container_name}:{image_name}"
-    
-    def get_cached_result(self, cache_key):
-        return self._cache.get(cache_key)
-    
-    def set_cache_result(self, cache_key, result):
-        self._cache.set(cache_key, result)
+        ``records`` from ``preload_cached_results`` saves the query.
+        """
+        image_ref = self.get_image_ref(image_name)
+        if records is not None:
+            record, is_valid = records.get(image_ref, (None, False))
+        else:
+            record, is_valid = self._store.get(server_name, image_ref)
+        metrics.inc('dockpeek_update_cache_requests_total',
+                    result='miss' if record is None else 'hit' if is_valid else 'stale')
+        if record is None or not image_id:
+            return None, False
+        return record.image_id is not None and record.image_id != image_id, is_valid
+
+    def preload_cached_results(self, server_name, image_names):
+        """Stored records for all of a host's images at once, for ``get_cached_result``."""
+        return self._store.get_many(server_name, {self.get_image_ref(name) for name in image_names if name})
 
     def clear_cache(self):
-        self._cache.clear()
+        self._store.clear()
         logger.info("Update checker cache cleared")
     
+    def prune_cache(self, interval: float = 3600):
+        """Drop results past their retention, at most once per ``interval`` seconds."""
+        if time.time() - self._pruned_at < interval:
+            return
+        self._pruned_at = time.time()
+        try:
+            removed = self._store.prune_expired()
+            if removed:
+                logger.info(f"Pruned {removed} old update-check results")
+        except Exception as e:
+            logger.warning(f"Could not prune update-check results: {e}")
+
     def get_cache_stats(self):
-        return self._cache.get_stats()
+        return self._store.get_stats()
 
-    def check_local_image_updates(self, client, container, server_name):
-        if self._cancellation.is_cancelled():
-            return False
-            
+    @property
+    def cache_epoch(self):
+        return self._store.epoch
+
+    @property
+    def cache_sequence(self):
+        return self._store.sequence
+
+    def get_cache_state_token(self):
+        return self._store.state_token()
+
+    def get_changed_results(self, sequence, containers_by_server):
+        """``(server, container, update_available)`` for containers whose image result changed."""
+        changed_refs = {}
+        for server_name, image_ref in self._store.changes_since(sequence):
+            changed_refs.setdefault(server_name, set()).add(image_ref)
+
+        results = []
+        for server_name, containers in containers_by_server.items():
+            refs = changed_refs.get(server_name)
+            if not refs:
+                continue
+            for container in containers:
+                image_name = container.attrs.get('Config', {}).get('Image', '')
+                if image_name and self.get_image_ref(image_name) in refs:
+                    update_available, _ = self.get_cached_result(server_name, image_name, container.attrs.get('Image'))
+                    results.append((server_name, container.name, bool(update_available)))
+        return results
+
+    def get_changed_containers(self, sequence, containers_by_server):
+        return [
+            (server_name, container_name)
+            for server_name, container_name, _ in self.get_changed_results(sequence, containers_by_server)
+        ]
+
+    def _host_semaphore(self, server_name):
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores.get(server_name)
+            if semaphore is None:
+                semaphore = BoundedSemaphore(self._host_concurrency)
+                self._host_semaphores[server_name] = semaphore
+            return semaphore
+
+    def check_containers(self, targets, on_result=None, cancellation=None, concurrency=None):
+        """Check many containers, returning results keyed by ``"server:container"``.
+
+        ``targets`` is a list of ``(server_name, client, containers)``. Each distinct
+        image reference per server is checked once, concurrently within the global
+        and per-host limits, and the result is fanned out to every container using it.
+        Containers left unchecked after cancellation are missing from the result.
+        """
+        cancellation = cancellation or CancellationToken()
+        self.prune_cache()
+        results = {}
+        groups = {}
+        for server_name, client, containers in targets:
+            for container in containers:
+                image_name = container.attrs.get('Config', {}).get('Image', '')
+                if not image_name or not container.attrs.get('Image'):
+                    results[f"{server_name}:{container.name}"] = False
+                    continue
+                group_key = (server_name, self.get_image_ref(image_name))
+                groups.setdefault(group_key, (client, []))[1].append(container)
+
+        if on_result:
+            for key, value in results.items():
+                on_result(key, value)
+
+        def check_group(server_name, client, containers):
+            if cancellation.is_cancelled():
+                return {}
+            first = containers[0]
+            first_result = self.check_image_updates(client, first, server_name, cancellation)
+            image_name = first.attrs.get('Config', {}).get('Image', '')
+            stored, _ = self.get_cached_result(server_name, image_name, first.attrs.get('Image'))
+            if stored is None and cancellation.is_cancelled():
+                # Interrupted before a result was stored; report it as unchecked rather than up to date.
+                return {}
+
+            group_results = {f"{server_name}:{first.name}": first_result}
+            for container in containers[1:]:
+                image_name = container.attrs.get('Config', {}).get('Image', '')
+                cached, _ = self.get_cached_result(server_name, image_name, container.attrs.get('Image'))
+                group_results[f"{server_name}:{container.name}"] = bool(cached)
+            return group_results
+
+        with ThreadPoolExecutor(max_workers=concurrency or self._check_concurrency) as pool:
+            futures = [
+                pool.submit(self._check_usage.wrap(check_group), server_name, client, containers)
+                for (server_name, _), (client, containers) in groups.items()
+            ]
+            for future in as_completed(futures):
+                try:
+                    group_results = future.result()
+                except Exception as e:
+                    logger.error(f"Update check failed: {e}")
+                    continue
+                results.update(group_results)
+                if on_result:
+                    for key, value in group_results.items():
+                        on_result(key, value)
+
+        logger.debug(f"Checked {len(groups)} image references for {len(results)} containers")
+        return results
+
+    def check_local_image_updates(self, client, container, server_name, image_lookup=None):
+        """Compare the container's image with the local image its tag now points to.
+
+        ``image_lookup`` maps a reference to a local image id (see
+        ``HostInventory.image_id_for``); without it the daemon is asked directly.
+        """
         try:
             container_image_id = container.attrs.get('Image', '')
             if not container_image_id: 
@@ -154,6 +258,10 @@ class UpdateChecker:
                 
             base_name, current_tag = self._parse_image_name(image_name)
             resolved_tag = self._resolve_floating_tag(current_tag)
+
+            if image_lookup is not None:
+                local_image_id = image_lookup(f"{base_name}:{resolved_tag}")
+                return local_image_id is not None and container_image_id != local_image_id
                 
             try:
                 local_image = client.images.get(f"{base_name}:{resolved_tag}")
@@ -164,8 +272,9 @@ class UpdateChecker:
             logger.error(f"Error checking local image updates for container '{container.name}': {e}")
             return False
     
-    def check_image_updates(self, client, container, server_name):
-        if self._cancellation.is_cancelled():
+    def check_image_updates(self, client, container, server_name, cancellation=None):
+        cancellation = cancellation or CancellationToken()
+        if cancellation.is_cancelled():
             logger.debug(f"Update check cancelled before starting for {container.name}")
             return False
             
@@ -178,8 +287,7 @@ class UpdateChecker:
             if not image_name: 
                 return False
                 
-            cache_key = self.get_cache_key(server_name, container.name, image_name)
-            cached_result, is_valid = self.get_cached_result(cache_key)
+            cached_result, is_valid = self.get_cached_result(server_name, image_name, container_image_id)
             if is_valid:
                 logger.info(f"Using cached update result for {server_name}:{container.name}")
                 return cached_result
@@ -190,16 +298,16 @@ class UpdateChecker:
             if resolved_tag != current_tag:
                 logger.info(f"[{server_name}] Checking floating tag: {current_tag} → {resolved_tag}")
             
-            if self._cancellation.is_cancelled():
+            if cancellation.is_cancelled():
                 logger.info(f"Update check cancelled before pulling {base_name}:{current_tag} on {server_name}")
                 return False
             
-            result = self._pull_and_compare(client, container_image_id, base_name, resolved_tag, server_name)
-            self.set_cache_result(cache_key, result)
-            return result
+            return self._check_reference(
+                client, container_image_id, image_name, base_name, resolved_tag, server_name, cancellation
+            )
                 
         except Exception as e:
-            if not self._cancellation.is_cancelled():
+            if not cancellation.is_cancelled():
                 logger.error(f"Error checking image updates for '{container.name}' on {server_name}: {e}")
             return False
 
@@ -210,12 +318,12 @@ class UpdateChecker:
             base_name, current_tag = image_name, 'latest'
         return base_name, current_tag
     
-    def _pull_and_compare(self, client, container_image_id, base_name, current_tag, server_name):
+    def _pull_and_compare(self, client, container_image_id, base_name, current_tag, server_name, cancellation):
         try:
             logger.debug(f"Pulling {base_name}:{current_tag} on {server_name}")
             start_time = time.time()
             
-            future = self._executor.submit(self._pull_image, client, base_name, current_tag)
+            future = self._executor.submit(self._pull_usage.wrap(self._pull_image), client, base_name, current_tag)
             
             try:
                 future.result(timeout=self._pull_timeout)
@@ -223,7 +331,7 @@ class UpdateChecker:
                 logger.warning(f"Pull timeout ({self._pull_timeout}s) for {base_name}:{current_tag} on {server_name}")
                 return False
             
-            if self._cancellation.is_cancelled():
+            if cancellation.is_cancelled():
                 logger.info(f"Update check cancelled after pulling {base_name}:{current_tag} on {server_name}")
                 return False
             
@@ -231,25 +339,16 @@ class UpdateChecker:
             logger.debug(f"Pull completed in {pull_time:.2f}s for {base_name}:{current_tag}")
             
             updated_image = client.images.get(f"{base_name}:{current_tag}")
+            self._store.put(
+                server_name, f"{base_name}:{current_tag}", updated_image.id,
+                self._get_repo_digest(updated_image, base_name)
+            )
             result = container_image_id != updated_image.id
-            
-            if result:
-                logger.info(
-                    f"\033[96m[{server_name}]\033[0m "
-                    f"\033[93mUpdate available\033[0m  "
-                    f"\033[0m{base_name}:\033[96m{current_tag}\033[0m "
-                )
-            else:
-                logger.info(
-                    f"\033[96m[{server_name}]\033[0m "
-                    f"\033[92mImage up to date\033[0m  "
-                    f"{base_name}:{current_tag}"
-                )
-            
+            self._log_result(result, server_name, base_name, current_tag)
             return result
             
         except Exception as pull_error:
-                if self._cancellation.is_cancelled():
+                if cancellation.is_cancelled():
                     logger.info(
                         f"\033[96m[{server_name}]\033[0m "
                         f"\033[90mUpdate check cancelled during pull error handling for\033[0m "
@@ -263,11 +362,138 @@ class UpdateChecker:
                     f"{base_name}:{current_tag}"
                     f"\033[90m– built locally or private repository\033[0m"
                 )
+                # Remember the failure so the next check does not pull again within the TTL.
+                self._store.put(server_name, f"{base_name}:{current_tag}", None)
                 return False
 
     
+    def _check_reference(self, client, container_image_id, image_name, base_name, tag, server_name, cancellation):
+        # Concurrent checks of the same reference wait for the one already running.
+        flight_key = (server_name, f"{base_name}:{tag}")
+        while True:
+            with self._in_flight_lock:
+                done = self._in_flight.get(flight_key)
+                is_owner = done is None
+                if is_owner:
+                    done = self._in_flight[flight_key] = threading.Event()
+
+            if is_owner:
+                break
+
+            done.wait(self._pull_timeout)
+            cached_result, _ = self.get_cached_result(server_name, image_name, container_image_id)
+            if cached_result is not None or cancellation.is_cancelled():
+                return bool(cached_result)
+            # The running check was cancelled or failed without a result; take over.
+
+        try:
+            with self._host_semaphore(server_name):
+                if cancellation.is_cancelled():
+                    return False
+                if self._check_mode == 'pull':
+                    return self._pull_and_compare(
+                        client, container_image_id, base_name, tag, server_name, cancellation
+                    )
+                return self._digest_and_compare(
+                    client, container_image_id, base_name, tag, server_name, cancellation
+                )
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(flight_key, None)
+            done.set()
+
+    def _digest_and_compare(self, client, container_image_id, base_name, current_tag, server_name, cancellation):
+        image_ref = f"{base_name}:{current_tag}"
+        try:
+            manifest = self._get_remote_manifest(client, base_name, current_tag, server_name)
+            current_image_id = self._find_local_image_id(client, base_name, manifest.digest)
+
+            if current_image_id is None and manifest.media_type in MANIFEST_LIST_TYPES:
+                # The local image may be recorded under its platform manifest rather than the index.
+                platform_digest = self._registry.platform_digest(
+                    ImageReference.parse(base_name, current_tag), manifest.digest,
+                    self._get_platform(client, server_name)
+                )
+                if platform_digest:
+                    current_image_id = self._find_local_image_id(client, base_name, platform_digest)
+        except Exception as e:
+            if cancellation.is_cancelled():
+                return False
+            logger.warning(
+                f"\033[96m[{server_name}]\033[0m "
+                f"\033[91mCannot check\033[0m "
+                f"{image_ref}"
+                f"\033[90m– {e}\033[0m"
+            )
+            self._store.put(server_name, image_ref, None)
+            return False
+
+        # Without a local copy of the remote image, the remote digest stands in for its id:
+        # it never equals a local image id, so every container of this reference is outdated.
+        upstream_id = current_image_id or manifest.digest
+        self._store.put(server_name, image_ref, upstream_id, manifest.digest)
+        result = container_image_id != upstream_id
+        self._log_result(result, server_name, base_name, current_tag)
+        return result
+
+    def _get_remote_manifest(self, client, base_name, tag, server_name):
+        try:
+            return self._registry.head_manifest(ImageReference.parse(base_name, tag))
+        except RegistryError as e:
+            # The daemon may hold credentials for registries we cannot reach anonymously.
+            logger.debug(f"[{server_name}] Registry lookup failed for {base_name}:{tag}, asking the daemon: {e}")
+            return RemoteManifest(client.images.get_registry_data(f"{base_name}:{tag}").id, '')
+
+    @staticmethod
+    def _find_local_image_id(client, base_name, digest):
+        try:
+            return client.images.get(f"{base_name}@{digest}").id
+        except docker.errors.ImageNotFound:
+            return None
+
+    def _get_platform(self, client, server_name):
+        with self._platforms_lock:
+            platform = self._platforms.get(server_name)
+        if platform is None:
+            version = client.version()
+            try:
+                machine = client.info().get('Architecture', '')
+            except Exception as e:
+                logger.debug(f"[{server_name}] Could not read host architecture: {e}")
+                machine = ''
+            platform = Platform(version.get('Os', 'linux'), version.get('Arch', 'amd64'),
+                                MACHINE_VARIANTS.get(machine.lower()))
+            with self._platforms_lock:
+                self._platforms[server_name] = platform
+        return platform
+
+    @staticmethod
+    def _log_result(result, server_name, base_name, current_tag):
+        if result:
+            logger.info(
+                f"\033[96m[{server_name}]\033[0m "
+                f"\033[93mUpdate available\033[0m  "
+                f"\033[0m{base_name}:\033[96m{current_tag}\033[0m "
+            )
+        else:
+            logger.info(
+                f"\033[96m[{server_name}]\033[0m "
+                f"\033[92mImage up to date\033[0m  "
+                f"{base_name}:{current_tag}"
+            )
+
+    @staticmethod
+    def _get_repo_digest(image, base_name):
+        repo_digests = image.attrs.get('RepoDigests') or []
+        for repo_digest in repo_digests:
+            repo, _, digest = repo_digest.partition('@')
+            if repo == base_name or repo.endswith(f"/{base_name}"):
+                return digest
+        return repo_digests[0].partition('@')[2] if repo_digests else None
+
     def _pull_image(self, client, base_name, tag):
-        client.images.pull(base_name, tag=tag)
+        with metrics.time('dockpeek_image_pull_duration_seconds', image=f"{base_name}:{tag}", source='check'):
+            client.images.pull(base_name, tag=tag)
 
 
 update_checker = UpdateChecker()
\ No newline at end of file
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from .docker_utils import discover_docker_clients
+from .container_listing import list_containers
+from .shared_snapshot import is_snapshot_reader
+from .update import update_checker
+from .update_store import SharedConnection
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'cancelled', 'failed')
+
+
+class JobStore:
+    """Update-check jobs and their progress events, shared by every worker process."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            server_filter TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            updates_found INTEGER NOT NULL DEFAULT 0,
+            owner_pid INTEGER NOT NULL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            finished_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS job_events (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = SharedConnection(path)
+        self._db.run(lambda conn: conn.executescript(self.SCHEMA))
+
+    def create(self, job_id: str, server_filter: str, status: str = 'running'):
+        self._db.run(lambda conn: conn.execute(
+            "INSERT INTO jobs (id, status, server_filter, owner_pid, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, status, server_filter, os.getpid(), time.time())
+        ))
+
+    def queued_jobs(self) -> List[str]:
+        rows = self._db.run(lambda conn: conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running in this process; False if another process got it first."""
+        return self._db.run(lambda conn: conn.execute(
+            "UPDATE jobs SET status = 'running', owner_pid = ? WHERE id = ? AND status = 'queued'",
+            (os.getpid(), job_id)
+        ).rowcount) > 0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._db.run(lambda conn: conn.execute(
+            "SELECT id, status, server_filter, total, processed, updates_found, owner_pid, "
+            "cancel_requested, created_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone())
+        if row is None:
+            return None
+        keys = ('id', 'status', 'server_filter', 'total', 'processed', 'updates_found', 'owner_pid',
+                'cancel_requested', 'created_at', 'finished_at')
+        return dict(zip(keys, row))
+
+    def add_event(self, job_id: str, event: Dict, **counters) -> int:
+        def write(conn):
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.execute("INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                         (job_id, seq, json.dumps(dict(event, seq=seq))))
+            if counters:
+                assignments = ", ".join(f"{column} = ?" for column in counters)
+                conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*counters.values(), job_id))
+            return seq
+        return self._db.transaction(write)
+
+    def events_since(self, job_id: str, seq: int) -> List[Dict]:
+        rows = self._db.run(lambda conn: conn.execute(
+            "SELECT event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq)
+        ).fetchall())
+        return [json.loads(row[0]) for row in rows]
+
+    def request_cancel(self, job_id: str) -> bool:
+        return self._db.run(lambda conn: conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,)
+        ).rowcount) > 0
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        row = self._db.run(
+            lambda conn: conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        )
+        return bool(row and row[0])
+
+    def prune(self, max_age: float):
+        cutoff = time.time() - max_age
+
+        def write(conn):
+            conn.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE created_at < ?)",
+                         (cutoff,))
+            conn.execute("DELETE FROM jobs WHERE created_at < ?", (cutoff,))
+        self._db.transaction(write)
+
+
+class JobCancellationToken:
+    """Per-job token; cancellation may be requested from any worker, so it is read from the store."""
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, store: JobStore, job_id: str):
+        self._store = store
+        self._job_id = job_id
+        self._cancelled = False
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._store.request_cancel(self._job_id)
+        with self._lock:
+            self._cancelled = True
+
+    def is_cancelled(self):
+        with self._lock:
+            if self._cancelled or time.time() - self._checked_at < self.POLL_INTERVAL:
+                return self._cancelled
+            self._checked_at = time.time()
+        cancelled = self._store.is_cancel_requested(self._job_id)
+        with self._lock:
+            self._cancelled = self._cancelled or cancelled
+            return self._cancelled
+
+
+class UpdateCheckJobs:
+    """Runs update checks in the background and records their progress as events."""
+
+    JOB_KIND = 'update check'
+    MAX_JOB_AGE = 3600
+    STREAM_POLL_INTERVAL = 0.25
+    HEARTBEAT_INTERVAL = 15
+
+    def __init__(self, store: JobStore, concurrency: int):
+        self.store = store
+        self.concurrency = concurrency
+
+    def start(self, server_filter: str = 'all') -> str:
+        self.store.prune(self.MAX_JOB_AGE)
+        job_id = uuid.uuid4().hex
+        self._submit(job_id, server_filter, {'server_filter': server_filter})
+        return job_id
+
+    def _submit(self, job_id: str, server_filter: str, request: Dict):
+        if is_snapshot_reader():
+            # Web workers are recycled, so the collector runs the job (see run_queued).
+            self.store.create(job_id, server_filter, status='queued')
+            self.store.add_event(job_id, dict(request, type='queued', kind=self.JOB_KIND))
+            logger.info(f"{self.JOB_KIND.capitalize()} job {job_id} queued for servers: {server_filter}")
+        else:
+            self.store.create(job_id, server_filter)
+            self._launch(job_id, request)
+
+    def run_queued(self):
+        """Claim the jobs of this kind queued by web workers and start them in this process."""
+        for job_id in self.store.queued_jobs():
+            request = next((e for e in self.store.events_since(job_id, 0) if e['type'] == 'queued'), None)
+            # Check and bulk update jobs share the store; the request may not be written yet.
+            if request is None or request.get('kind') != self.JOB_KIND:
+                continue
+            if self.store.claim(job_id):
+                self._launch(job_id, request)
+
+    def _launch(self, job_id: str, request: Dict):
+        server_filter = request['server_filter']
+        threading.Thread(target=self._run, args=(job_id, server_filter), name=f"update-job-{job_id[:8]}",
+                         daemon=True).start()
+        logger.info(f"Update check job {job_id} started for servers: {server_filter}")
+
+    def cancel(self, job_id: str) -> bool:
+        return self.store.request_cancel(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        return self._reap_if_orphaned(job) if job else None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.status(job_id)
+        if job is None:
+            return None
+        job['updates'] = {
+            event['key']: event['update_available']
+            for event in self.store.events_since(job_id, 0) if event['type'] == 'result'
+        }
+        return job
+
+    def _reap_if_orphaned(self, job: Dict) -> Dict:
+        # A job dies with the process that runs it, e.g. a worker on a max_requests recycle.
+        if job['status'] != 'running' or job['owner_pid'] == os.getpid():
+            return job
+        try:
+            os.kill(job['owner_pid'], 0)
+            return job
+        except ProcessLookupError:
+            self._finish(job['id'], 'failed', job['processed'], job['total'], job['updates_found'],
+                         error='The process running this job exited')
+        except PermissionError:
+            return job
+        return self.store.get(job['id'])
+
+    def _run(self, job_id: str, server_filter: str):
+        token = JobCancellationToken(self.store, job_id)
+        processed = total = updates_found = 0
+        try:
+            servers = [s for s in discover_docker_clients() if s['status'] == 'active']
+            if server_filter != 'all':
+                servers = [s for s in servers if s['name'] == server_filter]
+
+            targets = []
+            for server in servers:
+                try:
+                    targets.append((server['name'], server['client'], list_containers(server['client'])))
+                except Exception as e:
+                    logger.error(f"[{server['name']}] Update job {job_id} cannot list containers: {e}")
+                    self.store.add_event(job_id, {'type': 'error', 'server': server['name'], 'message': str(e)})
+
+            total = sum(len(containers) for _, _, containers in targets)
+            self.store.add_event(job_id, {'type': 'started', 'total': total}, total=total)
+
+            progress_lock = threading.Lock()
+
+            def on_result(key, update_available):
+                nonlocal processed, updates_found
+                server_name, container_name = key.split(':', 1)
+                with progress_lock:
+                    processed += 1
+                    updates_found += int(bool(update_available))
+                    self.store.add_event(job_id, {
+                        'type': 'result',
+                        'key': key,
+                        'server': server_name,
+                        'container': container_name,
+                        'update_available': update_available,
+                        'processed': processed,
+                        'total': total
+                    }, processed=processed, updates_found=updates_found)
+
+            update_checker.check_containers(targets, on_result=on_result, cancellation=token,
+                                            concurrency=self.concurrency)
+            status = 'cancelled' if token.is_cancelled() else 'completed'
+            self._finish(job_id, status, processed, total, updates_found)
+        except Exception as e:
+            logger.error(f"Update check job {job_id} failed: {e}")
+            self._finish(job_id, 'failed', processed, total, updates_found, error=str(e))
+
+    def _finish(self, job_id: str, status: str, processed: int, total: int, updates_found: int, error: str = None):
+        event = {'type': 'finished', 'status': status, 'processed': processed, 'total': total,
+                 'updates_found': updates_found}
+        if error:
+            event['error'] = error
+        self.store.add_event(job_id, event, status=status, finished_at=time.time())
+        logger.info(f"Update check job {job_id} {status}: {processed}/{total} checked, {updates_found} updates")
+
+    def stream(self, job_id: str, after: int = 0) -> Iterator[Dict]:
+        """Yield the job's events after ``after`` until it finishes, with periodic heartbeats."""
+        last_sent = time.time()
+        while True:
+            events = self.store.events_since(job_id, after)
+            for event in events:
+                after = event['seq']
+                yield event
+                if event['type'] == 'finished':
+                    return
+
+            now = time.time()
+            if events:
+                last_sent = now
+            elif now - last_sent >= self.HEARTBEAT_INTERVAL:
+                last_sent = now
+                job = self.status(job_id)
+                if job is None:
+                    return
+                if job['status'] not in TERMINAL_STATUSES:
+                    yield {'type': 'heartbeat', 'processed': job['processed'], 'total': job['total']}
+            time.sleep(self.STREAM_POLL_INTERVAL)
+
+
+def _create_update_jobs() -> UpdateCheckJobs:
+    data_dir = os.getenv('DATA_DIR', '/app/data')
+    path = os.getenv('UPDATE_JOBS_PATH', os.path.join(data_dir, 'update-jobs.db'))
+    concurrency = int(os.getenv('UPDATE_CHECK_CONCURRENCY', '8'))
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return UpdateCheckJobs(JobStore(path), concurrency)
+    except Exception as e:
+        fallback = os.path.join(tempfile.gettempdir(), 'dockpeek-update-jobs.db')
+        logger.warning(f"Cannot open update job store at {path} ({e}), using {fallback}")
+        return UpdateCheckJobs(JobStore(fallback), concurrency)
+
+
+update_jobs = _create_update_jobs()
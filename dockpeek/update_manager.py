@@ -1,7 +1,13 @@
 from .update import update_checker
+from .container_listing import list_containers
+from .dependency_graph import DependencyGraph
+from .inventory import get_dependency_graph
+from .metrics import metrics
+import os
 import logging
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 import docker
@@ -46,6 +52,7 @@ class ContainerConfigExtractor:
             'command': self.config.get('Cmd'),
             'entrypoint': self.config.get('Entrypoint'),
             'volumes': self._clean_list(self.host_config.get('Binds') or []),
+            'volumes_from': self.host_config.get('VolumesFrom'),
             'ports': self._clean_dict(self.host_config.get('PortBindings') or {}),
             'network_mode': network_mode,
             'restart_policy': self.host_config.get('RestartPolicy', {'Name': 'no'}),
@@ -66,13 +73,23 @@ class ContainerConfigExtractor:
         return {k: v for k, v in items.items() if v is not None}
 
 
+@dataclass
+class PreparedUpdate:
+    container_name: str
+    image_name: str
+
+
 class ContainerUpdater:
-    def __init__(self, client: docker.DockerClient, server_name: str, timeouts: Dict[str, int] = None):
+    def __init__(self, client: docker.DockerClient, server_name: str, timeouts: Dict[str, int] = None,
+                 server: Optional[Dict[str, Any]] = None):
         self.client = client
         self.server_name = server_name
+        self.server = server
         self.timeouts = timeouts or {
             'api': 300,
             'stop': 60,
+            'ready': float(os.getenv('UPDATE_READY_TIMEOUT', '60')),
+            'stable': float(os.getenv('UPDATE_READY_STABLE', '0')),
         }
         self.original_timeout = None
         self.update_checker = update_checker
@@ -92,57 +109,96 @@ class ContainerUpdater:
             except AttributeError:
                 pass
     
-    def _get_dependent_containers(self, container):
-        dependent = []
+    def _get_dependent_containers(self, container) -> List[List]:
+        """Containers tied to ``container``'s id, in levels that can each be recreated in parallel."""
+        levels = []
         try:
-            all_containers = self.client.containers.list(all=True)
-            for other in all_containers:
-                if other.id == container.id:
-                    continue
-                network_mode = other.attrs.get('HostConfig', {}).get('NetworkMode', '')
-                if network_mode in [f'container:{container.name}', f'container:{container.id}']:
-                    dependent.append(other)
+            if self.server is not None:
+                graph = get_dependency_graph(self.server)
+            else:
+                graph = DependencyGraph([c.attrs for c in list_containers(self.client)])
+            graph_id = container.id if graph.name_of(container.id) is not None else graph.find(container.name)
+            if graph_id is None:
+                return []
+            for level in graph.recreate_order(graph_id):
+                dependents = []
+                for dependent_id in level:
+                    try:
+                        dependents.append(self.client.containers.get(dependent_id))
+                    except docker.errors.NotFound:
+                        continue
+                if dependents:
+                    levels.append(dependents)
         except Exception as e:
             logger.warning(f"Could not check for dependent containers: {e}")
-        return dependent
+        return levels
     
     def update(self, container_name: str, force: bool = False) -> Dict[str, Any]:
         logger.info(f"[{self.server_name}] Starting update for: {container_name} (force={force})")
+        return self.apply(self.prepare(container_name), force)
 
+    def prepare(self, container_name: str, pulled_images: Optional[set] = None) -> 'PreparedUpdate':
+        """Resolve the container's image and pull it; nothing is stopped yet.
+
+        Images already listed in ``pulled_images`` are not pulled again.
+        """
+        container = self._get_container(container_name)
+        image_name, _ = self._get_image_info(container)
+        if pulled_images is None or image_name not in pulled_images:
+            self._pull_image(image_name)
+            if pulled_images is not None:
+                pulled_images.add(image_name)
+
+        return PreparedUpdate(container_name, image_name)
+
+    def apply(self, prepared: 'PreparedUpdate', force: bool = False) -> Dict[str, Any]:
+        """Recreate the container from the pulled image, restoring it if anything fails.
+
+        The container and its dependents are looked up again here, since an
+        earlier update may have recreated them after the pull.
+        """
+        container_name = prepared.container_name
+        image_name = prepared.image_name
         container = self._get_container(container_name)
 
+        if not force and not self._has_updates(image_name, container.attrs.get('Image', '')):
+            logger.info(f"[{self.server_name}] No updates for {image_name}")
+            return {"status": "success", "message": f"Container {container_name} is already up to date.",
+                    "updated": False, "recreated": []}
+
         dependent_containers = self._get_dependent_containers(container)
         if dependent_containers:
-            logger.info(f"[{self.server_name}] Found {len(dependent_containers)} dependent containers: {[c.name for c in dependent_containers]}")
-
-        image_name, container_image_id = self._get_image_info(container)
-        self._pull_image(image_name)
-
-        if not force and not self._has_updates(image_name, container_image_id):
-            logger.info(f"[{self.server_name}] No updates for {image_name}")
-            return {"status": "success", "message": f"Container {container_name} is already up to date."}
+            names = [[c.name for c in level] for level in dependent_containers]
+            logger.info(f"[{self.server_name}] Found {sum(map(len, names))} dependent containers: {names}")
 
         config = ContainerConfigExtractor(container).extract()
         original_networks = container.attrs.get('NetworkSettings', {}).get('Networks', {})
         backup_name = self._generate_backup_name(container_name)
 
         result = self._perform_update(container, backup_name, image_name, config, original_networks)
+        result["recreated"] = []
 
         if result["status"] == "success" and dependent_containers:
             failed_recreates = []
             new_container = self._get_container(container_name)
-            new_container_id = new_container.id
-
-            for dep_container in dependent_containers:
-                logger.info(f"[{self.server_name}] Recreating dependent: {dep_container.name}")
-                if not self._recreate_container(dep_container, new_container_id):
-                    failed_recreates.append(dep_container.name)
+            replaced = self._replacement_refs(container, new_container.id)
+
+            for level in dependent_containers:
+                with ThreadPoolExecutor(max_workers=min(4, len(level))) as executor:
+                    new_ids = list(executor.map(lambda dep: self._recreate_container(dep, replaced), level))
+                for dep_container, new_id in zip(level, new_ids):
+                    if new_id:
+                        replaced.update(self._replacement_refs(dep_container, new_id))
+                        result["recreated"].append(dep_container.name)
+                    else:
+                        failed_recreates.append(dep_container.name)
 
             if failed_recreates:
                 result["message"] += f" Warning: Failed to recreate dependent containers: {', '.join(failed_recreates)}"
             else:
-                result["message"] += f" Successfully recreated {len(dependent_containers)} dependent container(s)."
+                result["message"] += f" Successfully recreated {sum(map(len, dependent_containers))} dependent container(s)."
 
+        result["updated"] = True
         return result
     
     def _get_container(self, container_name: str):
@@ -177,7 +233,8 @@ class ContainerUpdater:
     def _pull_image(self, image_name: str):
         logger.info(f"[{self.server_name}] Pulling latest image: {image_name}")
         try:
-            new_image = self.client.images.pull(image_name)
+            with metrics.time('dockpeek_image_pull_duration_seconds', image=image_name, source='update'):
+                new_image = self.client.images.pull(image_name)
             logger.info(f"[{self.server_name}] Successfully pulled: {new_image.short_id}")
         except Exception as e:
             raise ContainerUpdateError(f"Failed to pull image '{image_name}': {e}")
@@ -204,17 +261,30 @@ class ContainerUpdater:
         
         return backup_name
     
-    def _recreate_container(self, container, new_network_container_id=None) -> bool:
+    @staticmethod
+    def _replacement_refs(container, new_id: str) -> Dict[str, str]:
+        return {container.id: new_id, container.id[:12]: new_id, container.name: new_id}
+
+    def _recreate_container(self, container, replaced: Dict[str, str]) -> Optional[str]:
+        """Recreate a dependent, pointing references to recreated containers at their new ids."""
         logger.info(f"[{self.server_name}] Recreating dependent container: {container.name}")
         try:
             current_image = container.image.tags[0] if container.image.tags else container.attrs.get('Config', {}).get('Image', '')
             config = ContainerConfigExtractor(container).extract()
             networks = container.attrs.get('NetworkSettings', {}).get('Networks', {})
 
-            if new_network_container_id and config.get('network_mode', '').startswith('container:'):
-                old_network_mode = config['network_mode']
-                config['network_mode'] = f'container:{new_network_container_id}'
-                logger.info(f"[{self.server_name}] Updated network_mode from '{old_network_mode}' to '{config['network_mode']}'")
+            network_mode = config.get('network_mode') or ''
+            target = network_mode.split(':', 1)[1] if network_mode.startswith('container:') else None
+            if target in replaced:
+                config['network_mode'] = f'container:{replaced[target]}'
+                logger.info(f"[{self.server_name}] Updated network_mode from '{network_mode}' to '{config['network_mode']}'")
+
+            if config.get('volumes_from'):
+                remapped = []
+                for entry in config['volumes_from']:
+                    source, _, mode = entry.partition(':')
+                    remapped.append(f"{replaced.get(source, source)}{':' + mode if mode else ''}")
+                config['volumes_from'] = remapped
 
             temp_name = f"{container.name}-temp-{int(time.time())}"
 
@@ -226,17 +296,13 @@ class ContainerUpdater:
                 if networks:
                     self._connect_networks(new_container, networks)
                 new_container.start()
-
-                time.sleep(2)
-                new_container.reload()
-                if new_container.status != 'running':
-                    raise Exception(f"Container failed to start (status: {new_container.status})")
+                self._wait_until_ready(new_container)
 
                 temp_container = self.client.containers.get(temp_name)
                 temp_container.remove(force=True)
 
                 logger.info(f"[{self.server_name}] Successfully recreated: {container.name}")
-                return True
+                return new_container.id
 
             except Exception as e:
                 logger.error(f"[{self.server_name}] Recreate failed, restoring: {e}")
@@ -247,11 +313,11 @@ class ContainerUpdater:
                 temp_container = self.client.containers.get(temp_name)
                 temp_container.rename(container.name)
                 temp_container.start()
-                return False
+                return None
 
         except Exception as e:
             logger.error(f"[{self.server_name}] Failed to recreate {container.name}: {e}")
-            return False
+            return None
     
     def _perform_update(self, container, backup_name: str, image_name: str, 
                         config: Dict[str, Any], networks: Dict[str, Any]) -> Dict[str, Any]:
@@ -304,7 +370,7 @@ class ContainerUpdater:
         logger.info(f"[{self.server_name}] Creating new container: {config['name']}")
         
         clean_config = {k: v for k, v in config.items() if v is not None}
-        for key in ['environment', 'volumes', 'cap_add', 'cap_drop', 'devices', 'security_opt']:
+        for key in ['environment', 'volumes', 'volumes_from', 'cap_add', 'cap_drop', 'devices', 'security_opt']:
             if key in clean_config and not clean_config[key]:
                 del clean_config[key]
         
@@ -321,11 +387,8 @@ class ContainerUpdater:
         new_container.start()
         
         logger.info(f"[{self.server_name}] Verifying container started...")
-        time.sleep(2)
         try:
-            new_container.reload()
-            if new_container.status != 'running':
-                raise ContainerUpdateError(f"Container failed to start properly (status: {new_container.status})")
+            self._wait_until_ready(new_container)
         except Exception as e:
             if isinstance(e, ContainerUpdateError):
                 raise
@@ -335,6 +398,65 @@ class ContainerUpdater:
         logger.info(f"[{self.server_name}] Container running successfully")
         return new_container
     
+    def _wait_until_ready(self, container):
+        """Poll with backoff until the container is healthy, or without a healthcheck, is running.
+
+        With ``timeouts['stable']`` set, a container without a healthcheck must
+        also stay running with the same restart count for that many seconds, so
+        one that crashes right after starting is caught. Fails as soon as the
+        container exits, restarts or turns unhealthy, and after
+        ``timeouts['ready']`` seconds otherwise.
+        """
+        timeout = self.timeouts.get('ready', 60)
+        stable_for = self.timeouts.get('stable', 0)
+        started = time.monotonic()
+        running_since = first_start = None
+        delay = 0.05
+        while True:
+            container.reload()
+            state = container.attrs.get('State', {})
+            status = state.get('Status')
+            health = (state.get('Health') or {}).get('Status')
+            if health == 'none':
+                health = None
+
+            if status in ('exited', 'dead', 'restarting'):
+                raise ContainerUpdateError(
+                    f"Container failed to start properly (status: {status}, exit code: {state.get('ExitCode')})"
+                )
+            if health == 'unhealthy':
+                raise ContainerUpdateError("Container failed to start properly (health: unhealthy)")
+            if status == 'running':
+                # A restart between two polls shows up only in these.
+                start = (state.get('RestartCount'), state.get('StartedAt'))
+                if first_start is None:
+                    first_start = start
+                elif start != first_start:
+                    raise ContainerUpdateError(
+                        f"Container restarted while starting up (restart count: {state.get('RestartCount')})"
+                    )
+            if status == 'running' and health == 'healthy':
+                logger.info(f"[{self.server_name}] Container running and healthy "
+                            f"after {time.monotonic() - started:.1f}s")
+                return
+            if status == 'running' and health is None:
+                if running_since is None:
+                    running_since = time.monotonic()
+                if time.monotonic() - running_since >= stable_for:
+                    logger.info(f"[{self.server_name}] Container running for {stable_for:g}s "
+                                f"after {time.monotonic() - started:.1f}s")
+                    return
+
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise ContainerUpdateError(
+                    f"Container not ready after {timeout:g}s (status: {status}, health: {health or 'n/a'})"
+                )
+            if running_since is not None:
+                remaining = min(remaining, max(0.0, running_since + stable_for - time.monotonic()))
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
     def _connect_networks(self, container, networks: Dict[str, Any]):
         network_mode = container.attrs.get('HostConfig', {}).get('NetworkMode', '')
         
@@ -407,6 +529,6 @@ class ContainerUpdater:
 
 
 def update_container(client: docker.DockerClient, server_name: str, 
-                     container_name: str, force: bool = False) -> Dict[str, Any]:
-    with ContainerUpdater(client, server_name) as updater:
+                     container_name: str, force: bool = False, server: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    with ContainerUpdater(client, server_name, server=server) as updater:
         return updater.update(container_name, force)
\ No newline at end of file
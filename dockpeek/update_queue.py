@@ -0,0 +1,297 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .docker_utils import DockerClientFactory, StreamingClientPool, discover_docker_clients
+from .inventory import get_dependency_graph
+from .metrics import ExecutorGauge
+from .update_jobs import JobCancellationToken, JobStore, UpdateCheckJobs, update_jobs
+from .update_manager import ContainerUpdater, PreparedUpdate
+
+logger = logging.getLogger(__name__)
+
+UPDATE_API_TIMEOUT = 300
+
+
+class HostQueue:
+    def __init__(self, server: Dict):
+        self.server = server
+        self.pulls = deque()
+        self.pulling = set()
+        self.ready = deque()
+        self.active = 0
+        self.restarting = None
+        self.pulled_images = set()
+        # Batch items that are recreated along with each batch item, and by whom they were.
+        self.dependents: Dict[str, set] = {}
+        self.recreated_by: Dict[str, str] = {}
+
+    def next_restart(self) -> Optional[PreparedUpdate]:
+        """The first pulled item that may restart now.
+
+        An item waits for the batch items it depends on, whose updates recreate
+        it anyway, and its own batch dependents must be pulled first so they
+        are recreated from their new images.
+        """
+        unpulled = set(self.pulls) | self.pulling
+        pending = unpulled | {prepared.container_name for prepared in self.ready}
+        for prepared in self.ready:
+            name = prepared.container_name
+            if any(name in self.dependents.get(other, ()) for other in pending if other != name):
+                continue
+            if self.dependents.get(name, set()) & unpulled:
+                continue
+            self.ready.remove(prepared)
+            return prepared
+        if self.ready and not unpulled:
+            # Only a dependency cycle blocks every item; fall back to batch order.
+            return self.ready.popleft()
+        return None
+
+
+class BulkUpdateJobs(UpdateCheckJobs):
+    """Updates a list of containers in the background, recording per-item progress as job events.
+
+    Each update is split into a pull and a restart. Pulls for later items run
+    while earlier ones restart; a host restarts one container at a time and
+    runs at most ``per_host_limit`` operations, with ``global_limit`` across
+    all hosts. Hosts proceed independently, so a batch takes about as long as
+    its slowest host.
+    """
+
+    JOB_KIND = 'bulk update'
+    DISPATCH_INTERVAL = 0.5
+
+    def __init__(self, store: JobStore, global_limit: int, per_host_limit: int):
+        super().__init__(store, global_limit)
+        self.global_limit = global_limit
+        self.per_host_limit = per_host_limit
+        # The pool's per-host semaphore also bounds operations across concurrent jobs.
+        self.clients = StreamingClientPool(DockerClientFactory(long_timeout=UPDATE_API_TIMEOUT),
+                                           max_per_host=per_host_limit, name='bulk_update_host')
+        self.clients.ACQUIRE_TIMEOUT = UPDATE_API_TIMEOUT
+        self.usage = ExecutorGauge('bulk_update', global_limit)
+        self._threads: Dict[str, Tuple[threading.Thread, JobCancellationToken]] = {}
+        self._threads_lock = threading.Lock()
+
+    def start(self, items: List[Tuple[str, str]], force: bool = False) -> str:
+        self.store.prune(self.MAX_JOB_AGE)
+        job_id = uuid.uuid4().hex
+        servers = ','.join(sorted({server for server, _ in items}))
+        self._submit(job_id, servers, {'items': [list(item) for item in items], 'force': force})
+        return job_id
+
+    def _launch(self, job_id: str, request: Dict):
+        self._spawn(job_id, [tuple(item) for item in request['items']], request.get('force', False))
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Cancel what the running jobs have not started yet and wait for the operations in flight.
+
+        A restart cut off halfway would leave the container stopped under its backup name.
+        """
+        with self._threads_lock:
+            running = list(self._threads.values())
+        if not running:
+            return
+        logger.info(f"Waiting for {len(running)} bulk update jobs to finish their current operations")
+        for _, token in running:
+            token.cancel()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread, _ in running:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def _spawn(self, job_id: str, items: List[Tuple[str, str]], force: bool):
+        token = JobCancellationToken(self.store, job_id)
+        thread = threading.Thread(target=self._run, args=(job_id, items, force, token),
+                                  name=f"bulk-update-{job_id[:8]}", daemon=True)
+        with self._threads_lock:
+            self._threads[job_id] = (thread, token)
+        thread.start()
+        logger.info(f"Bulk update job {job_id} started for {len(items)} containers")
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.status(job_id)
+        if job is None:
+            return None
+        job['items'] = {
+            event['key']: {k: event[k] for k in ('state', 'message') if k in event}
+            for event in self.store.events_since(job_id, 0) if event['type'] == 'item'
+        }
+        return job
+
+    def _run(self, job_id: str, items: List[Tuple[str, str]], force: bool, token: JobCancellationToken):
+        total = len(items)
+        counts = {'processed': 0, 'updated': 0}
+        report_lock = threading.Lock()
+
+        def report(server_name: str, container_name: str, state: str, message: Optional[str] = None):
+            with report_lock:
+                counters = {}
+                if state in ('updated', 'up_to_date', 'failed', 'cancelled'):
+                    counts['processed'] += 1
+                    counts['updated'] += int(state == 'updated')
+                    counters = {'processed': counts['processed'], 'updates_found': counts['updated']}
+                event = {
+                    'type': 'item',
+                    'key': f"{server_name}:{container_name}",
+                    'server': server_name,
+                    'container': container_name,
+                    'state': state,
+                    'processed': counts['processed'],
+                    'total': total
+                }
+                if message:
+                    event['message'] = message
+                self.store.add_event(job_id, event, **counters)
+
+        try:
+            self.store.add_event(job_id, {'type': 'started', 'total': total}, total=total)
+            servers = {s['name']: s for s in discover_docker_clients() if s['status'] == 'active'}
+            hosts: Dict[str, HostQueue] = {}
+            for server_name, container_name in items:
+                server = servers.get(server_name)
+                if server is None:
+                    report(server_name, container_name, 'failed', f"Server '{server_name}' not found or inactive")
+                    continue
+                hosts.setdefault(server_name, HostQueue(server)).pulls.append(container_name)
+
+            for host in hosts.values():
+                host.dependents = self._batch_dependents(host)
+            self._schedule(hosts, force, token, report)
+            status = 'cancelled' if token.is_cancelled() else 'completed'
+            self._finish(job_id, status, counts['processed'], total, counts['updated'])
+        except Exception as e:
+            logger.error(f"Bulk update job {job_id} failed: {e}")
+            self._finish(job_id, 'failed', counts['processed'], total, counts['updated'], error=str(e))
+        finally:
+            with self._threads_lock:
+                self._threads.pop(job_id, None)
+
+    @staticmethod
+    def _batch_dependents(host: HostQueue) -> Dict[str, set]:
+        names = set(host.pulls)
+        try:
+            graph = get_dependency_graph(host.server)
+        except Exception as e:
+            logger.warning(f"[{host.server['name']}] Cannot order bulk update by dependencies: {e}")
+            return {}
+        dependents = {}
+        for name in names:
+            graph_id = graph.find(name)
+            if graph_id is None:
+                continue
+            batch = {graph.name_of(i) for level in graph.recreate_order(graph_id) for i in level} & names
+            if batch:
+                dependents[name] = batch
+        return dependents
+
+    def _schedule(self, hosts: Dict[str, HostQueue], force: bool, token: JobCancellationToken, report):
+        cond = threading.Condition()
+        active = 0
+
+        def run(host: HostQueue, operation, arg):
+            nonlocal active
+            server_name = host.server['name']
+            try:
+                with self.clients.acquire(host.server['url']) as client:
+                    with ContainerUpdater(client, server_name, server=host.server) as updater:
+                        outcome = operation(updater, host, arg)
+            except Exception as e:
+                name = arg if isinstance(arg, str) else arg.container_name
+                message = getattr(e, 'html_message', None) or str(e)
+                logger.error(f"[{server_name}] Bulk update of {name} failed: {e}")
+                report(server_name, name, 'failed', message)
+                outcome = None
+            with cond:
+                host.active -= 1
+                active -= 1
+                if operation is pull:
+                    host.pulling.discard(arg)
+                    if outcome is not None:
+                        host.ready.append(outcome)
+                else:
+                    host.restarting = None
+                cond.notify()
+
+        def pull(updater: ContainerUpdater, host: HostQueue, container_name: str):
+            report(updater.server_name, container_name, 'pulling')
+            prepared = updater.prepare(container_name, host.pulled_images)
+            report(updater.server_name, container_name, 'pulled')
+            return prepared
+
+        def restart(updater: ContainerUpdater, host: HostQueue, prepared):
+            name = prepared.container_name
+            report(updater.server_name, name, 'restarting')
+            # Restarts on a host run one at a time, so recreated_by needs no lock.
+            recreated_by = host.recreated_by.get(name)
+            result = updater.apply(prepared, force and recreated_by is None)
+            for dependent in result.get('recreated', ()):
+                host.recreated_by.setdefault(dependent, name)
+            if recreated_by is not None and not result.get('updated'):
+                report(updater.server_name, name, 'updated',
+                       f"Container {name} was recreated with its new image while updating {recreated_by}.")
+            else:
+                report(updater.server_name, name, 'updated' if result.get('updated') else 'up_to_date',
+                       result.get('message'))
+
+        def submit(executor, host: HostQueue, operation, arg):
+            nonlocal active
+            host.active += 1
+            active += 1
+            executor.submit(self.usage.wrap(run), host, operation, arg)
+
+        with ThreadPoolExecutor(max_workers=self.global_limit) as executor:
+            with cond:
+                while True:
+                    if token.is_cancelled():
+                        for host in hosts.values():
+                            for name in host.pulls:
+                                report(host.server['name'], name, 'cancelled')
+                            for prepared in host.ready:
+                                report(host.server['name'], prepared.container_name, 'cancelled')
+                            host.pulls.clear()
+                            host.ready.clear()
+
+                    # Restarts first, since their images are already pulled.
+                    for host in hosts.values():
+                        if (host.ready and not host.restarting and host.active < self.per_host_limit
+                                and active < self.global_limit):
+                            prepared = host.next_restart()
+                            if prepared is not None:
+                                host.restarting = prepared.container_name
+                                submit(executor, host, restart, prepared)
+
+                    # Pulls fill the remaining slots, one host at a time so none takes all of them.
+                    dispatched = True
+                    while dispatched and active < self.global_limit:
+                        dispatched = False
+                        for host in hosts.values():
+                            if host.pulls and host.active < self.per_host_limit and active < self.global_limit:
+                                name = host.pulls.popleft()
+                                host.pulling.add(name)
+                                submit(executor, host, pull, name)
+                                dispatched = True
+
+                    if active == 0 and not any(host.pulls or host.ready for host in hosts.values()):
+                        return
+                    cond.wait(self.DISPATCH_INTERVAL)
+
+    def _finish(self, job_id: str, status: str, processed: int, total: int, updates_found: int, error: str = None):
+        event = {'type': 'finished', 'status': status, 'processed': processed, 'total': total,
+                 'updated': updates_found}
+        if error:
+            event['error'] = error
+        self.store.add_event(job_id, event, status=status, finished_at=time.time())
+        logger.info(f"Bulk update job {job_id} {status}: {processed}/{total} processed, {updates_found} updated")
+
+
+bulk_updates = BulkUpdateJobs(
+    update_jobs.store,
+    global_limit=int(os.getenv('BULK_UPDATE_CONCURRENCY', '8')),
+    per_host_limit=int(os.getenv('BULK_UPDATE_PER_HOST', '2'))
+)
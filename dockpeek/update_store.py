@@ -0,0 +1,240 @@
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Autocommit connection tuned for several processes sharing one database file."""
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def run_blocking(fn: Callable, *args):
+    """Run ``fn`` on a native thread when gevent has patched the process, so it cannot stall the hub."""
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return fn(*args)
+    if not monkey.is_module_patched('threading'):
+        return fn(*args)
+    return get_hub().threadpool.apply(fn, args)
+
+
+class SharedConnection:
+    """One SQLite connection per process, used by one caller at a time.
+
+    Queries run through ``run_blocking``: waiting up to ``busy_timeout`` for
+    another process's write lock then holds up only the caller, not every
+    greenlet of the worker.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        with self._lock:
+            return run_blocking(self._call, fn)
+
+    def transaction(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        def write(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+        return self.run(write)
+
+    def _call(self, fn):
+        # A connection must not cross a fork.
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect_sqlite(self.path)
+            self._pid = os.getpid()
+        return fn(self._conn)
+
+
+class UpdateRecord(NamedTuple):
+    image_id: Optional[str]
+    remote_digest: Optional[str]
+    checked_at: float
+    sequence: int
+
+
+class UpdateStore:
+    """Update-check results persisted in SQLite, shared by every worker process.
+
+    Rows are keyed by server and image reference and hold what the registry
+    resolved that reference to at ``checked_at``. Whether a container is
+    outdated is derived from its own image id, so results are shared by all
+    containers of an image and stay correct after the container is recreated.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS update_checks (
+            server TEXT NOT NULL,
+            image_ref TEXT NOT NULL,
+            image_id TEXT,
+            remote_digest TEXT,
+            checked_at REAL NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (server, image_ref)
+        );
+        CREATE INDEX IF NOT EXISTS update_checks_seq ON update_checks (seq);
+        CREATE INDEX IF NOT EXISTS update_checks_checked_at ON update_checks (checked_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 120, max_entries: int = 5000,
+                 retention_seconds: int = 7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.retention = max(retention_seconds, ttl_seconds)
+        self._db = SharedConnection(path)
+        self._init_db()
+
+    def _init_db(self):
+        def init(conn):
+            conn.executescript(self.SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('sequence', '0')")
+        self._db.run(init)
+
+    @staticmethod
+    def _next_sequence(conn: sqlite3.Connection) -> int:
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'sequence'")
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'sequence'").fetchone()[0])
+
+    def _meta(self, key: str) -> str:
+        return self._db.run(
+            lambda conn: conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+        )
+
+    @property
+    def epoch(self) -> str:
+        return self._meta('epoch')
+
+    @property
+    def sequence(self) -> int:
+        return int(self._meta('sequence'))
+
+    def get(self, server: str, image_ref: str) -> Tuple[Optional[UpdateRecord], bool]:
+        """Return the stored record and whether it is still within the TTL."""
+        row = self._db.run(lambda conn: conn.execute(
+            "SELECT image_id, remote_digest, checked_at, seq FROM update_checks WHERE server = ? AND image_ref = ?",
+            (server, image_ref)
+        ).fetchone())
+        if row is None:
+            return None, False
+        record = UpdateRecord(*row)
+        return record, time.time() - record.checked_at < self.ttl
+
+    def get_many(self, server: str, image_refs) -> Dict[str, Tuple[UpdateRecord, bool]]:
+        """Stored records for several references of one server, in one query per 500 references."""
+        refs = list(image_refs)
+        now = time.time()
+
+        def read(conn):
+            rows = []
+            for i in range(0, len(refs), 500):
+                chunk = refs[i:i + 500]
+                rows += conn.execute(
+                    "SELECT image_ref, image_id, remote_digest, checked_at, seq FROM update_checks "
+                    f"WHERE server = ? AND image_ref IN ({', '.join('?' * len(chunk))})",
+                    (server, *chunk)
+                ).fetchall()
+            return rows
+
+        records = {}
+        for image_ref, *row in (self._db.run(read) if refs else []):
+            record = UpdateRecord(*row)
+            records[image_ref] = (record, now - record.checked_at < self.ttl)
+        return records
+
+    def put(self, server: str, image_ref: str, image_id: Optional[str], remote_digest: Optional[str] = None) -> int:
+        def write(conn):
+            sequence = self._next_sequence(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO update_checks (server, image_ref, image_id, remote_digest, checked_at, seq) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (server, image_ref, image_id, remote_digest, time.time(), sequence)
+            )
+            conn.execute(
+                "DELETE FROM update_checks WHERE rowid IN ("
+                "SELECT rowid FROM update_checks ORDER BY checked_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            return sequence
+        return self._db.transaction(write)
+
+    def changes_since(self, sequence: int) -> List[Tuple[str, str]]:
+        return self._db.run(lambda conn: conn.execute(
+            "SELECT server, image_ref FROM update_checks WHERE seq > ?", (sequence,)
+        ).fetchall())
+
+    def clear(self):
+        # A new epoch tells readers that results may have disappeared.
+        def write(conn):
+            conn.execute("DELETE FROM update_checks")
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'epoch'", (uuid.uuid4().hex[:8],))
+            self._next_sequence(conn)
+        self._db.transaction(write)
+
+    def prune_expired(self) -> int:
+        """Drop results not re-checked within the retention period, e.g. of images no longer in use.
+
+        Results past the TTL stay: they are still shown until the next check.
+        """
+        cutoff = time.time() - self.retention
+        return self._db.run(
+            lambda conn: conn.execute("DELETE FROM update_checks WHERE checked_at < ?", (cutoff,)).rowcount
+        )
+
+    def state_token(self) -> Tuple[str, int]:
+        """``(epoch, sequence)``, read together; it changes whenever a lookup could return something different."""
+        values = dict(self._db.run(lambda conn: conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('epoch', 'sequence')"
+        ).fetchall()))
+        return values['epoch'], int(values['sequence'])
+
+    def get_stats(self) -> Dict:
+        total, valid = self._db.run(lambda conn: conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(checked_at >= ?), 0) FROM update_checks",
+            (time.time() - self.ttl,)
+        ).fetchone())
+        return {
+            "total_entries": total,
+            "valid_entries": valid,
+            "expired_entries": total - valid,
+            "cache_duration_seconds": self.ttl,
+            "max_entries": self.max_entries
+        }
+
+
+def open_update_store(path: str, ttl_seconds: int, max_entries: int, retention_seconds: int) -> UpdateStore:
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return UpdateStore(path, ttl_seconds, max_entries, retention_seconds)
+    except (OSError, sqlite3.Error) as e:
+        fallback = os.path.join(tempfile.gettempdir(), 'dockpeek-updates.db')
+        logger.warning(f"Cannot open update store at {path} ({e}), using {fallback}")
+        return UpdateStore(fallback, ttl_seconds, max_entries, retention_seconds)
@@ -1,4 +1,5 @@
 import os
+import shutil
 
 workers = int(os.environ.get('WORKERS', '2'))
 
@@ -23,6 +24,13 @@ backlog = 2048
 max_requests = 2000 
 max_requests_jitter = 100
 
+# Shared collector: one process owns the Docker connections, workers read its snapshots
+shared_collector = os.environ.get('SHARED_COLLECTOR', 'true').lower() == 'true'
+# Bulk updates run in the collector; on shutdown it finishes the restarts in flight.
+collector_stop_timeout = int(os.environ.get('COLLECTOR_STOP_TIMEOUT', '300'))
+_collector = None
+_default_metrics_dir = None
+
 # Security
 limit_request_line = 4094
 limit_request_fields = 100
@@ -39,6 +47,7 @@ def get_dockpeek_art():
 -- Timeout: {timeout}s | Graceful: {graceful_timeout}s | Keepalive: {keepalive}s
 -- Worker connections: {worker_connections} | Backlog: {backlog}
 -- Max requests: {max_requests} ±{max_requests_jitter}
+-- Shared collector: {'enabled' if shared_collector else 'disabled'}
 --  
 --     _         _               _   
 --   _| |___ ___| |_ ___ ___ ___| |_ 
@@ -56,12 +65,45 @@ def get_dockpeek_art():
 """
 
 # --- Server Hooks ---
+def on_starting(server):
+    global _collector, _default_metrics_dir
+    from dockpeek.metrics import METRICS_DIR_ENV, default_metrics_dir, reset_metrics_dir
+
+    # Every worker and the collector write their metrics here, so /metrics can sum them.
+    metrics_dir = os.environ.get(METRICS_DIR_ENV)
+    if not metrics_dir:
+        metrics_dir = _default_metrics_dir = default_metrics_dir()
+        os.environ[METRICS_DIR_ENV] = metrics_dir
+    reset_metrics_dir(metrics_dir)
+
+    if not shared_collector:
+        return
+
+    # Only import modules without Docker state here; workers are forked from the
+    # master and must create their inventory after the snapshot dir is set.
+    from dockpeek.shared_snapshot import SNAPSHOT_DIR_ENV, CollectorProcess, default_snapshot_dir
+
+    # Set before workers are forked so every worker reads the same snapshots.
+    snapshot_dir = os.environ.get(SNAPSHOT_DIR_ENV) or default_snapshot_dir()
+    os.environ[SNAPSHOT_DIR_ENV] = snapshot_dir
+    _collector = CollectorProcess(snapshot_dir)
+    _collector.start()
+    server.log.info(f"Collector started, snapshots in {snapshot_dir}")
+
+
 def when_ready(server):
     print(get_dockpeek_art())
     server.log.info("Gunicorn server is ready. Spawning workers...")
 
 
 def worker_exit(server, worker):
+    # Runs in the exiting worker. Without a collector, bulk updates run here
+    # and must not be cut off halfway through a restart.
+    from dockpeek.update_queue import bulk_updates
+    bulk_updates.shutdown()
+    # Its last samples are kept for /metrics.
+    from dockpeek.metrics import metrics
+    metrics.flush()
     server.log.info(f"Worker {worker.pid} exited")
 
 def worker_abort(worker):
@@ -69,3 +111,7 @@ def worker_abort(worker):
 
 def on_exit(server):
     server.log.warning("Shutting down Gunicorn")
+    if _collector is not None:
+        _collector.stop(timeout=collector_stop_timeout)
+    if _default_metrics_dir is not None:
+        shutil.rmtree(_default_metrics_dir, ignore_errors=True)
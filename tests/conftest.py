@@ -0,0 +1,5 @@
+import os
+
+# config.Config is evaluated when the dockpeek package is imported.
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('DISABLE_AUTH', 'true')
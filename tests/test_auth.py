@@ -0,0 +1,40 @@
+from werkzeug.security import generate_password_hash
+
+from dockpeek.auth import CredentialStore
+
+
+def configured(**config):
+    store = CredentialStore()
+    store.configure({'SECRET_KEY': 'secret', **config})
+    return store
+
+
+def test_fingerprint_matches_across_workers_for_plain_password():
+    config = {'ADMIN_USERNAME': 'admin', 'ADMIN_PASSWORD': 'hunter2'}
+    first, second = configured(**config), configured(**config)
+
+    assert first.users()['admin'] != second.users()['admin']
+    assert first.fingerprint('admin') == second.fingerprint('admin')
+    assert second.verify('admin', 'hunter2')
+
+
+def test_fingerprint_follows_password_and_secret():
+    password_hash = generate_password_hash('hunter2')
+    store = configured(ADMIN_USERNAME='admin', ADMIN_PASSWORD_HASH=password_hash)
+
+    assert store.fingerprint('admin') == configured(
+        ADMIN_USERNAME='admin', ADMIN_PASSWORD_HASH=password_hash).fingerprint('admin')
+    assert store.fingerprint('admin') != configured(
+        ADMIN_USERNAME='admin', ADMIN_PASSWORD_HASH=generate_password_hash('hunter3')).fingerprint('admin')
+    assert store.fingerprint('admin') != configured(
+        SECRET_KEY='other', ADMIN_USERNAME='admin', ADMIN_PASSWORD_HASH=password_hash).fingerprint('admin')
+    assert store.fingerprint('nobody') is None
+
+
+def test_users_file_fingerprint(tmp_path):
+    users_file = tmp_path / 'users'
+    users_file.write_text(f"alice:{generate_password_hash('pw')}\n")
+    store = configured(USERS_FILE=str(users_file))
+
+    assert store.verify('alice', 'pw')
+    assert store.fingerprint('alice') == configured(USERS_FILE=str(users_file)).fingerprint('alice')
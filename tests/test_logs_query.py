@@ -0,0 +1,85 @@
+import pytest
+
+from dockpeek.logs_manager import LogQueryError, parse_log_time, query_logs
+
+# Bursts written within one nanosecond share a timestamp.
+TIMESTAMPS = ['2024-05-01T12:00:00.000000001Z'] * 3 + ['2024-05-01T12:00:01.000000000Z'] * 4 + \
+             ['2024-05-01T12:00:02.500000000Z']
+LINES = [f"{ts} line {i}" for i, ts in enumerate(TIMESTAMPS)]
+
+
+class FakeContainer:
+    """Applies ``since``/``until`` in whole seconds, inclusive, like the daemon."""
+
+    attrs = {'Created': '2024-05-01T11:00:00Z'}
+
+    def __init__(self, lines=LINES):
+        self.lines = [(parse_log_time(line.split(' ')[0]), line) for line in lines]
+        self.sent = 0
+
+    def logs(self, stream=False, since=None, until=None, **options):
+        lines = [line for line_ns, line in self.lines
+                 if (since is None or line_ns >= since * 1_000_000_000)
+                 and (until is None or line_ns <= until * 1_000_000_000)]
+        self.sent += len(lines)
+        return iter([("\n".join(lines) + "\n").encode()] if lines else [])
+
+
+class FakeClient:
+    def __init__(self, container=None):
+        container = container or FakeContainer()
+        self.containers = type('Containers', (), {'get': staticmethod(lambda name: container)})()
+
+
+def collect_pages(direction, limit, client=None):
+    pages, cursor = [], None
+    while True:
+        page = query_logs(client or FakeClient(), 'web', limit=limit, cursor=cursor, direction=direction)
+        pages.append(page['lines'])
+        if not page['has_more']:
+            return pages
+        cursor = page['before_cursor' if direction == 'backward' else 'after_cursor']
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_backward_pages_keep_lines_sharing_a_timestamp(limit):
+    pages = collect_pages('backward', limit)
+    assert [line for page in reversed(pages) for line in page] == LINES
+
+
+def test_backward_pages_read_only_the_windows_they_need():
+    lines = [f"2024-05-01T12:{i // 60:02d}:{i % 60:02d}.000000000Z line {i}" for i in range(3000)]
+    container = FakeContainer(lines)
+    pages = collect_pages('backward', 100, FakeClient(container))
+    assert [line for page in reversed(pages) for line in page] == lines
+    # Reading from the start of the log for every page would send about 15 times the log.
+    assert container.sent < 5 * len(lines)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_forward_pages_keep_lines_sharing_a_timestamp(limit):
+    first = query_logs(FakeClient(), 'web', limit=limit, direction='forward')
+    lines, cursor = list(first['lines']), first['after_cursor']
+    while True:
+        page = query_logs(FakeClient(), 'web', limit=limit, cursor=cursor, direction='forward')
+        lines += page['lines']
+        if not page['lines']:
+            break
+        cursor = page['after_cursor']
+    assert lines == LINES
+
+
+def test_cursor_without_offset_is_accepted():
+    page = query_logs(FakeClient(), 'web', cursor='1714564801000000000', direction='backward')
+    assert page['lines'] == LINES[:3]
+
+
+@pytest.mark.parametrize('pattern', ['(a+)+$', '(a|a)*$', r'^(\w+\s?)*$', '(x+x+)+y'])
+def test_nested_quantifiers_are_rejected(pattern):
+    with pytest.raises(LogQueryError):
+        query_logs(FakeClient(), 'web', pattern=pattern, regex=True)
+
+
+def test_bounded_regex_still_matches():
+    page = query_logs(FakeClient(), 'web', pattern=r'(\d{1,3}\.){0,3}line [57]', regex=True)
+    assert page['lines'] == [LINES[5], LINES[7]]
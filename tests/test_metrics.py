@@ -0,0 +1,47 @@
+import pytest
+
+from config import Config
+from dockpeek import create_app
+from dockpeek.docker_utils import StreamingClientPool
+from dockpeek.metrics import MetricsSnapshot, metrics
+
+
+def client_for(**settings):
+    config = type('TestConfig', (Config,), settings)
+    return create_app(config).test_client()
+
+
+@pytest.mark.parametrize('settings, headers, status', [
+    ({'DISABLE_AUTH': False, 'ADMIN_USERNAME': 'admin', 'ADMIN_PASSWORD': 'pw', 'METRICS_TOKEN': None}, {}, 401),
+    ({'DISABLE_AUTH': True, 'METRICS_TOKEN': None}, {}, 200),
+    ({'DISABLE_AUTH': True, 'METRICS_TOKEN': 'secret'}, {}, 401),
+    ({'DISABLE_AUTH': True, 'METRICS_TOKEN': 'secret'}, {'Authorization': 'Bearer wrong'}, 401),
+    ({'DISABLE_AUTH': False, 'ADMIN_USERNAME': 'admin', 'ADMIN_PASSWORD': 'pw', 'METRICS_TOKEN': 'secret'},
+     {'Authorization': 'Bearer secret'}, 200),
+])
+def test_metrics_access(settings, headers, status):
+    response = client_for(**settings).get('/metrics', headers=headers)
+    assert response.status_code == status
+
+
+def test_host_label_falls_back_to_url_without_credentials():
+    assert metrics.host_label('ssh://deploy:pw@docker1.lan:22') == 'ssh://docker1.lan:22'
+    assert metrics.host_label('unix:///var/run/docker.sock') == 'unix:///var/run/docker.sock'
+
+
+def test_streaming_pool_gauges_hide_credentials_before_a_client_exists():
+    pool = StreamingClientPool(max_per_host=2, name='test_pool')
+    pool._in_use['ssh://deploy:pw@docker1.lan'] = 1
+    assert {labels['host'] for _, labels, _ in pool._metric_gauges()} == {'ssh://docker1.lan'}
+
+
+def test_process_gauges_are_reported_per_pid():
+    samples = [
+        {'pid': pid, 'gauges': [['dockpeek_log_streams_active', [], 2],
+                                ['dockpeek_executor_capacity', [['executor', 'image_pull']], 8]]}
+        for pid in (101, 102)
+    ]
+    rendered = MetricsSnapshot(samples).render()
+    assert 'dockpeek_log_streams_active 4' in rendered
+    assert 'dockpeek_executor_capacity{executor="image_pull",pid="101"} 8' in rendered
+    assert 'dockpeek_executor_capacity{executor="image_pull",pid="102"} 8' in rendered
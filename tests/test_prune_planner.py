@@ -0,0 +1,44 @@
+from dockpeek.prune_planner import PrunePlanner
+
+IMAGES = [
+    {'Id': 'sha256:a', 'RepoTags': ['nginx:latest'], 'Created': 100, 'Size': 100, 'SharedSize': 60, 'Containers': -1},
+    {'Id': 'sha256:b', 'RepoTags': ['nginx:latest'], 'Created': 200, 'Size': 110, 'SharedSize': 60, 'Containers': -1},
+    {'Id': 'sha256:c', 'RepoTags': None, 'RepoDigests': ['redis@sha256:x'], 'Created': 50, 'Size': 80,
+     'SharedSize': -1, 'Containers': -1},
+]
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return IMAGES
+
+
+class FakeAPI:
+    timeout = 5
+
+    def __init__(self):
+        self.requests = []
+
+    def _url(self, path):
+        return f"http://docker{path}"
+
+    def get(self, url, params=None, timeout=None):
+        self.requests.append((url, params))
+        return FakeResponse()
+
+    def containers(self, all=False):
+        return [{'ImageID': 'sha256:a', 'Image': 'nginx'}]
+
+
+def test_plan_uses_image_and_container_listings():
+    client = type('Client', (), {'api': FakeAPI()})()
+    plans, errors = PrunePlanner().plan([{'name': 'docker1', 'url': 'tcp://docker1:2375', 'client': client}])
+
+    plan = plans[0]
+    assert errors == {}
+    assert client.api.requests == [('http://docker/images/json', {'shared-size': 1})]
+    assert plan.removable_ids == ('sha256:c',) and plan.reclaimable == 80
+    assert {image['id']: image['pending_update'] for image in plan.images} == {'sha256:b': True, 'sha256:c': False}
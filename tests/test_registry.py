@@ -0,0 +1,140 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dockpeek.registry import (
+    ImageReference, Platform, RegistryClient, RegistryError, select_platform_digest
+)
+
+LIST_TYPE = "application/vnd.oci.image.index.v1+json"
+MANIFEST_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+TOKEN = "stub-token"
+
+MANIFEST_LIST = {
+    "mediaType": LIST_TYPE,
+    "manifests": [
+        {"digest": "sha256:amd64", "platform": {"os": "linux", "architecture": "amd64"}},
+        {"digest": "sha256:armv6", "platform": {"os": "linux", "architecture": "arm", "variant": "v6"}},
+        {"digest": "sha256:armv7", "platform": {"os": "linux", "architecture": "arm", "variant": "v7"}},
+    ],
+}
+
+
+class StubRegistry(BaseHTTPRequestHandler):
+    """Distribution API stand-in: a token-protected repository and an open one."""
+
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, headers=None, body=b''):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _handle(self):
+        StubRegistry.requests.append((self.command, self.path, self.headers.get("Authorization")))
+        host = self.headers["Host"]
+
+        if self.path.startswith("/token"):
+            return self._send(200, {"Content-Type": "application/json"},
+                              json.dumps({"token": TOKEN, "expires_in": 300}).encode())
+
+        if self.path.startswith("/v2/private/app/"):
+            if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+                return self._send(401, {
+                    "WWW-Authenticate": f'Bearer realm="http://{host}/token",service="stub"'
+                })
+            if self.path == "/v2/private/app/manifests/1.0":
+                return self._send(200, {"Docker-Content-Digest": "sha256:index",
+                                        "Content-Type": LIST_TYPE})
+            if self.path == "/v2/private/app/manifests/sha256:index":
+                return self._send(200, {"Content-Type": LIST_TYPE}, json.dumps(MANIFEST_LIST).encode())
+
+        if self.path == "/v2/public/nodigest/manifests/latest":
+            # Digest only on GET, as some registries do.
+            headers = {"Content-Type": MANIFEST_TYPE}
+            if self.command == 'GET':
+                headers["Docker-Content-Digest"] = "sha256:single"
+            return self._send(200, headers, b'{}')
+
+        return self._send(404)
+
+    do_GET = _handle
+    do_HEAD = _handle
+
+
+@pytest.fixture
+def registry():
+    StubRegistry.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubRegistry)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_head_manifest_answers_bearer_challenge(registry):
+    client = RegistryClient(timeout=5)
+    ref = ImageReference(registry, "private/app", "1.0")
+
+    manifest = client.head_manifest(ref)
+
+    assert manifest.digest == "sha256:index"
+    assert manifest.media_type == LIST_TYPE
+    token_requests = [path for _, path, _ in StubRegistry.requests if path.startswith("/token")]
+    assert len(token_requests) == 1
+    assert "scope=repository%3Aprivate%2Fapp%3Apull" in token_requests[0]
+    assert "service=stub" in token_requests[0]
+    assert all(method == "HEAD" for method, path, _ in StubRegistry.requests if path.startswith("/v2/"))
+
+    # The token is cached for the repository.
+    client.head_manifest(ref)
+    assert len([r for r in StubRegistry.requests if r[1].startswith("/token")]) == 1
+
+
+def test_platform_digest_selects_from_manifest_list(registry):
+    client = RegistryClient(timeout=5)
+    ref = ImageReference(registry, "private/app", "1.0")
+
+    assert client.platform_digest(ref, "sha256:index", Platform("linux", "amd64")) == "sha256:amd64"
+    assert client.platform_digest(ref, "sha256:index", Platform("linux", "arm", "v7")) == "sha256:armv7"
+    assert client.platform_digest(ref, "sha256:index", Platform("linux", "arm64")) is None
+
+
+def test_head_manifest_falls_back_to_get_without_digest(registry):
+    client = RegistryClient(timeout=5)
+
+    manifest = client.head_manifest(ImageReference(registry, "public/nodigest", "latest"))
+
+    assert manifest == ("sha256:single", MANIFEST_TYPE)
+    assert [method for method, _, _ in StubRegistry.requests] == ["HEAD", "GET"]
+
+
+def test_missing_manifest_raises(registry):
+    with pytest.raises(RegistryError):
+        RegistryClient(timeout=5).head_manifest(ImageReference(registry, "public/missing", "latest"))
+
+
+def test_select_platform_digest_falls_back_to_any_variant():
+    assert select_platform_digest(MANIFEST_LIST["manifests"], Platform("linux", "arm", "v8")) == "sha256:armv6"
+    assert select_platform_digest(MANIFEST_LIST["manifests"], Platform("windows", "amd64")) is None
+
+
+def test_select_platform_digest_prefers_entry_without_variant():
+    manifests = [
+        {"digest": "sha256:arm64v8", "platform": {"os": "linux", "architecture": "arm64", "variant": "v8"}},
+        {"digest": "sha256:armv6", "platform": {"os": "linux", "architecture": "arm", "variant": "v6"}},
+        {"digest": "sha256:arm", "platform": {"os": "linux", "architecture": "arm"}},
+    ]
+    assert select_platform_digest(manifests, Platform("linux", "arm")) == "sha256:arm"
+    assert select_platform_digest(manifests, Platform("linux", "arm", "v7")) == "sha256:arm"
+    assert select_platform_digest(manifests, Platform("linux", "arm64", "v8")) == "sha256:arm64v8"
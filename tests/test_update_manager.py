@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from dockpeek.update_manager import ContainerUpdateError, ContainerUpdater
+
+
+class FakeContainer:
+    """Reports the given states in turn, then keeps reporting the last one."""
+
+    def __init__(self, *states):
+        self.states = list(states)
+        self.attrs = {}
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        self.attrs = {'State': state}
+
+
+def running(restarts=0, started_at='2024-05-01T12:00:00Z'):
+    return {'Status': 'running', 'RestartCount': restarts, 'StartedAt': started_at}
+
+
+@pytest.fixture
+def updater():
+    return ContainerUpdater(None, 'docker1', {'api': 1, 'stop': 1, 'ready': 2, 'stable': 0.3})
+
+
+def test_container_without_healthcheck_must_keep_running(updater):
+    container = FakeContainer(running())
+    started = time.monotonic()
+    updater._wait_until_ready(container)
+    assert time.monotonic() - started >= 0.3
+    assert container.reloads > 1
+
+
+def test_restart_between_polls_fails(updater):
+    container = FakeContainer(running(), running(restarts=1, started_at='2024-05-01T12:00:01Z'))
+    with pytest.raises(ContainerUpdateError, match='restarted'):
+        updater._wait_until_ready(container)
+
+
+def test_exit_within_stable_window_fails(updater):
+    container = FakeContainer(running(), running(), {'Status': 'exited', 'ExitCode': 1})
+    with pytest.raises(ContainerUpdateError, match='exit code: 1'):
+        updater._wait_until_ready(container)
+
+
+def test_healthy_container_is_ready_without_waiting(updater):
+    container = FakeContainer(dict(running(), Health={'Status': 'starting'}),
+                              dict(running(), Health={'Status': 'healthy'}))
+    started = time.monotonic()
+    updater._wait_until_ready(container)
+    assert time.monotonic() - started < 0.3
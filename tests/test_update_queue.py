@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+import dockpeek.update_jobs as update_jobs_module
+import dockpeek.update_queue as update_queue
+from dockpeek.update_jobs import JobStore, UpdateCheckJobs
+from dockpeek.update_manager import PreparedUpdate
+from dockpeek.update_queue import BulkUpdateJobs, HostQueue
+
+SERVER = {'name': 'docker1', 'url': 'tcp://docker1:2375', 'status': 'active'}
+
+
+class FakeGraph:
+    """``torrent`` shares the network namespace of ``vpn``."""
+
+    def find(self, name):
+        return name
+
+    def name_of(self, container_id):
+        return container_id
+
+    def recreate_order(self, container_id):
+        return [['torrent']] if container_id == 'vpn' else []
+
+
+class FakeUpdater:
+    applied = []
+
+    def __init__(self, client, server_name, **kwargs):
+        self.server_name = server_name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def prepare(self, container_name, pulled_images):
+        return PreparedUpdate(container_name, 'image:latest')
+
+    def apply(self, prepared, force=False):
+        self.applied.append((prepared.container_name, force))
+        if prepared.container_name == 'torrent' and not force:
+            return {'status': 'success', 'message': 'Container torrent is already up to date.',
+                    'updated': False, 'recreated': []}
+        recreated = ['torrent'] if prepared.container_name == 'vpn' else []
+        return {'status': 'success', 'message': 'Updated.', 'updated': True, 'recreated': recreated}
+
+
+class FakeLease:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        pass
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_queue, 'ContainerUpdater', FakeUpdater)
+    monkeypatch.setattr(update_queue, 'discover_docker_clients', lambda: [SERVER])
+    monkeypatch.setattr(update_queue, 'get_dependency_graph', lambda server: FakeGraph())
+    monkeypatch.setattr(update_jobs_module, 'is_snapshot_reader', lambda: False)
+    FakeUpdater.applied = []
+    bulk = BulkUpdateJobs(JobStore(str(tmp_path / 'jobs.db')), global_limit=4, per_host_limit=2)
+    bulk.clients = type('Pool', (), {'acquire': lambda self, url: FakeLease()})()
+    return bulk
+
+
+def wait_for(bulk, job_id):
+    return list(bulk.stream(job_id))[-1]
+
+
+def test_next_restart_waits_for_parent_and_dependent_pulls():
+    host = HostQueue(SERVER)
+    host.dependents = {'vpn': {'torrent'}}
+    host.pulling.add('torrent')
+    host.ready.append(PreparedUpdate('vpn', 'image:latest'))
+    assert host.next_restart() is None
+
+    host.pulling.clear()
+    host.ready.appendleft(PreparedUpdate('torrent', 'image:latest'))
+    assert host.next_restart().container_name == 'vpn'
+    assert host.next_restart().container_name == 'torrent'
+
+
+@pytest.mark.parametrize('force', [False, True])
+def test_dependent_in_batch_is_not_restarted_twice(jobs, force):
+    job_id = jobs.start([('docker1', 'torrent'), ('docker1', 'vpn')], force=force)
+    finished = wait_for(jobs, job_id)
+
+    assert finished['status'] == 'completed' and finished['updated'] == 2
+    assert FakeUpdater.applied == [('vpn', force), ('torrent', False)]
+    item = jobs.get(job_id)['items']['docker1:torrent']
+    assert item['state'] == 'updated' and 'while updating vpn' in item['message']
+
+
+def test_web_workers_queue_jobs_for_the_collector(jobs, monkeypatch):
+    monkeypatch.setattr(update_jobs_module, 'is_snapshot_reader', lambda: True)
+    job_id = jobs.start([('docker1', 'vpn')])
+    assert jobs.status(job_id)['status'] == 'queued'
+    assert FakeUpdater.applied == []
+
+    monkeypatch.setattr(update_jobs_module, 'is_snapshot_reader', lambda: False)
+    jobs.run_queued()
+    jobs.run_queued()
+
+    assert wait_for(jobs, job_id)['status'] == 'completed'
+    assert FakeUpdater.applied == [('vpn', False)]
+
+
+def test_check_and_bulk_jobs_claim_only_their_own_kind(jobs, monkeypatch):
+    checks = UpdateCheckJobs(jobs.store, concurrency=1)
+    launched = []
+    monkeypatch.setattr(checks, '_launch', lambda job_id, request: launched.append((job_id, request['server_filter'])))
+    monkeypatch.setattr(update_jobs_module, 'is_snapshot_reader', lambda: True)
+    check_id = checks.start('docker1')
+    bulk_id = jobs.start([('docker1', 'vpn')])
+
+    monkeypatch.setattr(update_jobs_module, 'is_snapshot_reader', lambda: False)
+    checks.run_queued()
+    assert launched == [(check_id, 'docker1')]
+    assert jobs.status(bulk_id)['status'] == 'queued'
+
+    jobs.run_queued()
+    assert wait_for(jobs, bulk_id)['status'] == 'completed'
+
+
+def test_shutdown_lets_the_restart_in_flight_finish(jobs, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_apply(self, prepared, force=False):
+        FakeUpdater.applied.append((prepared.container_name, force))
+        started.set()
+        release.wait(5)
+        return {'status': 'success', 'message': 'Updated.', 'updated': True, 'recreated': []}
+
+    monkeypatch.setattr(FakeUpdater, 'apply', slow_apply)
+    job_id = jobs.start([('docker1', 'web'), ('docker1', 'db'), ('docker1', 'cache')])
+    assert started.wait(5)
+
+    threading.Timer(0.2, release.set).start()
+    jobs.shutdown()
+
+    job = jobs.get(job_id)
+    in_flight = f"docker1:{FakeUpdater.applied[0][0]}"
+    assert job['status'] == 'cancelled' and len(FakeUpdater.applied) == 1
+    assert job['items'][in_flight]['state'] == 'updated'
+    assert {item['state'] for key, item in job['items'].items() if key != in_flight} == {'cancelled'}
@@ -0,0 +1,29 @@
+from dockpeek.update_store import UpdateStore
+
+
+def test_get_many_matches_single_lookups(tmp_path):
+    store = UpdateStore(str(tmp_path / 'updates.db'), ttl_seconds=120)
+    refs = [f"app{i}:latest" for i in range(1200)]
+    for i, ref in enumerate(refs[:700]):
+        store.put('docker1', ref, f"sha256:{i}")
+    store.put('docker2', refs[0], 'sha256:other')
+
+    records = store.get_many('docker1', refs)
+
+    assert len(records) == 700
+    assert records[refs[0]] == store.get('docker1', refs[0])
+    assert records[refs[699]][0].image_id == 'sha256:699'
+    assert refs[700] not in records
+    assert store.get_many('docker1', []) == {}
+
+
+def test_state_token_follows_writes_and_clear(tmp_path):
+    store = UpdateStore(str(tmp_path / 'updates.db'))
+    epoch, sequence = store.state_token()
+    assert (epoch, sequence) == (store.epoch, store.sequence)
+
+    store.put('docker1', 'app:latest', 'sha256:1')
+    assert store.state_token() == (epoch, sequence + 1)
+
+    store.clear()
+    assert store.state_token()[0] != epoch